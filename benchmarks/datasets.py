@@ -0,0 +1,191 @@
+"""
+Synthetic datasets shaped like the crawler's CSVs, for benchmarking.
+
+A dataset of n paper rows is written to benchmarks/data/<size>/ with the same
+file names the pipeline uses, so functions with hard-coded paths can run from
+inside that directory:
+
+    research_paper.csv                        n rows, one per (staff member, paper)
+    uic_staff.csv                             one row per staff member
+    scholar_ids.csv                           staff Google Scholar ids, ~5% missing
+    download_pdfs/research_paper_unique.csv   one row per paper
+
+The shape follows the real data: about 27 papers per staff member, about 17%
+of rows being co-authored copies of another row, and links spread over the
+same domains. Some copies differ in scheme, www. or arXiv version so that
+canonical-link dedup has work to do.
+"""
+import csv
+import os
+import random
+from typing import Dict, List, Tuple
+
+DATA_DIR = 'benchmarks/data'
+
+PAPERS_PER_STAFF = 27
+SHARED_ROW_FRACTION = 0.17
+MISSING_SCHOLAR_ID_FRACTION = 0.05
+
+DEPARTMENTS = [
+    'Department of Computer Science',
+    'Department of Electrical and Computer Engineering',
+    'Department of Mathematics, Statistics, and Computer Science',
+    'Department of Biomedical Engineering',
+]
+TITLES = ['Professor', 'Associate Professor', 'Assistant Professor', 'Clinical Assistant Professor',
+          'Distinguished Professor', 'Research Assistant Professor', 'Lecturer']
+
+# (weight, link template) following download_pdfs/domains.txt
+LINK_TEMPLATES: List[Tuple[int, str]] = [
+    (323, 'https://dl.acm.org/doi/pdf/10.1145/{n}'),
+    (297, 'https://arxiv.org/pdf/{arxiv}'),
+    (137, 'https://par.nsf.gov/servlets/purl/{n}'),
+    (99, 'https://ieeexplore.ieee.org/iel7/{a}/{b}/{n}.pdf'),
+    (62, 'https://pmc.ncbi.nlm.nih.gov/articles/PMC{n}/pdf/main.pdf'),
+    (62, 'https://ojs.aaai.org/index.php/AAAI/article/view/{n}/{a}'),
+    (61, 'https://openaccess.thecvf.com/content/CVPR2023/papers/Paper_{n}_CVPR_2023_paper.pdf'),
+    (60, 'https://aclanthology.org/2023.acl-long.{n}.pdf'),
+    (54, 'https://www.researchgate.net/profile/Author/publication/{n}_Paper/links/{a}.pdf'),
+    (52, 'https://www.sciencedirect.com/science/article/pii/S{n}'),
+    (49, 'https://proceedings.mlr.press/v{a}/paper{n}a.pdf'),
+    (43, 'https://proceedings.neurips.cc/paper_files/paper/2023/file/{n}-Paper-Conference.pdf'),
+    (39, 'https://drive.google.com/file/d/{n}/view'),
+    (39, 'https://eprint.iacr.org/2023/{n}.pdf'),
+    (32, 'https://link.springer.com/content/pdf/10.1007/978-3-031-{n}.pdf'),
+    (31, 'https://www.cs.uic.edu/~author/papers/{n}.pdf'),
+    (29, 'https://epubs.siam.org/doi/pdf/10.1137/{n}'),
+    (26, 'https://www.academia.edu/download/{n}/paper.pdf'),
+    (21, 'https://www.osti.gov/servlets/purl/{n}'),
+    (20, 'https://www.vldb.org/pvldb/vol16/p{n}.pdf'),
+]
+
+WORDS = ('learning graph neural efficient scalable private secure fair query data model network '
+         'distributed optimization adaptive robust federated sparse streaming approximate index '
+         'language vision causal quantum memory hardware system analysis detection inference').split()
+
+PAPER_FIELDS = ['year', 'paper_title', 'paper_link', 'name', 'link', 'academic_title', 'department', 'phone', 'email', 'user_id']
+STAFF_FIELDS = ['name', 'link', 'academic_title', 'department', 'phone', 'email']
+
+
+def parse_size(size: str) -> int:
+    """
+    '10k' -> 10000, '1M' -> 1000000, '2500' -> 2500
+    """
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    suffix = size[-1].lower()
+    if suffix in multipliers:
+        return int(float(size[:-1]) * multipliers[suffix])
+    return int(size)
+
+def make_staff(count: int, rng: random.Random) -> List[Dict[str, str]]:
+    staff = []
+    for index in range(count):
+        last, first = f'Lastname{index:06d}', rng.choice(['Alex', 'Sam', 'Jordan', 'Taylor', 'Casey', 'Robin'])
+        slug = f'{last.lower()}-{first.lower()}'
+        staff.append({
+            'name': f'{last}, {first}',
+            'link': f'https://cs.uic.edu/profiles/{slug}/',
+            'academic_title': rng.choice(TITLES),
+            'department': rng.choice(DEPARTMENTS),
+            'phone': f'312{rng.randrange(10**6, 10**7)}',
+            'email': f'{slug}@uic.edu',
+            'user_id': ''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789') for _ in range(8)) + 'AAAAJ',
+        })
+    return staff
+
+def make_link(index: int, rng: random.Random) -> str:
+    template = rng.choices([template for _, template in LINK_TEMPLATES], weights=[weight for weight, _ in LINK_TEMPLATES])[0]
+    arxiv = f'{rng.randrange(15, 25):02d}{rng.randrange(1, 13):02d}.{index % 100000:05d}'
+    return template.format(n=1_000_000 + index, a=rng.randrange(100, 999), b=rng.randrange(1000, 9999), arxiv=arxiv)
+
+def link_variant(link: str, rng: random.Random) -> str:
+    """
+    Another spelling of the same link, as a co-author's profile might list it.
+    """
+    if 'arxiv.org/pdf/' in link:
+        return link.replace('/pdf/', '/abs/') + f'v{rng.randrange(1, 4)}'
+    if link.startswith('https://www.'):
+        return link.replace('https://www.', 'http://', 1)
+    return link + '/' if not link.endswith('.pdf') else link
+
+def generate_dataset(rows: int, output_dir: str, seed: int = 0) -> str:
+    """
+    Write a synthetic dataset with `rows` research_paper.csv rows to output_dir.
+
+    Returns:
+        output_dir
+    """
+    rng = random.Random(seed)
+    staff = make_staff(max(1, rows // PAPERS_PER_STAFF), rng)
+
+    shared_rows = int(rows * SHARED_ROW_FRACTION)
+    unique_count = rows - shared_rows
+
+    papers = []
+    for index in range(unique_count):
+        title_words = rng.sample(WORDS, rng.randrange(4, 10))
+        papers.append({
+            'year': str(rng.randrange(2007, 2026)) if rng.random() > 0.01 else '',
+            'paper_title': ' '.join(title_words).capitalize() + f' {index}',
+            'paper_link': make_link(index, rng),
+            'authors': [rng.randrange(len(staff))],
+        })
+    for _ in range(shared_rows):
+        paper = papers[rng.randrange(unique_count)]
+        paper['authors'].append(rng.randrange(len(staff)))
+
+    os.makedirs(os.path.join(output_dir, 'download_pdfs'), exist_ok=True)
+
+    with open(os.path.join(output_dir, 'research_paper.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=PAPER_FIELDS)
+        writer.writeheader()
+        for paper in papers:
+            for position, author in enumerate(paper['authors']):
+                link = paper['paper_link'] if position == 0 or rng.random() < 0.7 else link_variant(paper['paper_link'], rng)
+                writer.writerow({'year': paper['year'], 'paper_title': paper['paper_title'], 'paper_link': link, **staff[author]})
+
+    with open(os.path.join(output_dir, 'uic_staff.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=STAFF_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(staff)
+
+    with open(os.path.join(output_dir, 'scholar_ids.csv'), 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=['name', 'user_id'], extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(member for member in staff if rng.random() > MISSING_SCHOLAR_ID_FRACTION)
+
+    max_staff = max(len(set(paper['authors'])) for paper in papers)
+    unique_fields = ['paper_id', 'paper_title', 'paper_link', 'year', 'list_of_staff', 'number_of_staff']
+    for position in range(1, max_staff + 1):
+        unique_fields += [f'staff_name{position}', f'staff_dept{position}', f'staff_title{position}']
+
+    with open(os.path.join(output_dir, 'download_pdfs', 'research_paper_unique.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=unique_fields)
+        writer.writeheader()
+        for index, paper in enumerate(papers):
+            authors = [staff[author] for author in dict.fromkeys(paper['authors'])]
+            row = {
+                'paper_id': f'{index:016x}',
+                'paper_title': paper['paper_title'],
+                'paper_link': paper['paper_link'],
+                'year': paper['year'],
+                'list_of_staff': str([author['name'] for author in authors]),
+                'number_of_staff': len(authors),
+            }
+            for position, author in enumerate(authors, start=1):
+                row[f'staff_name{position}'] = author['name']
+                row[f'staff_dept{position}'] = author['department']
+                row[f'staff_title{position}'] = author['academic_title']
+            writer.writerow(row)
+
+    return output_dir
+
+def ensure_dataset(size: str, data_dir: str = DATA_DIR, seed: int = 0) -> str:
+    """
+    Returns the directory of the dataset for `size`, generating it on first use.
+    """
+    output_dir = os.path.join(data_dir, f'{size}-seed{seed}')
+    if not os.path.exists(os.path.join(output_dir, 'download_pdfs', 'research_paper_unique.csv')):
+        print(f'Generating {size} dataset in {output_dir}...')
+        generate_dataset(parse_size(size), output_dir, seed=seed)
+    return output_dir
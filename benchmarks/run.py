@@ -0,0 +1,400 @@
+"""
+Benchmark suite for the dedup, join, upload-prep, download and browser scraping paths.
+
+Each benchmark runs against synthetic datasets (see benchmarks/datasets.py) at
+the requested sizes, and the results are written as JSON named after the
+current commit, so two commits can be compared:
+
+    python -m benchmarks.run --sizes 10k,100k,1M
+    python -m benchmarks.run --sizes 10k --only get_unique_papers,merge_csv
+    python -m benchmarks.run --sizes 10k --compare benchmarks/results/<old commit>.json
+
+The upload-prep benchmarks import download_pdfs.database, which needs the
+supabase package; SUPABASE_URL/SUPABASE_KEY default to the local PostgREST stub's
+values so no real project is touched. Benchmarks whose dependencies are missing
+are recorded as skipped. selenium_pages needs Chrome; it times the same
+pages with a stock and a lean browser (see scraper/driver.py).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, TypedDict
+
+os.environ.setdefault('TQDM_DISABLE', '1')
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.datasets import DATA_DIR, ensure_dataset, parse_size
+from benchmarks.server import start_server
+
+RESULTS_DIR = 'benchmarks/results'
+DEFAULT_SIZES = ['10k', '100k', '1M']
+
+
+class BenchmarkResult(TypedDict):
+    benchmark: str
+    size: str
+    rows: int
+    seconds_min: Optional[float]
+    seconds_median: Optional[float]
+    rows_per_second: Optional[float]
+    extra: Dict[str, Any]
+    skipped: str
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return f'{commit}-dirty' if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+@contextlib.contextmanager
+def working_directory(path: str):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+def time_call(function: Callable[[], Any], repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+    return timings
+
+def make_result(benchmark: str, size: str, rows: int, timings: List[float], **extra) -> BenchmarkResult:
+    best = min(timings)
+    return {
+        'benchmark': benchmark,
+        'size': size,
+        'rows': rows,
+        'seconds_min': round(best, 6),
+        'seconds_median': round(statistics.median(timings), 6),
+        'rows_per_second': round(rows / best, 1) if best > 0 else None,
+        'extra': extra,
+        'skipped': '',
+    }
+
+def skipped_result(benchmark: str, size: str, reason: str) -> BenchmarkResult:
+    return {'benchmark': benchmark, 'size': size, 'rows': 0, 'seconds_min': None, 'seconds_median': None,
+            'rows_per_second': None, 'extra': {}, 'skipped': reason}
+
+def import_database():
+    os.environ.setdefault('SUPABASE_URL', 'http://127.0.0.1:54321')
+    os.environ.setdefault('SUPABASE_KEY', 'stub.stub.stub')
+    from download_pdfs import database
+    return database
+
+
+# Dataset benchmarks; each runs from inside the dataset directory
+
+def bench_get_unique_papers(size: str, rows: int, repeat: int) -> BenchmarkResult:
+    from download_pdfs.preprocessing import get_all_research_papers, get_unique_papers
+    research_papers = get_all_research_papers()
+    unique: List[Dict] = []
+    timings = time_call(lambda: unique.append(len(get_unique_papers(research_papers))), repeat)
+    return make_result('get_unique_papers', size, rows, timings, unique_papers=unique[-1])
+
+def bench_dedup_memory(size: str, rows: int, repeat: int) -> BenchmarkResult:
+    """
+    Peak traced memory of dedup when research_paper.csv is streamed as
+    records, next to the peak when every row is read into a list first.
+    """
+    import tracemalloc
+    from csv_utils import iter_research_papers, read_csv
+    from download_pdfs.preprocessing import get_unique_papers
+
+    def peak_mb(function: Callable[[], Any]) -> float:
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                function()
+            return round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        finally:
+            tracemalloc.stop()
+
+    start = time.perf_counter()
+    streamed = peak_mb(lambda: get_unique_papers(iter_research_papers('research_paper.csv')))
+    elapsed = time.perf_counter() - start
+    materialized = peak_mb(lambda: get_unique_papers(read_csv('research_paper.csv')[0]))
+    return make_result('dedup_memory', size, rows, [elapsed], streamed_peak_mb=streamed, list_of_dicts_peak_mb=materialized)
+
+def bench_merge_csv(size: str, rows: int, repeat: int) -> BenchmarkResult:
+    from csv_utils import merge_csv
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_file = os.path.join(temp_dir, 'merged.csv')
+        timings = time_call(lambda: merge_csv('research_paper.csv', 'scholar_ids.csv', output_file, ['name']), repeat)
+    return make_result('merge_csv', size, rows, timings)
+
+def bench_compare_csv_files(size: str, rows: int, repeat: int) -> BenchmarkResult:
+    from csv_utils import compare_csv_files
+    missing: List[int] = []
+    timings = time_call(lambda: missing.append(len(compare_csv_files('research_paper.csv', 'scholar_ids.csv'))), repeat)
+    return make_result('compare_csv_files', size, rows, timings, missing_rows=missing[-1])
+
+def unique_frame():
+    import pandas as pd
+    return pd.read_csv('download_pdfs/research_paper_unique.csv', dtype={'paper_id': str}, low_memory=False)
+
+def bench_prepare_row_for_insert(size: str, rows: int, repeat: int) -> BenchmarkResult:
+    database = import_database()
+    df = unique_frame()
+    timings = time_call(lambda: [database.prepare_row_for_insert(row) for _, row in df.iterrows()], repeat)
+    return make_result('prepare_row_for_insert', size, len(df), timings)
+
+def bench_prepare_frame_for_insert(size: str, rows: int, repeat: int) -> BenchmarkResult:
+    database = import_database()
+    df = unique_frame()
+    timings = time_call(lambda: database.prepare_frame_for_insert(df), repeat)
+    return make_result('prepare_frame_for_insert', size, len(df), timings)
+
+def bench_build_batches(size: str, rows: int, repeat: int, batch_size: int = 100) -> BenchmarkResult:
+    """
+    Splits prepared rows into upsert batches and serializes each to its JSON
+    request body, the CPU work done per batch before it goes on the wire.
+    """
+    database = import_database()
+    prepared = database.prepare_frame_for_insert(unique_frame())
+    timings = time_call(
+        lambda: [json.dumps(prepared[i:i + batch_size], default=str) for i in range(0, len(prepared), batch_size)],
+        repeat,
+    )
+    return make_result('build_batches', size, len(prepared), timings, batch_size=batch_size)
+
+def bench_get_domain_count(size: str, rows: int, repeat: int) -> BenchmarkResult:
+    from download_pdfs.preprocessing import get_domain_count
+    timings = time_call(get_domain_count, repeat)
+    return make_result('get_domain_count', size, rows, timings)
+
+DATASET_BENCHMARKS: Dict[str, Callable[[str, int, int], BenchmarkResult]] = {
+    'get_unique_papers': bench_get_unique_papers,
+    'dedup_memory': bench_dedup_memory,
+    'merge_csv': bench_merge_csv,
+    'compare_csv_files': bench_compare_csv_files,
+    'prepare_row_for_insert': bench_prepare_row_for_insert,
+    'prepare_frame_for_insert': bench_prepare_frame_for_insert,
+    'build_batches': bench_build_batches,
+    'get_domain_count': bench_get_domain_count,
+}
+
+
+# Network benchmarks against the local server
+
+def bench_download_many(jobs: int, latency: float, pdf_kb: int, per_host_concurrency: int,
+                        max_in_flight: int) -> BenchmarkResult:
+    from download_pdfs.async_downloader import download_many
+
+    server = start_server(latency=latency, pdf_kb=pdf_kb)
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            download_jobs = [
+                {'paper_id': str(index), 'url': f'{base_url}/pdf/{index}.pdf',
+                 'output_path': os.path.join(temp_dir, f'{index}.pdf'), 'headers': {}}
+                for index in range(jobs)
+            ]
+            results: List = []
+            timings = time_call(lambda: results.append(download_many(
+                download_jobs,
+                max_in_flight=max_in_flight,
+                per_host_concurrency=per_host_concurrency,
+                per_host_rps=0,
+            )), 1)
+    finally:
+        server.shutdown()
+
+    ok = sum(1 for result in results[-1] if result['status'] == 'ok')
+    megabytes = sum(result['bytes'] for result in results[-1]) / 1024 / 1024
+    return make_result('download_many', str(jobs), jobs, timings, latency=latency, pdf_kb=pdf_kb,
+                       per_host_concurrency=per_host_concurrency, max_in_flight=max_in_flight,
+                       ok=ok, megabytes_per_second=round(megabytes / timings[0], 2))
+
+def bench_scrape_http(pages: int, latency: float) -> BenchmarkResult:
+    from scraper.http_backend import create_session, fetch_html, parse_mandates
+
+    server = start_server(latency=latency)
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    staff_user_id = {'name': 'Benchmark', 'link': '', 'academic_title': '', 'department': '',
+                     'phone': '', 'email': '', 'user_id': 'benchmark'}
+    papers: List[int] = []
+    try:
+        session = create_session()
+        timings = time_call(
+            lambda: papers.append(sum(len(parse_mandates(fetch_html(session, f'{base_url}/html/{index}'), staff_user_id) or [])
+                                      for index in range(pages))),
+            1,
+        )
+    finally:
+        server.shutdown()
+    return make_result('scrape_http', str(pages), pages, timings, latency=latency, papers=papers[-1])
+
+def bench_selenium_pages(pages: int, latency: float) -> BenchmarkResult:
+    """
+    Loads pages that pull in stylesheets, images and a web font, and waits
+    for their Scholar entries, the way get_profile_data does, once with a
+    stock Chrome and once with the lean driver. The result is the lean time;
+    the stock time is kept in extra so both show up in one report.
+    """
+    from selenium.common.exceptions import WebDriverException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+    from scraper.driver import create_driver
+
+    server = start_server(latency=latency)
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    seconds: Dict[str, float] = {}
+    try:
+        for mode in ('stock', 'lean'):
+            try:
+                driver = create_driver(lean=mode == 'lean')
+            except WebDriverException as e:
+                return skipped_result('selenium_pages', str(pages), f'Chrome unavailable: {getattr(e, "msg", e)}')
+            try:
+                def load_pages():
+                    for index in range(pages):
+                        driver.get(f'{base_url}/page/{index}')
+                        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CLASS_NAME, 'gs_mnde_one_art')))
+                seconds[mode] = time_call(load_pages, 1)[0]
+            finally:
+                driver.quit()
+    finally:
+        server.shutdown()
+
+    return make_result('selenium_pages', str(pages), pages, [seconds['lean']], latency=latency,
+                       stock_seconds=round(seconds['stock'], 6),
+                       speedup=round(seconds['stock'] / seconds['lean'], 2) if seconds['lean'] else None)
+
+
+def run_benchmarks(sizes: List[str], only: Optional[List[str]], repeat: int, data_dir: str,
+                   download_jobs: int, scrape_pages: int, latency: float, pdf_kb: int,
+                   per_host_concurrency: int, max_in_flight: int) -> List[BenchmarkResult]:
+    results: List[BenchmarkResult] = []
+    selected = [name for name in DATASET_BENCHMARKS if not only or name in only]
+
+    for size in sizes:
+        if not selected:
+            break
+        dataset_dir = os.path.abspath(ensure_dataset(size, data_dir))
+        rows = parse_size(size)
+        for name in selected:
+            print(f'{name} @ {size}...', end=' ', flush=True)
+            with working_directory(dataset_dir):
+                try:
+                    result = DATASET_BENCHMARKS[name](size, rows, repeat)
+                except ImportError as e:
+                    result = skipped_result(name, size, f'missing dependency: {e}')
+            results.append(result)
+            print(result['skipped'] or f"{result['seconds_min']:.3f}s ({result['rows_per_second']:,.0f} rows/s)")
+
+    network = {
+        'download_many': lambda: bench_download_many(download_jobs, latency, pdf_kb, per_host_concurrency, max_in_flight),
+        'scrape_http': lambda: bench_scrape_http(scrape_pages, latency),
+        'selenium_pages': lambda: bench_selenium_pages(scrape_pages, latency),
+    }
+    for name, benchmark in network.items():
+        if only and name not in only:
+            continue
+        print(f'{name}...', end=' ', flush=True)
+        try:
+            result = benchmark()
+        except ImportError as e:
+            result = skipped_result(name, '', f'missing dependency: {e}')
+        results.append(result)
+        print(result['skipped'] or f"{result['seconds_min']:.3f}s ({result['rows_per_second']:,.1f} per s)")
+
+    return results
+
+def save_results(results: List[BenchmarkResult], output: Optional[str] = None) -> str:
+    commit = git_commit()
+    output = output or os.path.join(REPO_ROOT, RESULTS_DIR, f'{commit}.json')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    report = {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return output
+
+def compare_results(baseline_file: str, results: List[BenchmarkResult], threshold: float = 1.2) -> List[str]:
+    """
+    Prints new/old time ratios against a baseline results file.
+
+    Returns:
+        The benchmarks that got slower than threshold times the baseline
+    """
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(result['benchmark'], result['size']): result for result in baseline['results'] if not result['skipped']}
+
+    regressions = []
+    print(f"\nCompared with {baseline['commit']}:")
+    for result in results:
+        old = previous.get((result['benchmark'], result['size']))
+        if result['skipped'] or old is None or not old['seconds_min']:
+            continue
+        ratio = result['seconds_min'] / old['seconds_min']
+        flag = '  REGRESSION' if ratio > threshold else ''
+        print(f"  {result['benchmark']:<26}{result['size']:>6}  {old['seconds_min']:>9.3f}s -> {result['seconds_min']:>9.3f}s  x{ratio:.2f}{flag}")
+        if ratio > threshold:
+            regressions.append(f"{result['benchmark']}@{result['size']}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the dedup, join, upload-prep and download paths.')
+    parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES), help='Comma-separated dataset sizes, e.g. 10k,100k,1M')
+    parser.add_argument('--only', help='Comma-separated benchmarks to run')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per dataset benchmark; the fastest is reported')
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--download-jobs', type=int, default=200, help='PDFs fetched from the local server')
+    parser.add_argument('--scrape-pages', type=int, default=50, help='Scholar pages fetched and parsed one after another')
+    parser.add_argument('--latency', type=float, default=0.05, help='Server latency in seconds per response')
+    parser.add_argument('--pdf-kb', type=int, default=256)
+    parser.add_argument('--per-host-concurrency', type=int, default=8)
+    parser.add_argument('--max-in-flight', type=int, default=16)
+    parser.add_argument('--output', help='Results file (defaults to benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='Baseline results file to compare against')
+    parser.add_argument('--threshold', type=float, default=1.2, help='Slowdown ratio reported as a regression')
+    args = parser.parse_args()
+
+    results = run_benchmarks(
+        sizes=[size.strip() for size in args.sizes.split(',') if size.strip()],
+        only=[name.strip() for name in args.only.split(',')] if args.only else None,
+        repeat=args.repeat,
+        data_dir=os.path.join(REPO_ROOT, args.data_dir) if not os.path.isabs(args.data_dir) else args.data_dir,
+        download_jobs=args.download_jobs,
+        scrape_pages=args.scrape_pages,
+        latency=args.latency,
+        pdf_kb=args.pdf_kb,
+        per_host_concurrency=args.per_host_concurrency,
+        max_in_flight=args.max_in_flight,
+    )
+    print(f'Results saved to {save_results(results, args.output)}')
+
+    if args.compare and compare_results(args.compare, results, args.threshold):
+        sys.exit(1)
@@ -0,0 +1,134 @@
+"""
+Local HTTP server for downloader and scraper throughput benchmarks.
+
+    /pdf/<n>.pdf     a PDF of --pdf-kb kilobytes, with an ETag (304 on If-None-Match)
+    /html/<n>        the saved Scholar mandates page fixture
+    /page/<n>        the same page with the stylesheets, images and web font of a real site
+    /asset/<name>    those resources, ASSET_KB kilobytes each
+    /notpdf/<n>      an HTML error page served with status 200
+    /status/<code>   an empty response with that status
+
+Every response waits --latency seconds first, and bodies are written at up
+to --bandwidth-kbps, so the downloaders are measured against a server that
+behaves like a slow remote host rather than an instant local one.
+
+Usage:
+    python -m benchmarks.server --port 8765 --latency 0.1
+"""
+import argparse
+import hashlib
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+FIXTURE_HTML = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scraper', 'fixtures', 'scholar_mandates.html')
+
+ASSET_KB = 64
+PAGE_ASSETS = b'''
+<link rel="stylesheet" href="/asset/site.css">
+<link rel="stylesheet" href="/asset/theme.css">
+<link rel="preload" as="font" type="font/woff2" href="/asset/body.woff2" crossorigin>
+<script src="/asset/analytics.js" async></script>
+</head>
+<body>
+<img src="/asset/logo.png" alt=""><img src="/asset/banner.jpg" alt=""><img src="/asset/photo.jpg" alt="">
+'''
+ASSET_TYPES = {'.css': 'text/css', '.woff2': 'font/woff2', '.js': 'application/javascript',
+               '.png': 'image/png', '.jpg': 'image/jpeg'}
+
+
+def make_pdf(size: int) -> bytes:
+    header = b'%PDF-1.4\n'
+    return header + b'0' * max(0, size - len(header) - len(b'\n%%EOF\n')) + b'\n%%EOF\n'
+
+
+def make_handler(latency: float, pdf_bytes: bytes, html_bytes: bytes, bandwidth_kbps: float):
+    page_bytes = html_bytes.replace(b'</head>\n<body>', PAGE_ASSETS.strip(b'\n'), 1)
+    asset_bytes = b'/*' + b' ' * (ASSET_KB * 1024 - 4) + b'*/'
+
+    pdf_etag = '"' + hashlib.sha1(pdf_bytes).hexdigest() + '"'
+
+    class BenchmarkHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: bytes, content_type: str, etag: Optional[str] = None):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            if etag:
+                self.send_header('ETag', etag)
+            self.end_headers()
+
+            if not bandwidth_kbps:
+                self.wfile.write(body)
+                return
+            chunk_size = 16 * 1024
+            seconds_per_chunk = chunk_size / (bandwidth_kbps * 1024)
+            for start in range(0, len(body), chunk_size):
+                self.wfile.write(body[start:start + chunk_size])
+                time.sleep(seconds_per_chunk)
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+
+            if self.path.startswith('/pdf/'):
+                if self.headers.get('If-None-Match') == pdf_etag:
+                    self._send(304, b'', 'application/pdf', pdf_etag)
+                else:
+                    self._send(200, pdf_bytes, 'application/pdf', pdf_etag)
+            elif self.path.startswith('/html/'):
+                self._send(200, html_bytes, 'text/html; charset=utf-8')
+            elif self.path.startswith('/page/'):
+                self._send(200, page_bytes, 'text/html; charset=utf-8')
+            elif self.path.startswith('/asset/'):
+                self._send(200, asset_bytes, ASSET_TYPES.get(os.path.splitext(self.path)[1], 'application/octet-stream'))
+            elif self.path.startswith('/notpdf/'):
+                self._send(200, b'<html><body>Access denied</body></html>', 'text/html')
+            elif self.path.startswith('/status/'):
+                self._send(int(self.path.rsplit('/', 1)[-1]), b'', 'text/plain')
+            else:
+                self._send(404, b'', 'text/plain')
+
+    return BenchmarkHandler
+
+
+def start_server(port: int = 0, latency: float = 0.0, pdf_kb: int = 256,
+                 bandwidth_kbps: float = 0.0) -> ThreadingHTTPServer:
+    """
+    Start the server on a background thread; port 0 picks a free port.
+
+    Returns:
+        The server; its base URL is f'http://127.0.0.1:{server.server_port}', call server.shutdown() to stop it
+    """
+    html_bytes = b''
+    if os.path.exists(FIXTURE_HTML):
+        with open(FIXTURE_HTML, 'rb') as f:
+            html_bytes = f.read()
+
+    handler = make_handler(latency, make_pdf(pdf_kb * 1024), html_bytes, bandwidth_kbps)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local HTTP server for downloader benchmarks.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds added before every response')
+    parser.add_argument('--pdf-kb', type=int, default=256, help='Size of the served PDFs')
+    parser.add_argument('--bandwidth-kbps', type=float, default=0.0, help='Per-connection bandwidth cap (0 = unlimited)')
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.latency, args.pdf_kb, args.bandwidth_kbps)
+    print(f"Benchmark server listening on http://127.0.0.1:{server.server_port}/")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,127 @@
+import csv
+import os
+from typing import Dict, Iterable, Iterator, List, Literal, Optional, Tuple, TypedDict
+
+JoinType = Literal['inner', 'left', 'anti']
+Key = Tuple[str, ...]
+
+
+class JoinStats(TypedDict):
+    build_side: str
+    output_rows: int
+    unmatched_left_keys: List[Key]
+    unmatched_right_keys: List[Key]
+
+
+def new_join_stats() -> JoinStats:
+    return {'build_side': '', 'output_rows': 0, 'unmatched_left_keys': [], 'unmatched_right_keys': []}
+
+def read_fieldnames(csv_file_path: str) -> List[str]:
+    with open(csv_file_path, 'r', encoding='utf-8-sig') as file:
+        return list(csv.DictReader(file).fieldnames or [])
+
+def iter_csv_rows(csv_file_path: str) -> Iterator[Dict]:
+    with open(csv_file_path, 'r', encoding='utf-8-sig') as file:
+        yield from csv.DictReader(file)
+
+def join_fieldnames(left_fieldnames: List[str], right_fieldnames: List[str], key_cols: List[str], how: JoinType) -> List[str]:
+    if how == 'anti':
+        return list(left_fieldnames)
+    return left_fieldnames + [col for col in right_fieldnames if col not in key_cols and col not in left_fieldnames]
+
+def hash_join(csv_path_1: str, csv_path_2: str, key_cols: List[str], how: JoinType = 'inner',
+              stats: Optional[JoinStats] = None, fan_out: bool = False) -> Iterator[Dict]:
+    """
+    Join two CSV files on key columns with a hash join.
+    The smaller file is loaded into a hash index, so memory grows with the
+    smaller side only. When that is the right file, the left file is streamed
+    against it. When it is the left file, the right file is streamed to
+    collect the matches of the left keys, and the left rows are joined after.
+    Either way rows come out in left-file order.
+
+    As in the original nested-loop merge, a left row takes the first right
+    row with its key, and right columns overwrite left columns of the same
+    name. In a left join an unmatched row gets every non-key right column
+    blanked, shared ones included.
+
+    Args:
+        csv_path_1: Path to the left CSV file
+        csv_path_2: Path to the right CSV file
+        key_cols: List of column names to join on
+        how: 'inner' keeps matched rows, 'left' keeps every left row
+             (blank right columns when unmatched), 'anti' keeps left rows with no match
+        stats: Optional JoinStats that is filled in as the join runs,
+               including the unmatched keys of both sides
+        fan_out: Emit one row per matching right row instead of the first only
+
+    Yields:
+        Joined rows as new dicts, in left-file order
+
+    Example:
+        stats = new_join_stats()
+        rows = list(hash_join('uic_staff.csv', 'scholar_ids.csv', ['name'], how='left', stats=stats))
+    """
+    fieldnames1 = read_fieldnames(csv_path_1)
+    fieldnames2 = read_fieldnames(csv_path_2)
+
+    for key_col in key_cols:
+        if key_col not in fieldnames1 or key_col not in fieldnames2:
+            raise ValueError(f"Key column '{key_col}' not found in CSV files.")
+
+    if stats is None:
+        stats = new_join_stats()
+
+    right_cols = [col for col in fieldnames2 if col not in key_cols]
+    blank_right = {col: '' for col in right_cols}
+
+    def key_of(row: Dict) -> Key:
+        return tuple(row[key_col] for key_col in key_cols)
+
+    index: Dict[Key, List[Dict]] = {}
+    # Right keys with no left row, in first-seen order; only known up front when the left side is indexed
+    unmatched_right: Dict[Key, None] = {}
+    left_rows: Iterable[Dict]
+    if os.path.getsize(csv_path_2) <= os.path.getsize(csv_path_1):
+        stats['build_side'] = 'right'
+        for row in iter_csv_rows(csv_path_2):
+            matches = index.setdefault(key_of(row), [])
+            if fan_out or not matches:
+                matches.append(row)
+        left_rows = iter_csv_rows(csv_path_1)
+    else:
+        stats['build_side'] = 'left'
+        left_rows = list(iter_csv_rows(csv_path_1))
+        left_keys = {key_of(row) for row in left_rows}
+        for row in iter_csv_rows(csv_path_2):
+            key = key_of(row)
+            if key not in left_keys:
+                unmatched_right[key] = None
+                continue
+            matches = index.setdefault(key, [])
+            if fan_out or not matches:
+                matches.append(row)
+
+    probed = set()
+    for left_row in left_rows:
+        key = key_of(left_row)
+        matches = index.get(key)
+
+        if matches:
+            probed.add(key)
+            if how == 'anti':
+                continue
+            for right_row in matches:
+                stats['output_rows'] += 1
+                yield {**left_row, **{col: right_row.get(col, '') for col in right_cols}}
+            continue
+
+        stats['unmatched_left_keys'].append(key)
+        if how == 'left':
+            stats['output_rows'] += 1
+            yield {**left_row, **blank_right}
+        elif how == 'anti':
+            stats['output_rows'] += 1
+            yield left_row
+
+    stats['unmatched_right_keys'].extend(key for key in index if key not in probed)
+    stats['unmatched_right_keys'].extend(unmatched_right)
@@ -1,7 +1,13 @@
 import csv
-from typing import List, Dict, Tuple
+import sys
+from typing import Iterator, List, Dict, Tuple
 
-from scraper.custom_types import UserID
+from scraper.custom_types import ResearchPaperRecord, UserID
+from csv_join import JoinStats, hash_join, iter_csv_rows, join_fieldnames, new_join_stats, read_fieldnames
+
+# Columns that repeat on every paper row of the same staff member; each
+# distinct value is kept in memory once.
+INTERNED_FIELDS = {'name', 'link', 'academic_title', 'department', 'phone', 'email', 'user_id', 'year'}
 
 def extract_from_csv(csv_file_path: str, rows: list[str]):
     data: List[Dict] = []
@@ -11,7 +17,7 @@ def extract_from_csv(csv_file_path: str, rows: list[str]):
             row_data = {}
             for row_name in rows:
                 row_data[row_name] = csv_row[row_name]
-                data.append(row_data)
+            data.append(row_data)
 
     return data
 
@@ -32,9 +38,10 @@ def read_csv(csv_file_path: str) -> Tuple[List[Dict], List[str]]:
 
     return data, fieldnames
 
-def merge_csv(csv_path_1: str, csv_path_2: str, output_file: str, key_cols: List[str]):
+def merge_csv(csv_path_1: str, csv_path_2: str, output_file: str, key_cols: List[str]) -> JoinStats:
     """
     Merge two CSV files based on key columns.
+    Every row of the first file is kept; columns from the second file are blank when no row matches.
 
     Args:
         csv_path_1: Path to the first CSV file
@@ -42,56 +49,32 @@ def merge_csv(csv_path_1: str, csv_path_2: str, output_file: str, key_cols: List
         output_file: Path where the merged CSV will be written
         key_cols: List of column names to use as merge keys
 
+    Returns:
+        JoinStats with the unmatched keys of both files
+
     Example:
         merge_csv('uic_staff.csv', 'scholar_ids.csv', 'uic_staff_user_ids.csv', ['name'])
     """
-    
-    csv_data1, fieldnames1 = read_csv(csv_path_1)
-    csv_data2, fieldnames2 = read_csv(csv_path_2)
-
-    print(fieldnames1)
-    print(fieldnames2)
-
-    merged_data: List[Dict] = []
-
-    for key_col in key_cols:
-        if key_col not in fieldnames1 or key_col not in fieldnames2:
-            raise ValueError(f"Key column '{key_col}' not found in CSV files.")
-
-    fieldnames_without_keys1 = [col for col in fieldnames1 if col not in key_cols]
-    fieldnames_without_keys2 = [col for col in fieldnames2 if col not in key_cols]
-
-    for row in csv_data1:
-        data = row
-        row_in_csv2 = {}
-        for row2 in csv_data2:
-            found = True
-            for key_col in key_cols:
-                if row[key_col] != row2[key_col]:
-                    found = False
-                    break
-            if found:
-                row_in_csv2 = row2
-                break
-        
-        for fieldname in fieldnames_without_keys2:
-            data[fieldname] = row_in_csv2.get(fieldname, '')
-        
-        merged_data.append(data)
-
-    output_fieldnames = fieldnames1 + fieldnames_without_keys2
-        
+
+    fieldnames1 = read_fieldnames(csv_path_1)
+    fieldnames2 = read_fieldnames(csv_path_2)
+
+    stats = new_join_stats()
+    output_fieldnames = join_fieldnames(fieldnames1, fieldnames2, key_cols, how='left')
+
     with open(output_file, 'w', newline='', encoding='utf-8') as file:
         writer = csv.DictWriter(file, fieldnames=output_fieldnames)
         writer.writeheader()
-        writer.writerows(merged_data)
-    
-    return merged_data
+        writer.writerows(hash_join(csv_path_1, csv_path_2, key_cols, how='left', stats=stats))
+
+    print(f"Merged {stats['output_rows']} rows into {output_file}")
+    print(f"Unmatched in {csv_path_1}: {len(stats['unmatched_left_keys'])}, unmatched in {csv_path_2}: {len(stats['unmatched_right_keys'])}")
+
+    return stats
 
 def read_user_ids(csv_file_path: str) -> List[UserID]:
     data: List[UserID] = []
-    csv_data, _ = read_csv(csv_file_path)
-    for row in csv_data:
+    for row in iter_csv_rows(csv_file_path):
         user_id_data: UserID = {
             'name': row.get('name', ''),
             'link': row.get('link', ''),
@@ -104,22 +87,33 @@ def read_user_ids(csv_file_path: str) -> List[UserID]:
         data.append(user_id_data)
     return data
 
+def iter_research_papers(csv_file_path: str = 'research_paper.csv') -> Iterator[ResearchPaperRecord]:
+    """
+    Stream research_paper.csv as compact ResearchPaperRecords, one row at a
+    time. The staff columns repeat on every paper of a staff member, so their
+    strings are interned and shared between rows.
+    """
+    intern = sys.intern
+    fields = ResearchPaperRecord.__slots__
+    with open(csv_file_path, 'r', encoding='utf-8-sig', newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        positions = [header.index(field) if field in header else None for field in fields]
+        interned = [field in INTERNED_FIELDS for field in fields]
+
+        for row in reader:
+            values = []
+            for position, intern_value in zip(positions, interned):
+                value = row[position] if position is not None and position < len(row) else ''
+                values.append(intern(value) if intern_value else value)
+            yield ResearchPaperRecord(*values)
+
 def extract_staff_names(csv_file_path: str) -> List[str]:
-    csv_data, _ = read_csv(csv_file_path)
-    return list(map(lambda x: x['name'], csv_data))
+    return [row['name'] for row in iter_csv_rows(csv_file_path)]
 
 def compare_csv_files(csv_file_path_1: str, csv_file_path_2: str) -> List[str]:
-    csv_data_1_staff_names = extract_staff_names(csv_file_path_1)
-    csv_data_2_staff_names = extract_staff_names(csv_file_path_2)
-
-    name_list: List[str] = []
-
-    for csv_data_1_staff_name in csv_data_1_staff_names:
-        if csv_data_1_staff_name not in csv_data_2_staff_names:
-            name_list.append(csv_data_1_staff_name)
-    
-    return name_list
-
-        
-
-        
+    """
+    Returns the staff names in the first CSV file that are missing from the second one.
+    """
+    missing_rows = hash_join(csv_file_path_1, csv_file_path_2, ['name'], how='anti')
+    return [row['name'] for row in missing_rows]
@@ -0,0 +1,295 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Optional, Tuple, TypedDict
+from urllib.parse import urlparse
+
+import httpx
+from tqdm.auto import tqdm
+
+PDF_MAGIC = b'%PDF'
+CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+
+class DownloadJob(TypedDict):
+    paper_id: str
+    url: str
+    output_path: str
+    headers: Dict[str, str]
+
+class DownloadResult(TypedDict):
+    paper_id: str
+    url: str
+    host: str
+    status: str
+    bytes: int
+    sha256: str
+    etag: str
+    last_modified: str
+    elapsed: float
+    detail: str
+
+
+class HostLimiter:
+    """
+    Caps the number of concurrent requests and the request rate for one host.
+
+    Args:
+        max_concurrency: Maximum number of requests in flight to the host
+        requests_per_second: Maximum request starts per second (0 disables the cap)
+    """
+
+    def __init__(self, max_concurrency: int, requests_per_second: float):
+        self.semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        if self.interval:
+            async with self._lock:
+                now = time.monotonic()
+                wait = self._next_start - now
+                self._next_start = max(now, self._next_start) + self.interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.semaphore.release()
+
+
+def get_host(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+class FetchOutcome(TypedDict):
+    status: str
+    bytes: int
+    sha256: str
+    etag: str
+    last_modified: str
+    detail: str
+
+def _outcome(status: str, size: int = 0, sha256: str = '', detail: str = '',
+             response: Optional[httpx.Response] = None) -> FetchOutcome:
+    return {
+        'status': status,
+        'bytes': size,
+        'sha256': sha256,
+        'etag': response.headers.get('etag', '') if response is not None else '',
+        'last_modified': response.headers.get('last-modified', '') if response is not None else '',
+        'detail': detail,
+    }
+
+async def fetch_pdf(client: httpx.AsyncClient, job: DownloadJob, max_bytes: int = DEFAULT_MAX_BYTES) -> FetchOutcome:
+    """
+    Fetch a single PDF into memory and write it to job['output_path'].
+    """
+    response = await client.get(job['url'], headers=job['headers'])
+    if response.status_code == 304:
+        return _outcome('unchanged', response=response)
+    if response.status_code != 200:
+        return _outcome('http_error', detail=str(response.status_code))
+    if not response.content.startswith(PDF_MAGIC):
+        return _outcome('not_pdf', detail=response.headers.get('content-type', ''))
+    if len(response.content) > max_bytes:
+        return _outcome('too_large', detail=str(len(response.content)))
+
+    with open(job['output_path'], 'wb') as f:
+        f.write(response.content)
+    return _outcome('ok', len(response.content), hashlib.sha256(response.content).hexdigest(), response=response)
+
+async def stream_pdf(client: httpx.AsyncClient, job: DownloadJob, max_bytes: int = DEFAULT_MAX_BYTES) -> FetchOutcome:
+    """
+    Stream a single PDF to job['output_path'].
+
+    The status code is checked before any body is read, and the connection is
+    dropped as soon as the first bytes show the body is not a PDF or the size
+    passes max_bytes. The body is written to a temp file in chunks while it is
+    hashed, and only renamed into place once the whole PDF has arrived.
+    """
+    async with client.stream('GET', job['url'], headers=job['headers']) as response:
+        if response.status_code == 304:
+            return _outcome('unchanged', response=response)
+        if response.status_code != 200:
+            return _outcome('http_error', detail=str(response.status_code))
+
+        content_length = response.headers.get('content-length', '')
+        if content_length.isdigit() and int(content_length) > max_bytes:
+            return _outcome('too_large', detail=content_length)
+
+        output_dir = os.path.dirname(job['output_path']) or '.'
+        fd, temp_path = tempfile.mkstemp(dir=output_dir, suffix='.part')
+        digest = hashlib.sha256()
+        size = 0
+        head = b''
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                    if len(head) < len(PDF_MAGIC):
+                        head += chunk[:len(PDF_MAGIC)]
+                        if len(head) >= len(PDF_MAGIC) and not head.startswith(PDF_MAGIC):
+                            os.remove(temp_path)
+                            return _outcome('not_pdf', detail=response.headers.get('content-type', ''))
+
+                    size += len(chunk)
+                    if size > max_bytes:
+                        os.remove(temp_path)
+                        return _outcome('too_large', detail=f'>{max_bytes}')
+
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            if not head.startswith(PDF_MAGIC):
+                os.remove(temp_path)
+                return _outcome('not_pdf', detail=response.headers.get('content-type', ''))
+
+            os.replace(temp_path, job['output_path'])
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return _outcome('ok', size, digest.hexdigest(), response=response)
+
+async def _download_all(
+    jobs: List[DownloadJob],
+    max_in_flight: int,
+    per_host_concurrency: int,
+    per_host_rps: float,
+    host_limits: Dict[str, Tuple[int, float]],
+    timeout: float,
+    stream: bool,
+    max_bytes: int,
+    on_result: Optional[Callable[[DownloadJob, DownloadResult], None]],
+) -> List[DownloadResult]:
+
+    in_flight = asyncio.Semaphore(max(1, max_in_flight))
+    limiters: Dict[str, HostLimiter] = {}
+
+    def limiter_for(host: str) -> HostLimiter:
+        if host not in limiters:
+            concurrency, rps = host_limits.get(host, (per_host_concurrency, per_host_rps))
+            limiters[host] = HostLimiter(concurrency, rps)
+        return limiters[host]
+
+    fetch = stream_pdf if stream else fetch_pdf
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    progress_bar = tqdm(total=len(jobs), desc="Downloading research papers", unit="paper")
+
+    async with httpx.AsyncClient(follow_redirects=True, timeout=timeout, limits=limits) as client:
+
+        async def run(job: DownloadJob) -> DownloadResult:
+            host = get_host(job['url'])
+            # Take the host slot before the global one, so a slow host never
+            # holds global slots that other hosts could be using.
+            async with limiter_for(host):
+                async with in_flight:
+                    start = time.monotonic()
+                    try:
+                        outcome = await fetch(client, job, max_bytes)
+                    except Exception as e:
+                        outcome = _outcome('error', detail=f'{type(e).__name__}: {e}')
+                    elapsed = time.monotonic() - start
+
+            result: DownloadResult = {
+                'paper_id': job['paper_id'],
+                'url': job['url'],
+                'host': host,
+                'status': outcome['status'],
+                'bytes': outcome['bytes'],
+                'sha256': outcome['sha256'],
+                'etag': outcome['etag'],
+                'last_modified': outcome['last_modified'],
+                'elapsed': elapsed,
+                'detail': outcome['detail'],
+            }
+            if on_result:
+                on_result(job, result)
+
+            progress_bar.update(1)
+            return result
+
+        results = await asyncio.gather(*(run(job) for job in jobs))
+
+    progress_bar.close()
+    return list(results)
+
+def print_throughput_summary(results: List[DownloadResult], wall_time: float):
+    statuses = Counter(result['status'] for result in results)
+    total_bytes = sum(result['bytes'] for result in results)
+
+    per_host: Dict[str, List[DownloadResult]] = defaultdict(list)
+    for result in results:
+        per_host[result['host']].append(result)
+
+    print(f"\n{'='*60}")
+    print(f"Download complete in {wall_time:.1f}s")
+    print(f"Requests: {len(results)} ({len(results) / wall_time if wall_time else 0:.2f}/s)")
+    print(f"Downloaded: {total_bytes / 1_000_000:.1f} MB ({total_bytes / 1_000_000 / wall_time if wall_time else 0:.2f} MB/s)")
+    for status, count in statuses.most_common():
+        print(f"  {status}: {count}")
+    print("Top hosts:")
+    for host, host_results in sorted(per_host.items(), key=lambda x: -len(x[1]))[:20]:
+        ok = sum(1 for r in host_results if r['status'] == 'ok')
+        mean = sum(r['elapsed'] for r in host_results) / len(host_results)
+        print(f"  {host}: {ok}/{len(host_results)} PDFs, mean {mean:.2f}s")
+    print(f"{'='*60}")
+
+def download_many(
+    jobs: List[DownloadJob],
+    max_in_flight: int = 16,
+    per_host_concurrency: int = 2,
+    per_host_rps: float = 1.0,
+    host_limits: Optional[Dict[str, Tuple[int, float]]] = None,
+    timeout: float = 15,
+    stream: bool = True,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    on_result: Optional[Callable[[DownloadJob, DownloadResult], None]] = None,
+) -> List[DownloadResult]:
+    """
+    Download PDFs concurrently over a pooled keep-alive client.
+    Different hosts download in parallel while each host stays within its own limits.
+
+    Args:
+        jobs: Download jobs, each with paper_id, url, output_path and extra request headers
+              (e.g. If-None-Match, which turns a 304 into an 'unchanged' result)
+        max_in_flight: Maximum number of requests in flight across all hosts
+        per_host_concurrency: Default maximum number of concurrent requests per host
+        per_host_rps: Default maximum request starts per second per host
+        host_limits: Per-host overrides as {host: (concurrency, requests_per_second)}
+        timeout: Request timeout in seconds
+        stream: Stream bodies to disk and stop early on non-PDFs (False buffers each body in memory)
+        max_bytes: Largest PDF to keep; bigger bodies are abandoned as 'too_large'
+        on_result: Called with (job, result) as soon as each download finishes
+
+    Returns:
+        One DownloadResult per job, in job order
+
+    Example:
+        download_many(jobs, max_in_flight=32, host_limits={'par.nsf.gov': (1, 0.5)})
+    """
+    for job in jobs:
+        os.makedirs(os.path.dirname(job['output_path']) or '.', exist_ok=True)
+
+    start = time.monotonic()
+    results = asyncio.run(_download_all(
+        jobs=jobs,
+        max_in_flight=max_in_flight,
+        per_host_concurrency=per_host_concurrency,
+        per_host_rps=per_host_rps,
+        host_limits=host_limits or {},
+        timeout=timeout,
+        stream=stream,
+        max_bytes=max_bytes,
+        on_result=on_result,
+    ))
+    print_throughput_summary(results, time.monotonic() - start)
+
+    return results
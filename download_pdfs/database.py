@@ -1,10 +1,20 @@
 import os
+import ast
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
 import pandas as pd
 from supabase import create_client, Client
 from dotenv import load_dotenv
-from typing import Dict, Any, cast, List
+from typing import Dict, Any, Iterator, cast, List, Optional, Tuple
 import numpy as np
 
+from metrics import COUNT_BUCKETS, metrics
+
+from .paper_store import PaperStore
+
 load_dotenv()
 
 # Supabase credentials
@@ -17,6 +27,33 @@ if not SUPABASE_URL or not SUPABASE_KEY:
 # Initialize Supabase client
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+DEAD_LETTER_FILE = 'download_pdfs/upload_dead_letter.jsonl'
+
+def iter_table_keyset(table: str, columns: str, key: str = 'paper_id', page_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield pages of a table ordered by key, using keyset pagination
+    (key > last seen key) so every page costs the same however deep it is.
+    """
+    last_key = None
+
+    while True:
+        query = supabase.table(table).select(columns).order(key).limit(page_size)
+        if last_key is not None:
+            query = query.gt(key, last_key)
+        with metrics.timer('db_select_seconds', table=table):
+            data = cast(List[Dict[str, Any]], query.execute().data)
+
+        if not data:
+            break
+
+        yield data
+
+        # If we got fewer results than page_size, we've reached the end
+        if len(data) < page_size:
+            break
+
+        last_key = data[-1][key]
+
 def get_existing_paper_ids() -> set:
     """
     Get all existing paper_ids from the database.
@@ -27,27 +64,9 @@ def get_existing_paper_ids() -> set:
     """
     try:
         all_paper_ids = set()
-        page_size = 1000
-        offset = 0
 
-        while True:
-
-            response = supabase.table('research_papers')\
-                .select('paper_id')\
-                .range(offset, offset + page_size - 1)\
-                .execute()
-            data = cast(List[Dict[str, Any]], response.data)
-
-            if not data:
-                break
-
-            all_paper_ids.update(row['paper_id'] for row in data)
-
-            # If we got fewer results than page_size, we've reached the end
-            if len(data) < page_size:
-                break
-
-            offset += page_size
+        for page in iter_table_keyset('research_papers', 'paper_id'):
+            all_paper_ids.update(row['paper_id'] for row in page)
 
         return all_paper_ids
     except Exception as e:
@@ -80,18 +99,246 @@ def prepare_row_for_insert(row: pd.Series) -> Dict[str, Any]:
     return data
 
 
-def upload_csv_to_supabase(csv_path: str, batch_size: int = 100):
+def column_to_python(series: pd.Series) -> np.ndarray:
     """
-    Upload research_paper_unique.csv to Supabase database.
+    Convert one column to an object array of JSON-ready Python values,
+    with the same rules as prepare_row_for_insert applied column-wise.
+    """
+    values = np.empty(len(series), dtype=object)
+    missing = series.isna().to_numpy()
+
+    if pd.api.types.is_bool_dtype(series):
+        values[:] = series.astype(object).to_numpy()
+    elif pd.api.types.is_integer_dtype(series):
+        values[:] = series.astype(object).to_numpy()
+    elif pd.api.types.is_float_dtype(series):
+        numbers = series.to_numpy(dtype=float)
+        whole = ~missing & np.isfinite(numbers) & (numbers == np.floor(numbers))
+        fractional = ~missing & ~whole
+        values[whole] = numbers[whole].astype(np.int64).tolist()
+        values[fractional] = numbers[fractional].tolist()
+    else:
+        text = series.astype(str).to_numpy(dtype=object)
+        present = ~missing & (text != '')
+        values[present] = text[present]
+
+    values[missing] = None
+    return values
+
+def parse_staff_list(value: Any) -> Optional[List[str]]:
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return value
+    try:
+        parsed = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return [value]
+    return [str(name) for name in parsed] if isinstance(parsed, (list, tuple)) else [str(parsed)]
+
+def prepare_frame_for_insert(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Prepare a whole DataFrame for insertion into Supabase, one column at a time.
+    Handles NaN values, narrows numpy ints and whole floats to int, and turns the
+    stringified list_of_staff into a real array.
 
     Args:
-        csv_path: Path to the CSV file
-        batch_size: Number of rows to insert in each batch
+        df: DataFrame read from research_paper_unique.csv
+
+    Returns:
+        List of dictionaries ready for Supabase insertion
     """
-    print(f"Reading CSV file from: {csv_path}")
+    columns: Dict[str, Any] = {name: column_to_python(df[name]) for name in df.columns}
+    if 'list_of_staff' in columns:
+        columns['list_of_staff'] = [parse_staff_list(value) for value in columns['list_of_staff']]
 
-    df = pd.read_csv(csv_path)
-    print(f"Total rows in CSV: {len(df)}")
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*(columns[name] for name in names))]
+
+def iter_prepared_rows(df: pd.DataFrame, chunk_rows: int = 10000) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield the frame's rows prepared for insertion, chunk_rows at a time, so
+    only one chunk of row dicts exists at once however large the frame is.
+    """
+    for start in range(0, len(df), chunk_rows):
+        yield prepare_frame_for_insert(df.iloc[start:start + chunk_rows])
+
+
+class BatchSizer:
+    """
+    Adapts the upsert batch size to how the server copes: batches grow while
+    they come back faster than target_seconds and shrink when they are slow or fail.
+    """
+
+    def __init__(self, initial: int = 100, minimum: int = 10, maximum: int = 1000, target_seconds: float = 2.0):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self._lock = threading.Lock()
+
+    def current(self) -> int:
+        with self._lock:
+            return self.size
+
+    def success(self, elapsed: float):
+        with self._lock:
+            if elapsed < self.target_seconds:
+                self.size = min(self.maximum, int(self.size * 1.5) + 1)
+            else:
+                self.size = max(self.minimum, self.size // 2)
+
+    def failure(self):
+        with self._lock:
+            self.size = max(self.minimum, self.size // 2)
+
+
+# SQLSTATE classes of errors caused by the rows themselves: data exceptions,
+# integrity violations and bad columns. Anything else is the service's fault.
+DATA_ERROR_CLASSES = {'22', '23', '42'}
+
+def is_data_error(error: Exception) -> bool:
+    """
+    Whether an upsert failed because of what was sent (a 4xx or PostgREST
+    validation error) rather than a connection problem or a 5xx.
+    """
+    code = str(getattr(error, 'code', '') or '')
+    if code.isdigit() and len(code) == 3:
+        # An HTTP status, from a response without a PostgREST error body
+        return code.startswith('4') and code not in ('408', '429')
+    return code[:2] in DATA_ERROR_CLASSES or code.startswith('PGRST1')
+
+def upsert_with_retry(table: str, batch: List[Dict[str, Any]], on_conflict: str, max_retries: int = 3,
+                      backoff_seconds: float = 1.0) -> int:
+    """
+    Upsert one batch, retrying with exponential backoff and jitter. A data
+    error is raised at once, since sending the same rows again cannot help.
+
+    Returns:
+        Number of rows the server reports as written
+
+    Raises:
+        The last error once max_retries is exhausted
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            response = supabase.table(table).upsert(batch, on_conflict=on_conflict).execute()
+            return len(response.data)
+        except Exception as e:
+            if attempt == max_retries or is_data_error(e):
+                raise
+            metrics.count('db_upsert_retries_total', table=table)
+            time.sleep(backoff_seconds * (2 ** attempt) * (0.5 + random.random()))
+    return 0
+
+def write_dead_letters(dead_letter_file: str, rows: List[Dict[str, Any]], error: str):
+    with open(dead_letter_file, 'a', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps({'error': error, 'row': row}, default=str) + '\n')
+
+def upsert_rows(rows: List[Dict[str, Any]], table: str = 'research_papers', on_conflict: str = 'paper_id',
+                max_workers: int = 4, batch_size: int = 100, max_retries: int = 3,
+                dead_letter_file: str = DEAD_LETTER_FILE,
+                failed_rows: Optional[List[Dict[str, Any]]] = None) -> Tuple[int, int]:
+    """
+    Upsert rows with a bounded pool of concurrent requests and adaptive batch sizes.
+    A batch rejected for its data is split in half and retried, so one bad row
+    cannot sink its neighbours; rows that fail on their own go to the
+    dead-letter file. A batch that still fails for any other reason after its
+    retries (connection errors, 5xx) stops the upload: no new batches are
+    sent, the ones in flight finish, and the error is raised.
+
+    Args:
+        rows: Rows prepared by prepare_frame_for_insert
+        table: Table to upsert into
+        on_conflict: Unique column that identifies an existing row
+        max_workers: Maximum number of requests in flight
+        batch_size: Initial batch size
+        max_retries: Retries per batch before it is split
+        dead_letter_file: JSONL file that collects rows that could not be written
+        failed_rows: Optional list that collects the rows that could not be written
+
+    Returns:
+        Tuple of (rows written, rows failed)
+
+    Raises:
+        The first error that was not a data error
+    """
+    sizer = BatchSizer(initial=batch_size)
+    total_written = 0
+    total_failed = 0
+    next_row = 0
+    retry_batches: List[List[Dict[str, Any]]] = []
+    batch_number = 0
+    aborted: Optional[Exception] = None
+
+    def upload(batch: List[Dict[str, Any]]) -> Tuple[int, float]:
+        metrics.observe('db_batch_rows', len(batch), buckets=COUNT_BUCKETS, table=table)
+        with metrics.timer('db_upsert_seconds', table=table):
+            start = time.monotonic()
+            written = upsert_with_retry(table, batch, on_conflict, max_retries=max_retries)
+            return written, time.monotonic() - start
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight: Dict[Future, List[Dict[str, Any]]] = {}
+
+        while in_flight or (aborted is None and (next_row < len(rows) or retry_batches)):
+            while aborted is None and len(in_flight) < max_workers and (retry_batches or next_row < len(rows)):
+                if retry_batches:
+                    batch = retry_batches.pop()
+                else:
+                    batch = rows[next_row:next_row + sizer.current()]
+                    next_row += len(batch)
+                in_flight[executor.submit(upload, batch)] = batch
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = in_flight.pop(future)
+                batch_number += 1
+                try:
+                    written, elapsed = future.result()
+                except Exception as e:
+                    sizer.failure()
+                    if not is_data_error(e):
+                        # Splitting would only multiply the retries against a service that is down
+                        if aborted is None:
+                            aborted = e
+                            print(f"Batch {batch_number}: {len(batch)} rows failed ({e}), stopping the upload")
+                        continue
+                    if len(batch) > 1:
+                        middle = len(batch) // 2
+                        retry_batches.extend([batch[:middle], batch[middle:]])
+                        print(f"Batch {batch_number}: {len(batch)} rows failed ({e}), retrying in halves")
+                    else:
+                        total_failed += 1
+                        metrics.count('db_rows_failed_total', table=table)
+                        write_dead_letters(dead_letter_file, batch, str(e))
+                        if failed_rows is not None:
+                            failed_rows.extend(batch)
+                        print(f"Batch {batch_number}: row failed ({e}), written to {dead_letter_file}")
+                    continue
+
+                sizer.success(elapsed)
+                total_written += written
+                metrics.count('db_rows_written_total', written, table=table)
+                print(f"Batch {batch_number}: Upserted {written} rows in {elapsed:.2f}s (next batch size {sizer.current()})")
+
+    if aborted is not None:
+        raise aborted
+    return total_written, total_failed
+
+def upload_frame_to_supabase(df: pd.DataFrame, batch_size: int = 100, max_workers: int = 4,
+                             dead_letter_file: str = DEAD_LETTER_FILE):
+    """
+    Insert the papers of a research_paper_unique frame that are not in Supabase yet.
+
+    Args:
+        df: Papers in the research_paper_unique layout
+        batch_size: Number of rows in the first batch; later batches adapt to the server
+        max_workers: Maximum number of concurrent upsert requests
+        dead_letter_file: JSONL file that collects rows that could not be written
+    """
+    print(f"Total rows: {len(df)}")
 
     print("Fetching existing paper IDs from database...")
     existing_ids = get_existing_paper_ids()
@@ -104,22 +351,46 @@ def upload_csv_to_supabase(csv_path: str, batch_size: int = 100):
         print("No new papers to insert. All papers already exist in database.")
         return
 
-    # Insert in batches
-    total_inserted = 0
-    total_failed = 0
-
-    for i in range(0, len(df_new), batch_size):
-        batch = df_new.iloc[i:i + batch_size]
-        batch_data = [prepare_row_for_insert(row) for _, row in batch.iterrows()]
-
-        response = supabase.table('research_papers').insert(batch_data).execute()
-        batch_inserted = len(response.data)
-        total_inserted += batch_inserted
-        print(f"Batch {i // batch_size + 1}: Inserted {batch_inserted} rows")
+    total_inserted, total_failed = 0, 0
+    for rows in iter_prepared_rows(df_new):
+        inserted, failed = upsert_rows(
+            rows,
+            on_conflict='paper_id',
+            max_workers=max_workers,
+            batch_size=batch_size,
+            dead_letter_file=dead_letter_file,
+        )
+        total_inserted += inserted
+        total_failed += failed
 
     print(f"\n{'='*60}")
-    print(f"Upload complete!")
+    print("Upload complete!")
     print(f"Total inserted: {total_inserted}")
     print(f"Total failed: {total_failed}")
     print(f"Total skipped (duplicates): {len(df) - len(df_new)}")
     print(f"{'='*60}")
+
+def upload_csv_to_supabase(csv_path: str, batch_size: int = 100, max_workers: int = 4,
+                           dead_letter_file: str = DEAD_LETTER_FILE):
+    """
+    Upload research_paper_unique.csv to Supabase database.
+
+    Args:
+        csv_path: Path to the CSV file
+        batch_size: Number of rows in the first batch; later batches adapt to the server
+        max_workers: Maximum number of concurrent upsert requests
+        dead_letter_file: JSONL file that collects rows that could not be written
+    """
+    print(f"Reading CSV file from: {csv_path}")
+    df = pd.read_csv(csv_path, dtype={'paper_id': str})
+    upload_frame_to_supabase(df, batch_size=batch_size, max_workers=max_workers, dead_letter_file=dead_letter_file)
+
+def upload_store_to_supabase(store: Optional[PaperStore] = None, batch_size: int = 100, max_workers: int = 4,
+                             dead_letter_file: str = DEAD_LETTER_FILE):
+    """
+    Upload the papers in the Parquet paper store to Supabase database.
+    """
+    store = store or PaperStore()
+    print(f"Reading paper store from: {store.store_dir}")
+    upload_frame_to_supabase(store.to_wide_frame(), batch_size=batch_size, max_workers=max_workers,
+                             dead_letter_file=dead_letter_file)
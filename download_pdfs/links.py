@@ -0,0 +1,117 @@
+import hashlib
+import re
+from typing import Optional
+from urllib.parse import urlparse, parse_qsl, urlencode, unquote
+
+# New-style ids (2204.07682, 0809.0188) and old-style ids (hep-th/9901001, math.GT/0309136)
+ARXIV_NEW_ID = re.compile(r'(\d{4}\.\d{4,5})(v\d+)?')
+ARXIV_OLD_ID = re.compile(r'([a-z][a-z\-]*(?:\.[A-Z]{2})?/\d{7})(v\d+)?')
+
+DOI_PATTERN = re.compile(r'(10\.\d{4,9}/[-._;()/:a-zA-Z0-9]+)')
+DOI_SUFFIXES = ('/pdf', '/full', '/abstract', '/epdf', '.pdf')
+
+# Query parameters that only track where the click came from
+TRACKING_PARAMS = {'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content', 'casa_token', 'ref', 'via'}
+
+# Hex digits of the canonical link's SHA-256 kept as the paper_id
+PAPER_ID_LENGTH = 16
+
+
+def parse_arxiv_id(url: str) -> Optional[str]:
+    """
+    Extracts the version-less arXiv ID from an arxiv.org URL.
+    Examples:
+      - https://arxiv.org/pdf/2204.07682 -> 2204.07682
+      - https://arxiv.org/abs/2204.07682v3 -> 2204.07682
+      - http://arxiv.org/pdf/hep-th/9901001v1.pdf -> hep-th/9901001
+    """
+    if not isinstance(url, str) or 'arxiv.org' not in url.lower():
+        return None
+
+    path = urlparse(url.strip()).path
+    for prefix in ('/abs/', '/pdf/', '/html/', '/format/'):
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+            break
+    else:
+        return None
+
+    if path.endswith('.pdf'):
+        path = path[:-len('.pdf')]
+    path = path.strip('/')
+
+    match = ARXIV_NEW_ID.fullmatch(path) or ARXIV_OLD_ID.fullmatch(path)
+    return match.group(1) if match else None
+
+def extract_doi(url: str) -> Optional[str]:
+    """
+    Extracts a lower-cased DOI from URLs that carry one in their path.
+    Examples:
+      - https://dl.acm.org/doi/pdf/10.1145/3654939 -> 10.1145/3654939
+      - https://link.springer.com/content/pdf/10.1186/1471-2105-15-316.pdf -> 10.1186/1471-2105-15-316
+    """
+    if not isinstance(url, str):
+        return None
+
+    match = DOI_PATTERN.search(unquote(urlparse(url.strip()).path))
+    if not match:
+        return None
+
+    doi = match.group(1).rstrip('/')
+    stripped = True
+    while stripped:
+        stripped = False
+        for suffix in DOI_SUFFIXES:
+            if doi.lower().endswith(suffix):
+                doi = doi[:-len(suffix)].rstrip('/')
+                stripped = True
+    return doi.lower()
+
+def normalize_url(url: str) -> str:
+    """
+    Normalizes a URL so that http/https, www., host case, trailing slashes,
+    fragments, tracking parameters and query order do not matter.
+    '#page=N' fragments are kept, since they point at different chapters of one PDF.
+    """
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    if host.startswith('www.'):
+        host = host[len('www.'):]
+
+    path = parsed.path.rstrip('/')
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True) if k not in TRACKING_PARAMS))
+
+    fragment = parsed.fragment if parsed.fragment.startswith('page=') else ''
+
+    return f'{host}{path}' + (f'?{query}' if query else '') + (f'#{fragment}' if fragment else '')
+
+def canonical_link(url: str) -> str:
+    """
+    Returns a key that is the same for every link to the same paper.
+    arXiv links become 'arxiv:<id>', DOI-bearing links become 'doi:<doi>' and
+    everything else falls back to the normalized URL.
+    """
+    if not isinstance(url, str) or not url.strip():
+        return ''
+
+    arxiv_id = parse_arxiv_id(url)
+    if arxiv_id:
+        return f'arxiv:{arxiv_id}'
+
+    doi = extract_doi(url)
+    if doi:
+        return f'doi:{doi}'
+
+    return normalize_url(url)
+
+def paper_id_for(url: str) -> str:
+    """
+    Returns a stable paper_id derived from the canonical link, so the same paper
+    keeps its id regardless of row order or which professors were scraped.
+    Example:
+      - https://arxiv.org/abs/2204.07682v3 -> sha256('arxiv:2204.07682')[:16]
+    """
+    key = canonical_link(url)
+    if not key:
+        raise ValueError(f'Cannot derive a paper_id from an empty link: {url!r}')
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:PAPER_ID_LENGTH]
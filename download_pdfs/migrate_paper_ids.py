@@ -0,0 +1,142 @@
+"""
+One-off migration from the old counter-based paper_ids to the content-derived
+ids of links.paper_id_for.
+
+Old ids followed the row order of research_paper.csv, so any rerun could
+renumber every paper. This rewrites the paper_id column of
+research_paper_unique.csv and the PDF manifest to the new ids. It also writes
+the old -> new mapping to paper_id_map.csv for anything else that was keyed on
+the old ids. Rows written before canonical-link dedup can share a new id;
+their staff are merged into the first row and the later rows are dropped.
+
+The Supabase table is not touched here, since the API key cannot change a
+column type. Migrating it takes two steps:
+
+1. Run SUPABASE_MIGRATION_SQL (printed by --print-sql) in the Supabase SQL
+   editor, so paper_id holds the 16-hex text ids. Existing rows keep their
+   old ids, now as text.
+2. Run sync_csv_to_supabase. It deletes the old ids and inserts the new ones,
+   as does the sync snapshot if there is one.
+
+Usage:
+    python -m download_pdfs.migrate_paper_ids
+    python -m download_pdfs.migrate_paper_ids --print-sql
+"""
+import argparse
+import ast
+import csv
+import os
+import sqlite3
+from typing import Dict, List, TypedDict
+
+import pandas as pd
+
+from .links import paper_id_for
+from .preprocessing import merge_paper_dicts
+from .pdf_store import MANIFEST_PATH
+
+CSV_PATH = 'download_pdfs/research_paper_unique.csv'
+MAP_PATH = 'download_pdfs/paper_id_map.csv'
+
+SUPABASE_MIGRATION_SQL = """\
+ALTER TABLE research_papers
+    ALTER COLUMN paper_id TYPE text USING paper_id::text;
+"""
+
+
+class PaperIdMapping(TypedDict):
+    old_paper_id: str
+    new_paper_id: str
+    paper_link: str
+
+
+def build_paper_id_map(df: pd.DataFrame) -> List[PaperIdMapping]:
+    return [
+        {'old_paper_id': old_paper_id, 'new_paper_id': paper_id_for(paper_link), 'paper_link': paper_link}
+        for old_paper_id, paper_link in zip(df['paper_id'], df['paper_link'])
+    ]
+
+def _paper_dict(row: Dict[str, str]) -> Dict:
+    paper_dict: Dict = dict(row)
+    paper_dict['number_of_staff'] = int(row['number_of_staff'])
+    paper_dict['list_of_staff'] = ast.literal_eval(row['list_of_staff'])
+    return paper_dict
+
+def merge_colliding_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Folds rows that now share a paper_id into the first of them.
+    """
+    papers: Dict[str, Dict] = {}
+    for row in df.to_dict('records'):
+        kept = papers.get(row['paper_id'])
+        if kept is None:
+            papers[row['paper_id']] = _paper_dict(row)
+        else:
+            print(f"Merging duplicate of {row['paper_id']}: {row['paper_title']}")
+            merge_paper_dicts(kept, _paper_dict(row))
+
+    merged = pd.DataFrame(list(papers.values()))
+    merged['list_of_staff'] = merged['list_of_staff'].map(str)
+    columns = list(df.columns) + [column for column in merged.columns if column not in df.columns]
+    return merged.reindex(columns=columns).fillna('')
+
+def migrate_manifest(id_map: Dict[str, str], manifest_path: str = MANIFEST_PATH) -> int:
+    """
+    Renames paper_ids in the PDF manifest. PDFs are stored by content hash, so
+    no files move.
+
+    Returns:
+        Number of manifest rows updated
+    """
+    if not os.path.exists(manifest_path):
+        return 0
+
+    conn = sqlite3.connect(manifest_path)
+    try:
+        with conn:
+            cursor = conn.executemany(
+                'UPDATE OR REPLACE downloads SET paper_id = ? WHERE paper_id = ?',
+                [(new, old) for old, new in id_map.items() if old != new],
+            )
+            return cursor.rowcount
+    finally:
+        conn.close()
+
+def migrate_paper_ids(csv_path: str = CSV_PATH, map_path: str = MAP_PATH, manifest_path: str = MANIFEST_PATH):
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    mappings = build_paper_id_map(df)
+    id_map = {mapping['old_paper_id']: mapping['new_paper_id'] for mapping in mappings}
+
+    if all(old == new for old, new in id_map.items()):
+        print(f'{csv_path} already uses content-derived paper_ids.')
+        return
+
+    with open(map_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(PaperIdMapping.__annotations__))
+        writer.writeheader()
+        writer.writerows(mappings)
+
+    df['paper_id'] = df['paper_id'].map(id_map)
+    merged = merge_colliding_rows(df)
+    merged.to_csv(csv_path, index=False)
+
+    updated = migrate_manifest(id_map, manifest_path)
+
+    print(f'Migrated {len(id_map)} paper_ids in {csv_path} ({len(df)} -> {len(merged)} rows); mapping saved to {map_path}.')
+    print(f'Updated {updated} PDF manifest rows.')
+    print('Run this in the Supabase SQL editor, then sync_csv_to_supabase to replace the old ids in the database:')
+    print(SUPABASE_MIGRATION_SQL)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Migrate counter-based paper_ids to content-derived ones.')
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--map', default=MAP_PATH)
+    parser.add_argument('--manifest', default=MANIFEST_PATH)
+    parser.add_argument('--print-sql', action='store_true', help='Print the Supabase schema migration and exit')
+    args = parser.parse_args()
+
+    if args.print_sql:
+        print(SUPABASE_MIGRATION_SQL)
+    else:
+        migrate_paper_ids(args.csv, args.map, args.manifest)
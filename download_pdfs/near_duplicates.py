@@ -0,0 +1,190 @@
+import csv
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple, TypedDict
+
+import numpy as np
+
+from .preprocessing import merge_paper_dicts
+
+# Mersenne prime used for the universal hash family h(x) = (a*x + b) mod p
+MERSENNE_PRIME = (1 << 61) - 1
+SHINGLE_SIZE = 4
+
+
+class NearDuplicatePair(TypedDict):
+    kept_paper_id: str
+    merged_paper_id: str
+    similarity: float
+    kept_title: str
+    merged_title: str
+    kept_link: str
+    merged_link: str
+    year: str
+
+
+def normalize_title(title: str) -> str:
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', str(title).lower()).split())
+
+def shingle(title: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    text = normalize_title(title)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Pick (bands, rows) with bands * rows == num_perm so that the LSH
+    S-curve threshold (1/bands) ** (1/rows) lands closest to threshold.
+    """
+    best = (num_perm, 1)
+    best_error = float('inf')
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures of shingle sets.
+
+    Args:
+        num_perm: Number of hash permutations in each signature
+        seed: Seed for the permutation coefficients
+    """
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        generator = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = generator.randint(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.b = generator.randint(0, 1 << 31, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingles: Set[str]) -> np.ndarray:
+        if not shingles:
+            return np.full(self.num_perm, MERSENNE_PRIME, dtype=np.uint64)
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # a and crc32 values are both below 2**32, so a*x + b fits in uint64
+        permuted = (np.outer(self.a, hashes) + self.b[:, None]) % MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+
+def find_near_duplicate_pairs(papers: List[Dict], threshold: float = 0.85, num_perm: int = 128) -> List[Tuple[int, int, float]]:
+    """
+    Find pairs of papers with near-identical titles and the same year.
+    Candidates come from LSH buckets over MinHash signatures and are then
+    confirmed with the exact Jaccard similarity of their title shingles.
+
+    Returns:
+        List of (index, index, similarity) with the lower index first
+    """
+    hasher = MinHasher(num_perm=num_perm)
+    bands, rows = choose_bands(num_perm, threshold)
+
+    shingle_sets = [shingle(paper['paper_title']) for paper in papers]
+    buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+
+    for index, shingles in enumerate(shingle_sets):
+        if not shingles:
+            continue
+        signature = hasher.signature(shingles)
+        for band in range(bands):
+            band_key = signature[band * rows:(band + 1) * rows].tobytes()
+            buckets[(band, band_key)].append(index)
+
+    candidates: Set[Tuple[int, int]] = set()
+    for members in buckets.values():
+        for i in range(len(members)):
+            for j in range(i + 1, len(members)):
+                candidates.add((members[i], members[j]))
+
+    pairs: List[Tuple[int, int, float]] = []
+    for i, j in sorted(candidates):
+        year_i, year_j = str(papers[i]['year']), str(papers[j]['year'])
+        if year_i and year_j and year_i != year_j:
+            continue
+        similarity = jaccard(shingle_sets[i], shingle_sets[j])
+        if similarity >= threshold:
+            pairs.append((i, j, similarity))
+
+    return pairs
+
+def merge_near_duplicates(unique_research_papers: List[Dict], threshold: float = 0.85, num_perm: int = 128,
+                          report_file: Optional[str] = 'download_pdfs/near_duplicates.csv') -> List[Dict]:
+    """
+    Merge papers that get_unique_papers kept apart because they were reached
+    through different links, such as an arXiv preprint and its proceedings version.
+    Each cluster keeps the paper with the smallest paper_id, so the surviving
+    id does not depend on row order; it takes over the staff of the others.
+
+    Args:
+        unique_research_papers: Output of get_unique_papers
+        threshold: Minimum Jaccard similarity of title shingles to merge two papers
+        num_perm: Number of MinHash permutations
+        report_file: CSV path for the merged pairs report (None to skip it)
+
+    Returns:
+        The papers with near-duplicates merged, in their original order
+
+    Example:
+        unique_research_papers = merge_near_duplicates(unique_research_papers, threshold=0.9)
+    """
+    pairs = find_near_duplicate_pairs(unique_research_papers, threshold=threshold, num_perm=num_perm)
+
+    parent = list(range(len(unique_research_papers)))
+
+    def find(index: int) -> int:
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    for i, j, _ in pairs:
+        root_i, root_j = sorted((find(i), find(j)), key=lambda index: unique_research_papers[index]['paper_id'])
+        if root_i != root_j:
+            parent[root_j] = root_i
+
+    report: List[NearDuplicatePair] = []
+    best_similarity: Dict[int, float] = defaultdict(float)
+    for i, j, similarity in pairs:
+        best_similarity[i] = max(best_similarity[i], similarity)
+        best_similarity[j] = max(best_similarity[j], similarity)
+
+    for index, paper in enumerate(unique_research_papers):
+        root = find(index)
+        if root == index:
+            continue
+        kept = unique_research_papers[root]
+        merge_paper_dicts(kept, paper)
+        report.append({
+            'kept_paper_id': kept['paper_id'],
+            'merged_paper_id': paper['paper_id'],
+            'similarity': round(best_similarity[index], 3),
+            'kept_title': kept['paper_title'],
+            'merged_title': paper['paper_title'],
+            'kept_link': kept['paper_link'],
+            'merged_link': paper['paper_link'],
+            'year': paper['year'],
+        })
+
+    merged = [paper for index, paper in enumerate(unique_research_papers) if find(index) == index]
+
+    print(f'Merged {len(report)} near-duplicate papers ({len(unique_research_papers)} -> {len(merged)}).')
+
+    if report_file:
+        with open(report_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(NearDuplicatePair.__annotations__))
+            writer.writeheader()
+            writer.writerows(report)
+
+    return merged
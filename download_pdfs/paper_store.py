@@ -0,0 +1,177 @@
+import os
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+PAPER_STORE_DIR = 'download_pdfs/paper_store'
+
+PAPERS_SCHEMA = pa.schema([
+    ('paper_id', pa.string()),
+    ('paper_title', pa.string()),
+    ('paper_link', pa.string()),
+    ('year', pa.int16()),
+    ('number_of_staff', pa.int16()),
+])
+
+# A department or title is shared by many staff, so they are stored once per
+# distinct value with int32 codes.
+STAFF_SCHEMA = pa.schema([
+    ('staff_id', pa.int32()),
+    ('name', pa.string()),
+    ('department', pa.dictionary(pa.int32(), pa.string())),
+    ('academic_title', pa.dictionary(pa.int32(), pa.string())),
+])
+
+# position is the staff member's 1-based slot on the paper, i.e. the N of staff_nameN
+PAPER_STAFF_SCHEMA = pa.schema([
+    ('paper_id', pa.string()),
+    ('staff_id', pa.int32()),
+    ('position', pa.int16()),
+])
+
+TABLES = {'papers': PAPERS_SCHEMA, 'staff': STAFF_SCHEMA, 'paper_staff': PAPER_STAFF_SCHEMA}
+
+PAPER_COLUMNS = ['paper_id', 'paper_title', 'paper_link', 'year']
+STAFF_KEY = ['name', 'department', 'academic_title']
+
+
+def staff_positions(df: pd.DataFrame) -> List[int]:
+    return sorted(int(column[len('staff_name'):]) for column in df.columns if column.startswith('staff_name'))
+
+def normalize_wide_frame(df: pd.DataFrame) -> Dict[str, pa.Table]:
+    """
+    Split the wide research_paper_unique layout (staff_name1..N, staff_dept1..N,
+    staff_title1..N and list_of_staff) into the papers, staff and paper_staff tables.
+    """
+    papers = pd.DataFrame({
+        'paper_id': df['paper_id'].astype(str),
+        'paper_title': df['paper_title'],
+        'paper_link': df['paper_link'],
+        'year': pd.to_numeric(df['year'], errors='coerce').astype('Int16'),
+        'number_of_staff': pd.to_numeric(df['number_of_staff'], errors='coerce').astype('Int16'),
+    })
+
+    edges = pd.concat([
+        pd.DataFrame({
+            'row': range(len(df)),
+            'paper_id': papers['paper_id'].to_numpy(),
+            'position': position,
+            'name': df[f'staff_name{position}'].to_numpy(),
+            'department': df[f'staff_dept{position}'].to_numpy(),
+            'academic_title': df[f'staff_title{position}'].to_numpy(),
+        })
+        for position in staff_positions(df)
+    ], ignore_index=True)
+    edges = edges[edges['name'].notna() & (edges['name'] != '')].sort_values(['row', 'position'], kind='stable')
+
+    # The wide layout has no user_id or profile link, so a staff member is a
+    # name within a department and title; same-named faculty stay apart
+    staff = edges.drop_duplicates(STAFF_KEY)[STAFF_KEY].sort_values(STAFF_KEY, kind='stable')
+    staff.insert(0, 'staff_id', range(len(staff)))
+
+    paper_staff = edges.merge(staff, on=STAFF_KEY, how='left', sort=False)
+    paper_staff = paper_staff.sort_values(['row', 'position'], kind='stable')[['paper_id', 'staff_id', 'position']]
+
+    return {
+        'papers': pa.Table.from_pandas(papers, schema=PAPERS_SCHEMA, preserve_index=False),
+        'staff': pa.Table.from_pandas(staff, schema=STAFF_SCHEMA, preserve_index=False),
+        'paper_staff': pa.Table.from_pandas(paper_staff, schema=PAPER_STAFF_SCHEMA, preserve_index=False),
+    }
+
+
+class PaperStore:
+    """
+    Columnar Parquet store for the unique research papers.
+
+    Papers, staff and the paper_staff edges between them are kept as three
+    Parquet tables instead of one wide CSV with a column triple per author.
+    Departments and titles are dictionary-encoded. Reads can be limited to
+    some columns and to row filters, so only that data is decoded.
+    research_paper_unique.csv remains available through export_csv.
+
+    Args:
+        store_dir: Directory that holds papers.parquet, staff.parquet and paper_staff.parquet
+    """
+
+    def __init__(self, store_dir: str = PAPER_STORE_DIR):
+        self.store_dir = store_dir
+
+    def path_for(self, table: str) -> str:
+        return os.path.join(self.store_dir, f'{table}.parquet')
+
+    def paths(self) -> List[str]:
+        return [self.path_for(table) for table in TABLES]
+
+    def exists(self) -> bool:
+        return all(os.path.exists(path) for path in self.paths())
+
+    def write_frame(self, df: pd.DataFrame):
+        """
+        Replace the store's contents with a frame in the research_paper_unique layout.
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        for table, data in normalize_wide_frame(df).items():
+            temp_path = f'{self.path_for(table)}.tmp'
+            pq.write_table(data, temp_path, compression='zstd')
+            os.replace(temp_path, self.path_for(table))
+
+    def write_papers(self, unique_research_papers: List[Dict]):
+        self.write_frame(pd.DataFrame(unique_research_papers))
+
+    def import_csv(self, csv_path: str):
+        self.write_frame(pd.read_csv(csv_path, dtype={'paper_id': str}))
+
+    def read(self, table: str, columns: Optional[Sequence[str]] = None, filters=None) -> pa.Table:
+        """
+        Read one table, decoding only the given columns and the row groups that
+        can match the filters (pyarrow DNF filters, e.g. [('year', '>=', 2020)]).
+        """
+        return pq.read_table(self.path_for(table), columns=list(columns) if columns else None, filters=filters)
+
+    def papers(self, columns: Optional[Sequence[str]] = None, filters=None) -> pa.Table:
+        return self.read('papers', columns, filters)
+
+    def staff(self, columns: Optional[Sequence[str]] = None, filters=None) -> pa.Table:
+        return self.read('staff', columns, filters)
+
+    def paper_staff(self, columns: Optional[Sequence[str]] = None, filters=None) -> pa.Table:
+        return self.read('paper_staff', columns, filters)
+
+    def papers_by_staff(self, staff_filters, columns: Optional[Sequence[str]] = None) -> pa.Table:
+        """
+        Papers with at least one staff member matching staff_filters, e.g.
+        [('department', '=', 'Department of Computer Science')].
+        """
+        staff_ids = self.staff(['staff_id'], filters=staff_filters).column('staff_id')
+        edges = self.paper_staff(['paper_id', 'staff_id'])
+        paper_ids = pc.unique(edges.filter(pc.is_in(edges.column('staff_id'), value_set=staff_ids)).column('paper_id'))
+        return self.papers(columns, filters=[('paper_id', 'in', paper_ids.to_pylist())])
+
+    def to_wide_frame(self) -> pd.DataFrame:
+        """
+        Rebuild the research_paper_unique layout, with one column triple per
+        author slot and the stringified list_of_staff.
+        """
+        papers = self.papers().to_pandas()
+        staff = self.staff().to_pandas()
+        edges = self.paper_staff().to_pandas().merge(staff, on='staff_id', how='left', sort=False)
+
+        df = papers[PAPER_COLUMNS].copy()
+        names = edges.groupby('paper_id', sort=False)['name'].agg(list)
+        df['list_of_staff'] = df['paper_id'].map(names).map(lambda value: str(value) if isinstance(value, list) else '[]')
+        df['number_of_staff'] = papers['number_of_staff']
+
+        max_position = int(edges['position'].max()) if len(edges) else 0
+        for position in range(1, max_position + 1):
+            slot = edges[edges['position'] == position].set_index('paper_id')
+            df[f'staff_name{position}'] = df['paper_id'].map(slot['name'])
+            df[f'staff_dept{position}'] = df['paper_id'].map(slot['department'].astype(object))
+            df[f'staff_title{position}'] = df['paper_id'].map(slot['academic_title'].astype(object))
+
+        return df
+
+    def export_csv(self, csv_path: str):
+        self.to_wide_frame().to_csv(csv_path, index=False)
@@ -1,6 +1,7 @@
-from csv_utils import read_csv
-from scraper.custom_types import ResearchPaper
-from typing import List, Dict, Optional
+from csv_utils import iter_research_papers
+from fetch_cache import FetchCache
+from metrics import SIZE_BUCKETS, domain_of, metrics
+from typing import Iterator, List, Dict, Optional, Tuple
 
 import pandas as pd
 import csv
@@ -9,133 +10,255 @@ from collections import Counter
 
 import arxiv
 import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from tqdm.auto import tqdm
 
-import requests
 from semanticscholar import SemanticScholar
-import time
 
-from .preprocessing import get_all_research_papers, get_unique_papers, get_domain_count
-from .database import upload_csv_to_supabase
+from .preprocessing import get_unique_papers, get_domain_count
+from .sync import sync_store_to_supabase
+from .async_downloader import download_many, DownloadJob, DownloadResult
+from .pdf_store import PdfStore
+from .paper_store import PaperStore
+from .near_duplicates import merge_near_duplicates
+from .links import parse_arxiv_id
+from scraper.rate_limit import RateLimiter
+
+ARXIV_VERSION = re.compile(r'v\d+$')
 
 def clean_filename(title: str) -> str:
     return "".join(x for x in title if x.isalnum() or x in " -_").strip()
 
-def get_arxiv_id(url):
+def build_arxiv_index(arxiv_df: pd.DataFrame) -> Dict[str, List[Tuple[str, str]]]:
     """
-    Extracts the arXiv ID from a URL.
-    Examples: 
-      - https://arxiv.org/pdf/2204.07682 -> 2204.07682
-      - https://arxiv.org/abs/2204.07682 -> 2204.07682
+    Maps each version-less arXiv ID to the (paper_id, paper_link) rows that link to it.
     """
-    if not isinstance(url, str):
-        return None
-    
-    if 'arxiv.org' in url:
-        return url.split('/')[-1].replace('.pdf', '')
-    return None
+    index: Dict[str, List[Tuple[str, str]]] = {}
+    for paper_id, paper_link in zip(arxiv_df['paper_id'], arxiv_df['paper_link']):
+        arxiv_id = parse_arxiv_id(paper_link)
+        if arxiv_id:
+            index.setdefault(arxiv_id, []).append((str(paper_id), paper_link))
+    return index
+
+def strip_arxiv_version(short_id: str) -> str:
+    """
+    2204.07682v3 -> 2204.07682, hep-th/9901001v1 -> hep-th/9901001
+    """
+    return ARXIV_VERSION.sub('', short_id)
+
+def iter_arxiv_results(client: arxiv.Client, arxiv_ids: List[str], chunk_size: int) -> Iterator[arxiv.Result]:
+    """
+    Query arXiv metadata chunk_size ids at a time, yielding results as they arrive.
+    """
+    for i in range(0, len(arxiv_ids), chunk_size):
+        chunk = arxiv_ids[i:i + chunk_size]
+        try:
+            yield from client.results(arxiv.Search(id_list=chunk, max_results=len(chunk)))
+        except Exception as e:
+            print(f"Error querying arXiv ids {chunk[0]}..{chunk[-1]}: {e}")
+
+def download_with_api(csv_file, store: Optional[PdfStore] = None, max_workers: int = 4,
+                      requests_per_minute: float = 60, chunk_size: int = 100):
+    """
+    Download the PDFs of every arXiv paper in csv_file into the PDF store.
 
-def download_with_api(csv_file):
+    Metadata is fetched chunk_size ids per query while a bounded pool downloads
+    the PDFs of results already received. A shared RateLimiter spaces the PDF
+    requests of all workers; the arxiv client keeps its own delay between
+    metadata queries.
+
+    Args:
+        csv_file: Path to research_paper_unique.csv
+        store: PDF store and manifest (defaults to download_pdfs/pdf_store)
+        max_workers: Maximum number of concurrent PDF downloads
+        requests_per_minute: Combined PDF request starts per minute
+        chunk_size: arXiv ids per metadata query
+    """
+    store = store or PdfStore()
     df = pd.read_csv(csv_file)
     
     arxiv_df = df[df['paper_link'].str.contains('arxiv.org', case=False, na=False)].copy()
+
+    settled = store.settled_keys()
+    is_pending = [(str(paper_id), link) not in settled for paper_id, link in zip(arxiv_df['paper_id'], arxiv_df['paper_link'])]
+    print(f"Skipping {len(arxiv_df) - sum(is_pending)} arXiv papers already in the manifest.")
+    arxiv_df = arxiv_df[is_pending]
     
-    arxiv_ids = arxiv_df['paper_link'].apply(get_arxiv_id).tolist()
-    arxiv_ids = list(set([x for x in arxiv_ids if x]))
+    arxiv_index = build_arxiv_index(arxiv_df)
+    arxiv_ids = sorted(arxiv_index)
     
     print(f"Found {len(arxiv_ids)} unique arXiv IDs.")
 
+    if not arxiv_ids:
+        return
+
     client = arxiv.Client(
-        page_size=100,
+        page_size=chunk_size,
         delay_seconds=3,
         num_retries=3
     )
+    rate_limiter = RateLimiter(requests_per_minute)
 
-    search = arxiv.Search(id_list=arxiv_ids)
-    
-    output_dir = "download_pdfs/arxiv_downloaded"
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    def download(result: arxiv.Result, paper_id: str, paper_link: str):
+        staging_path = store.staging_path(paper_id, paper_link)
+        try:
+            rate_limiter.wait()
+            with metrics.timer('pdf_download_seconds', domain='arxiv.org'):
+                result.download_pdf(dirpath=os.path.dirname(staging_path), filename=os.path.basename(staging_path))
+            metrics.count('pdf_bytes_total', os.path.getsize(staging_path), domain='arxiv.org')
+            store.store_download(paper_id, paper_link, 'ok', path=staging_path)
+            metrics.count('pdf_outcomes_total', domain='arxiv.org', outcome='ok')
+        except Exception as e:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+            store.record(paper_id, paper_link, 'error', detail=f'{type(e).__name__}: {e}')
+            metrics.count('pdf_outcomes_total', domain='arxiv.org', outcome='error')
+            print(f"Error downloading {result.entry_id}: {e}")
 
     print("Starting download via arXiv API...")
 
-    results = list(client.results(search))
+    # Bounds the downloads queued behind the workers, so metadata is not
+    # fetched far ahead of what the pool can download.
+    slots = threading.BoundedSemaphore(max_workers * 2)
+    progress_bar = tqdm(total=sum(len(rows) for rows in arxiv_index.values()), desc="Downloading research papers", unit="paper")
 
-    progress_bar = tqdm(results, desc="Downloading research papers", unit="paper")
-    
-    for result in progress_bar:
-        try:
-            safe_title = clean_filename(result.title)
-            short_id = result.get_short_id().split('v')[0]
-            paper_id = arxiv_df.loc[arxiv_df['paper_link'].str.contains(short_id, na=False), 'paper_id'].values[0]
-            filename = f"{paper_id} {safe_title}.pdf"
-            
-            result.download_pdf(dirpath=output_dir, filename=filename)
-            
-        except Exception as e:
-            print(f"Error downloading {result.entry_id}: {e}")
+    def finished(_):
+        slots.release()
+        progress_bar.update(1)
+
+    matched = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for result in iter_arxiv_results(client, arxiv_ids, chunk_size):
+            arxiv_id = strip_arxiv_version(result.get_short_id())
+            rows = arxiv_index.get(arxiv_id)
+            if not rows:
+                print(f"Error matching {result.entry_id}: not in {csv_file}")
+                continue
+            matched.add(arxiv_id)
+            for paper_id, paper_link in rows:
+                slots.acquire()
+                executor.submit(download, result, paper_id, paper_link).add_done_callback(finished)
+
+    progress_bar.close()
+
+    missing = [arxiv_id for arxiv_id in arxiv_ids if arxiv_id not in matched]
+    if missing:
+        print(f"arXiv returned no metadata for {len(missing)} ids, e.g. {missing[:5]}")
 
     print("\nAll done!")
 
-def download_from_semantic_scholar(csv_file):
+def download_from_semantic_scholar(csv_file, store: Optional[PdfStore] = None, max_in_flight: int = 16,
+                                   per_host_concurrency: int = 2, per_host_rps: float = 1.0,
+                                   cache: Optional[FetchCache] = None, refresh: bool = False):
+    """
+    Download the PDFs of every non-arXiv, non-ACM paper in csv_file into the PDF store.
+
+    Args:
+        csv_file: Path to research_paper_unique.csv
+        store: PDF store and manifest (defaults to download_pdfs/pdf_store)
+        max_in_flight: Maximum number of requests in flight across all hosts
+        per_host_concurrency: Maximum number of concurrent requests per host
+        per_host_rps: Maximum request starts per second per host
+        cache: Fetch cache holding the ETag/Last-Modified of earlier downloads
+        refresh: Revalidate PDFs that were already downloaded instead of skipping them;
+                 with a cache, unchanged PDFs cost a 304 response only
+    """
+    store = store or PdfStore()
     sch = SemanticScholar()
     df = pd.read_csv(csv_file)
-    
-    output_dir = "download_pdfs/semantic_scholar"
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
 
     print(f"Processing {len(df)} papers...")
 
-    progress_bar = tqdm(total=len(df), desc="Downloading research papers")
+    settled = store.settled_keys()
+    downloaded = {(entry['paper_id'], entry['url']) for entry in store.entries(outcome='ok')} if refresh else set()
+    jobs: List[DownloadJob] = []
+    skipped = 0
 
-    for index, row in df.iterrows():
-        title = str(row['paper_title'])
+    for _, row in df.iterrows():
         paper_id = str(row['paper_id'])
-        progress_bar.update(1)
+        pdf_url = row['paper_link']
 
-        progress_bar.set_description(f"Paper ID: {paper_id}")
-        
-        try:
-            pdf_url = None
-
-            if not pdf_url:
-                pdf_url = row['paper_link']
-
-            if pdf_url:
-                if 'arxiv.org' in pdf_url or 'acm.org' in pdf_url:
-                    continue
-                
-                response = requests.get(pdf_url, timeout=15)
-                if not response.content.startswith(b'%PDF'):
-                    continue
-                if response.status_code == 200:
-                    safe_title = clean_filename(title)
-                    filename = f"{paper_id} {safe_title}.pdf"
-                    filepath = os.path.join(output_dir, filename)
-                    with open(filepath, 'wb') as f:
-                        f.write(response.content)
-            
-            time.sleep(3)
+        if not isinstance(pdf_url, str) or not pdf_url:
+            continue
+        if 'arxiv.org' in pdf_url or 'acm.org' in pdf_url:
+            continue
+        if (paper_id, pdf_url) in settled and (paper_id, pdf_url) not in downloaded:
+            skipped += 1
+            metrics.count('pdf_fetch_total', domain=domain_of(pdf_url), result='hit')
+            continue
 
-        except Exception as e:
-            print(f"[Error] {title}: {e}")
+        jobs.append({
+            'paper_id': paper_id,
+            'url': pdf_url,
+            'output_path': store.staging_path(paper_id, pdf_url),
+            'headers': cache.validators(pdf_url) if cache is not None and (paper_id, pdf_url) in downloaded else {},
+        })
 
-def download_research_papers():
+    print(f"Skipping {skipped} papers already in the manifest.")
 
-    # research_papers: List[ResearchPaper] = get_all_research_papers()
-    # unique_research_papers: List[Dict] = get_unique_papers(research_papers=research_papers)
-        
-    # df = pd.DataFrame(unique_research_papers)
-    # df.to_csv('download_pdfs/research_paper_unique.csv', index=False)
+    def on_result(job: DownloadJob, result: DownloadResult):
+        domain = domain_of(job['url'])
+        metrics.count('pdf_outcomes_total', domain=domain, outcome=result['status'])
+        metrics.count('pdf_fetch_total', domain=domain, result='hit' if result['status'] == 'unchanged' else 'miss')
+        metrics.observe('pdf_download_seconds', result['elapsed'], domain=domain)
+        if result['status'] == 'unchanged':
+            return
+        metrics.count('pdf_bytes_total', result['bytes'], domain=domain)
+        metrics.observe('pdf_size_bytes', result['bytes'], buckets=SIZE_BUCKETS, domain=domain)
+        store.store_download(
+            job['paper_id'], job['url'], result['status'], path=job['output_path'],
+            sha256=result['sha256'], size=result['bytes'], detail=result['detail'],
+        )
+        if cache is not None and result['status'] == 'ok':
+            cache.remember(job['url'], 'pdf', etag=result['etag'], last_modified=result['last_modified'], content_hash=result['sha256'])
 
-    # print(f'Saved {df.shape[0]} unique research papers to csv.')
+    results = download_many(
+        jobs,
+        max_in_flight=max_in_flight,
+        per_host_concurrency=per_host_concurrency,
+        per_host_rps=per_host_rps,
+        on_result=on_result,
+    )
+
+    for result in results:
+        if result['status'] == 'error':
+            print(f"[Error] {result['paper_id']} {result['url']}: {result['detail']}")
+
+    return results
+
+UNIQUE_PAPERS_CSV = 'download_pdfs/research_paper_unique.csv'
+
+def deduplicate_research_papers(output_csv: str = UNIQUE_PAPERS_CSV, near_duplicate_threshold: Optional[float] = None,
+                                store: Optional[PaperStore] = None):
+    """
+    Collapse research_paper.csv into one row per paper and save it to the
+    Parquet paper store, with output_csv as a CSV export. Only the exact,
+    link-based dedup runs by default; with near_duplicate_threshold, papers
+    whose titles are at least that similar are merged as well.
+    """
+    unique_research_papers: List[Dict] = get_unique_papers(research_papers=iter_research_papers('research_paper.csv'))
+    if near_duplicate_threshold is not None:
+        unique_research_papers = merge_near_duplicates(unique_research_papers, threshold=near_duplicate_threshold)
+
+    df = pd.DataFrame(unique_research_papers)
+    df.to_csv(output_csv, index=False)
+    (store or PaperStore()).write_frame(df)
+
+    print(f'Saved {df.shape[0]} unique research papers to csv.')
 
-    # get_domain_count()
+    get_domain_count()
 
-    # download_with_api('download_pdfs/research_paper_unique.csv')
+def download_research_papers():
+    """
+    Runs the dedup, download and upload steps in order. pipeline.py runs the
+    same steps as cached stages, with the two downloads in parallel.
+    """
+    deduplicate_research_papers(UNIQUE_PAPERS_CSV)
 
-    # download_from_semantic_scholar('download_pdfs/research_paper_unique.csv')
+    download_with_api(UNIQUE_PAPERS_CSV, max_workers=4, requests_per_minute=60)
 
-    upload_csv_to_supabase('download_pdfs/research_paper_unique.csv')
+    download_from_semantic_scholar(UNIQUE_PAPERS_CSV)
 
+    sync_store_to_supabase()
@@ -0,0 +1,169 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple, TypedDict
+
+STORE_DIR = 'download_pdfs/pdf_store'
+MANIFEST_PATH = 'download_pdfs/manifest.sqlite3'
+
+# Outcomes that will not change on a rerun. Network errors, 5xx and 429
+# responses are retried on the next run.
+SETTLED_OUTCOMES = {'ok', 'not_pdf', 'too_large'}
+RETRYABLE_HTTP_CODES = {'408', '425', '429'}
+
+
+class ManifestEntry(TypedDict):
+    paper_id: str
+    url: str
+    sha256: str
+    size: int
+    fetched_at: str
+    outcome: str
+    detail: str
+
+
+def is_settled(outcome: str, detail: str = '') -> bool:
+    if outcome in SETTLED_OUTCOMES:
+        return True
+    if outcome == 'http_error':
+        return detail.startswith('4') and detail not in RETRYABLE_HTTP_CODES
+    return False
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PdfStore:
+    """
+    Content-addressed PDF store with a SQLite download manifest.
+
+    PDFs are stored once per SHA-256 under store_dir/<first two hex chars>/<sha256>.pdf,
+    so the same PDF reached through different links takes space only once. The
+    manifest maps (paper_id, url) to the hash, size, fetch time and outcome of the
+    last attempt, including failures and non-PDF responses.
+
+    Args:
+        store_dir: Directory that holds the PDFs
+        manifest_path: Path of the SQLite manifest
+    """
+
+    def __init__(self, store_dir: str = STORE_DIR, manifest_path: str = MANIFEST_PATH):
+        self.store_dir = store_dir
+        self.staging_dir = os.path.join(store_dir, 'staging')
+        os.makedirs(self.staging_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(manifest_path) or '.', exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(manifest_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS downloads (
+                paper_id TEXT NOT NULL,
+                url TEXT NOT NULL,
+                sha256 TEXT NOT NULL DEFAULT '',
+                size INTEGER NOT NULL DEFAULT 0,
+                fetched_at TEXT NOT NULL,
+                outcome TEXT NOT NULL,
+                detail TEXT NOT NULL DEFAULT '',
+                settled INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (paper_id, url)
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS downloads_sha256 ON downloads (sha256)')
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def path_for(self, sha256: str) -> str:
+        return os.path.join(self.store_dir, sha256[:2], f'{sha256}.pdf')
+
+    def staging_path(self, paper_id: str, url: str) -> str:
+        url_hash = hashlib.sha1(url.encode('utf-8')).hexdigest()[:10]
+        return os.path.join(self.staging_dir, f'{paper_id}-{url_hash}.pdf')
+
+    def settled_keys(self) -> Set[Tuple[str, str]]:
+        """
+        Returns the (paper_id, url) pairs that a rerun should skip.
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT paper_id, url FROM downloads WHERE settled = 1').fetchall()
+        return set(rows)
+
+    def unsettled_urls(self) -> List[str]:
+        """
+        Returns the URLs whose last download failed in a way a rerun may fix.
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT url FROM downloads WHERE settled = 0').fetchall()
+        return [row[0] for row in rows]
+
+    def ingest(self, path: str, sha256: Optional[str] = None) -> str:
+        """
+        Move a downloaded file into the store. If a PDF with the same hash is
+        already stored, the new copy is discarded.
+
+        Returns:
+            Path of the stored PDF
+        """
+        sha256 = sha256 or hash_file(path)
+        target = self.path_for(sha256)
+        if os.path.exists(target):
+            os.remove(path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+        return target
+
+    def record(self, paper_id: str, url: str, outcome: str, sha256: str = '', size: int = 0, detail: str = ''):
+        fetched_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO downloads (paper_id, url, sha256, size, fetched_at, outcome, detail, settled)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (paper_id, url) DO UPDATE SET
+                    sha256 = excluded.sha256, size = excluded.size, fetched_at = excluded.fetched_at,
+                    outcome = excluded.outcome, detail = excluded.detail, settled = excluded.settled
+                """,
+                (paper_id, url, sha256, size, fetched_at, outcome, detail, int(is_settled(outcome, detail))),
+            )
+            self._conn.commit()
+
+    def store_download(self, paper_id: str, url: str, outcome: str, path: str = '',
+                       sha256: str = '', size: int = 0, detail: str = ''):
+        """
+        Record a finished download attempt, moving the file into the store on success.
+        """
+        if outcome == 'ok':
+            sha256 = sha256 or hash_file(path)
+            size = size or os.path.getsize(path)
+            self.ingest(path, sha256)
+        self.record(paper_id, url, outcome, sha256=sha256, size=size, detail=detail)
+
+    def entries(self, outcome: Optional[str] = None) -> List[ManifestEntry]:
+        query = 'SELECT paper_id, url, sha256, size, fetched_at, outcome, detail FROM downloads'
+        params: Tuple = ()
+        if outcome:
+            query += ' WHERE outcome = ?'
+            params = (outcome,)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        return [
+            {'paper_id': r[0], 'url': r[1], 'sha256': r[2], 'size': r[3], 'fetched_at': r[4], 'outcome': r[5], 'detail': r[6]}
+            for r in rows
+        ]
+
+    def pdf_paths(self) -> Dict[str, str]:
+        """
+        Returns a mapping of paper_id to the stored PDF path for every successful download.
+        """
+        return {entry['paper_id']: self.path_for(entry['sha256']) for entry in self.entries(outcome='ok')}
@@ -0,0 +1,218 @@
+"""
+In-memory PostgREST-compatible stub for benchmarking the Supabase upload locally.
+
+It implements the subset of the PostgREST API that database.py uses: insert
+and upsert (POST with on_conflict and Prefer: resolution=merge-duplicates),
+select with eq/gt/in filters, order, limit/offset or a Range header, and
+delete. Artificial latency and a failure rate can be added to exercise the
+retry and batch-sizing logic.
+
+Usage:
+    python -m download_pdfs.postgrest_stub --port 54321 --latency 0.05
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=stub.stub.stub python app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+
+class StubDatabase:
+    """
+    Tables of rows kept in memory, keyed by table name.
+    """
+
+    def __init__(self):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.lock = threading.Lock()
+
+    def rows(self, table: str) -> List[Dict[str, Any]]:
+        return self.tables.setdefault(table, [])
+
+
+def _parse_value(raw: str) -> Any:
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+def _matches(row: Dict[str, Any], filters: List[Tuple[str, str, str]]) -> bool:
+    for column, operator, raw in filters:
+        value = row.get(column)
+        if operator == 'eq' and str(value) != raw:
+            return False
+        if operator == 'neq' and str(value) == raw:
+            return False
+        if operator in ('gt', 'gte', 'lt', 'lte'):
+            target = _parse_value(raw)
+            if value is None:
+                return False
+            if isinstance(target, (int, float)) and not isinstance(value, (int, float)):
+                target = raw
+            comparisons = {'gt': value > target, 'gte': value >= target, 'lt': value < target, 'lte': value <= target}
+            if not comparisons[operator]:
+                return False
+        if operator == 'in':
+            options = [option.strip().strip('"') for option in raw.strip('()').split(',')]
+            if str(value) not in options:
+                return False
+    return True
+
+
+def make_handler(database: StubDatabase, latency: float, failure_rate: float):
+
+    class PostgrestHandler(BaseHTTPRequestHandler):
+
+        def log_message(self, format, *args):
+            pass
+
+        def _table_and_query(self) -> Tuple[str, List[Tuple[str, str]]]:
+            parsed = urlparse(self.path)
+            table = parsed.path.rstrip('/').split('/')[-1]
+            return table, parse_qsl(parsed.query, keep_blank_values=True)
+
+        def _filters(self, query: List[Tuple[str, str]]) -> List[Tuple[str, str, str]]:
+            reserved = {'select', 'order', 'limit', 'offset', 'on_conflict', 'columns'}
+            filters = []
+            for key, value in query:
+                if key in reserved or '.' not in value:
+                    continue
+                operator, raw = value.split('.', 1)
+                filters.append((key, operator, raw))
+            return filters
+
+        def _send(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _simulate(self) -> bool:
+            if latency:
+                time.sleep(latency)
+            if failure_rate and random.random() < failure_rate:
+                self._send(503, {'message': 'stub: simulated failure'})
+                return False
+            return True
+
+        def do_GET(self):
+            if not self._simulate():
+                return
+            table, query = self._table_and_query()
+            params = dict(query)
+
+            with database.lock:
+                rows = [row for row in database.rows(table) if _matches(row, self._filters(query))]
+
+            if 'order' in params:
+                column, _, direction = params['order'].partition('.')
+                rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=direction.startswith('desc'))
+
+            offset = int(params.get('offset', 0))
+            limit = int(params['limit']) if 'limit' in params else None
+            range_header = self.headers.get('Range')
+            if range_header and '-' in range_header:
+                start, end = range_header.split('-', 1)
+                offset, limit = int(start), int(end) - int(start) + 1
+            rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+
+            select = params.get('select', '*')
+            if select != '*':
+                columns = [column.strip() for column in select.split(',')]
+                rows = [{column: row.get(column) for column in columns} for row in rows]
+
+            self._send(200, rows)
+
+        def do_POST(self):
+            if not self._simulate():
+                return
+            table, query = self._table_and_query()
+            params = dict(query)
+
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'[]')
+            new_rows = body if isinstance(body, list) else [body]
+
+            prefer = self.headers.get('Prefer', '')
+            merge = 'resolution=merge-duplicates' in prefer
+            conflict_column = params.get('on_conflict', 'paper_id')
+
+            with database.lock:
+                rows = database.rows(table)
+                position = {row.get(conflict_column): index for index, row in enumerate(rows)}
+                for new_row in new_rows:
+                    key = new_row.get(conflict_column)
+                    if key in position:
+                        if not merge:
+                            self._send(409, {'code': '23505', 'message': f'duplicate key value ({conflict_column})={key}'})
+                            return
+                        rows[position[key]].update(new_row)
+                    else:
+                        position[key] = len(rows)
+                        rows.append(dict(new_row))
+
+            self._send(201, new_rows if 'return=minimal' not in prefer else [])
+
+        def do_DELETE(self):
+            if not self._simulate():
+                return
+            table, query = self._table_and_query()
+            filters = self._filters(query)
+
+            with database.lock:
+                rows = database.rows(table)
+                deleted = [row for row in rows if _matches(row, filters)]
+                database.tables[table] = [row for row in rows if not _matches(row, filters)]
+
+            self._send(200, deleted)
+
+        def do_PATCH(self):
+            if not self._simulate():
+                return
+            table, query = self._table_and_query()
+            filters = self._filters(query)
+            length = int(self.headers.get('Content-Length', 0))
+            changes = json.loads(self.rfile.read(length) or b'{}')
+
+            with database.lock:
+                updated = [row for row in database.rows(table) if _matches(row, filters)]
+                for row in updated:
+                    row.update(changes)
+
+            self._send(200, updated)
+
+    return PostgrestHandler
+
+
+def start_stub(port: int = 54321, latency: float = 0.0, failure_rate: float = 0.0) -> Tuple[ThreadingHTTPServer, StubDatabase]:
+    """
+    Start the stub on a background thread.
+
+    Returns:
+        Tuple of (server, database); call server.shutdown() to stop it
+    """
+    database = StubDatabase()
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(database, latency, failure_rate))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, database
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local PostgREST-compatible stub for upload benchmarks.')
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every request')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    args = parser.parse_args()
+
+    database = StubDatabase()
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(database, args.latency, args.failure_rate))
+    print(f"PostgREST stub listening on http://127.0.0.1:{args.port}/rest/v1/")
+    server.serve_forever()
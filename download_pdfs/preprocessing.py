@@ -1,6 +1,6 @@
-from csv_utils import read_csv
-from scraper.custom_types import ResearchPaper
-from typing import List, Dict
+from csv_utils import iter_research_papers
+from scraper.custom_types import ResearchPaper, ResearchPaperRecord
+from typing import Iterable, List, Dict, Union
 
 import csv
 from urllib.parse import urlparse
@@ -8,48 +8,45 @@ from collections import Counter
 
 from tqdm.auto import tqdm
 
-def merge_papers(unique_research_papers: List[Dict], paper: ResearchPaper, matching_key: str):
+from .links import canonical_link, paper_id_for
 
-    paper_dict = next((x for x in unique_research_papers if x[matching_key] == paper[matching_key]))
+def add_staff(paper_dict: Dict, name: str, department: str, academic_title: str):
 
-    if paper_dict is None:
-        return
-    
-    if paper['name'] not in paper_dict['list_of_staff']:
-        paper_dict['list_of_staff'].append(paper['name'])
+    if name not in paper_dict['list_of_staff']:
+        paper_dict['list_of_staff'].append(name)
         paper_dict['number_of_staff'] += 1
         next_index = paper_dict['number_of_staff']
-        paper_dict[f'staff_name{next_index}'] = paper['name']
-        paper_dict[f'staff_dept{next_index}'] = paper['department']
-        paper_dict[f'staff_title{next_index}'] = paper['academic_title']
-
-def get_all_research_papers() -> List[ResearchPaper]:
-    research_papers: List[ResearchPaper] = []
-    csv_data, _ = read_csv('research_paper.csv')
-    for row in csv_data:
-        research_paper: ResearchPaper = {
-            'name': row.get('name', ''),
-            'link': row.get('link', ''),
-            'academic_title': row.get('academic_title', ''),
-            'department': row.get('department', ''),
-            'phone': row.get('phone', ''),
-            'email': row.get('email', ''),
-            'user_id': row.get('user_id', ''),
-            'paper_title': row.get('paper_title', ''),
-            'paper_link': row.get('paper_link', ''),
-            'year': row.get('year', '')
-        }
-        research_papers.append(research_paper)
-    return research_papers
-
-def get_unique_papers(research_papers: List[ResearchPaper]) -> List[Dict]:
+        paper_dict[f'staff_name{next_index}'] = name
+        paper_dict[f'staff_dept{next_index}'] = department
+        paper_dict[f'staff_title{next_index}'] = academic_title
+
+def merge_papers(paper_dict: Dict, paper: ResearchPaper):
+    add_staff(paper_dict, paper['name'], paper['department'], paper['academic_title'])
+
+def merge_paper_dicts(paper_dict: Dict, duplicate: Dict):
+    for index in range(1, duplicate['number_of_staff'] + 1):
+        add_staff(
+            paper_dict,
+            duplicate[f'staff_name{index}'],
+            duplicate[f'staff_dept{index}'],
+            duplicate[f'staff_title{index}'],
+        )
+
+def get_all_research_papers() -> List[ResearchPaperRecord]:
+    return list(iter_research_papers('research_paper.csv'))
+
+def get_unique_papers(research_papers: Iterable[Union[ResearchPaper, ResearchPaperRecord]]) -> List[Dict]:
+    """
+    Collapse paper rows into one dict per canonical link. research_papers may
+    be a generator such as iter_research_papers(), so only the unique papers
+    are ever held in memory.
+    """
 
     unique_research_papers: List[Dict] = []
+    papers_by_link: Dict[str, Dict] = {}
 
-    matching_key = 'paper_link'
-    paper_id = 1
-
-    progress_bar = tqdm(total=len(research_papers), desc="Processing research papers")
+    total = len(research_papers) if isinstance(research_papers, list) else None
+    progress_bar = tqdm(total=total, desc="Processing research papers")
 
     for paper in research_papers:
 
@@ -58,9 +55,12 @@ def get_unique_papers(research_papers: List[ResearchPaper]) -> List[Dict]:
         if not paper['paper_link']:
             continue
 
-        if paper[matching_key] not in map(lambda x: x[matching_key], unique_research_papers):
+        link_key = canonical_link(paper['paper_link'])
+        paper_dict = papers_by_link.get(link_key)
+
+        if paper_dict is None:
             new_paper = {
-                'paper_id': str(paper_id),
+                'paper_id': paper_id_for(paper['paper_link']),
                 'paper_title': paper['paper_title'],
                 'paper_link': paper['paper_link'],
                 'year': paper['year'],
@@ -71,11 +71,11 @@ def get_unique_papers(research_papers: List[ResearchPaper]) -> List[Dict]:
                 'staff_title1': paper['academic_title'],
             }
             unique_research_papers.append(new_paper)
-            paper_id += 1
+            papers_by_link[link_key] = new_paper
             continue
 
         ## Duplicate exists
-        merge_papers(unique_research_papers=unique_research_papers, paper=paper, matching_key=matching_key)
+        merge_papers(paper_dict=paper_dict, paper=paper)
         
     return unique_research_papers
 
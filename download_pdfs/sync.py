@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, TypedDict
+
+import pandas as pd
+
+from .paper_store import PaperStore
+from .database import supabase, iter_prepared_rows, iter_table_keyset, upsert_rows
+
+SNAPSHOT_FILE = 'download_pdfs/sync_snapshot.json'
+
+
+class SyncDelta(TypedDict):
+    inserts: List[Dict[str, Any]]
+    updates: List[Dict[str, Any]]
+    deletes: List[str]
+
+
+def row_hash(row: Dict[str, Any], columns: List[str]) -> str:
+    """
+    Hash of a row's values over the given columns, stable across runs and
+    across the local and remote representations of the same row. Null
+    columns are left out, so a wider frame (one more staff slot on some
+    paper) does not change the hash of every other row.
+    """
+    normalized = {column: row[column] for column in columns if row.get(column) is not None}
+    payload = json.dumps(normalized, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def load_snapshot(snapshot_file: str = SNAPSHOT_FILE) -> Optional[Dict[str, str]]:
+    if not os.path.exists(snapshot_file):
+        return None
+    with open(snapshot_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_snapshot(snapshot: Dict[str, str], snapshot_file: str = SNAPSHOT_FILE):
+    temp_file = f'{snapshot_file}.tmp'
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+    os.replace(temp_file, snapshot_file)
+
+def fetch_remote_snapshot(columns: List[str], table: str = 'research_papers', page_size: int = 1000) -> Dict[str, str]:
+    """
+    Build the paper_id -> row hash snapshot from the table itself with keyset
+    pagination. Only needed when there is no local snapshot yet or it is suspect.
+    """
+    snapshot: Dict[str, str] = {}
+    for page in iter_table_keyset(table, ','.join(columns), page_size=page_size):
+        for row in page:
+            snapshot[str(row['paper_id'])] = row_hash(row, columns)
+    return snapshot
+
+def diff_rows(rows: Iterable[Dict[str, Any]], snapshot: Dict[str, str], columns: List[str],
+              local_ids: Set[str]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Split rows into (inserts, updates) against the snapshot, adding every
+    paper_id seen to local_ids so deletes can be found once all rows are diffed.
+    """
+    inserts: List[Dict[str, Any]] = []
+    updates: List[Dict[str, Any]] = []
+    for row in rows:
+        paper_id = str(row['paper_id'])
+        local_ids.add(paper_id)
+        previous = snapshot.get(paper_id)
+        if previous is None:
+            inserts.append(row)
+        elif previous != row_hash(row, columns):
+            updates.append(row)
+    return inserts, updates
+
+def compute_delta(rows: List[Dict[str, Any]], snapshot: Dict[str, str], columns: List[str]) -> SyncDelta:
+    local_ids: Set[str] = set()
+    inserts, updates = diff_rows(rows, snapshot, columns, local_ids)
+    deletes = [paper_id for paper_id in snapshot if paper_id not in local_ids]
+    return {'inserts': inserts, 'updates': updates, 'deletes': deletes}
+
+def delete_rows(paper_ids: List[str], table: str = 'research_papers', chunk_size: int = 200) -> int:
+    deleted = 0
+    for i in range(0, len(paper_ids), chunk_size):
+        chunk = paper_ids[i:i + chunk_size]
+        response = supabase.table(table).delete().in_('paper_id', chunk).execute()
+        deleted += len(response.data)
+    return deleted
+
+def sync_frame_to_supabase(df: pd.DataFrame, snapshot_file: str = SNAPSHOT_FILE, rebuild_snapshot: bool = False,
+                           delete_missing: bool = True, max_workers: int = 4, batch_size: int = 100,
+                           chunk_rows: int = 10000) -> int:
+    """
+    Incrementally sync a research_paper_unique frame to Supabase.
+    Returns the number of rows that could not be written; they stay out of
+    the snapshot, so the next sync sends them again.
+
+    A local snapshot of paper_id -> row hash records what the table holds.
+    Each run diffs the frame against the snapshot and sends only the inserts,
+    updates and deletes, so the cost follows the size of the change rather than
+    the size of the table. The table is only read, with keyset pagination, when
+    the snapshot is missing or rebuild_snapshot is set.
+
+    Rows are prepared, diffed and upserted chunk_rows at a time, so memory
+    holds one chunk of row dicts plus the snapshot rather than every row.
+
+    Args:
+        df: Papers in the research_paper_unique layout
+        snapshot_file: Local snapshot of the remote table
+        rebuild_snapshot: Rebuild the snapshot from the table before diffing
+        delete_missing: Delete rows whose paper_id is no longer in the frame
+        max_workers: Maximum number of concurrent upsert requests
+        batch_size: Initial upsert batch size
+        chunk_rows: Rows prepared and diffed at a time
+    """
+    # Exactly the columns the upsert writes; anything else the table holds is not compared
+    columns = list(df.columns)
+
+    snapshot = None if rebuild_snapshot else load_snapshot(snapshot_file)
+    if snapshot is None:
+        print("Reading row hashes from the database to build the snapshot...")
+        snapshot = fetch_remote_snapshot(columns)
+
+    local_ids: Set[str] = set()
+    total_inserts, total_updates = 0, 0
+    total_written, total_failed = 0, 0
+    for rows in iter_prepared_rows(df, chunk_rows):
+        inserts, updates = diff_rows(rows, snapshot, columns, local_ids)
+        total_inserts += len(inserts)
+        total_updates += len(updates)
+        changed = inserts + updates
+        if not changed:
+            continue
+
+        failed_rows: List[Dict[str, Any]] = []
+        written, failed = upsert_rows(changed, max_workers=max_workers, batch_size=batch_size, failed_rows=failed_rows)
+        total_written += written
+        total_failed += failed
+
+        failed_ids = {str(row['paper_id']) for row in failed_rows}
+        for row in changed:
+            paper_id = str(row['paper_id'])
+            if paper_id not in failed_ids:
+                snapshot[paper_id] = row_hash(row, columns)
+        # An interrupted run keeps what was already written
+        save_snapshot(snapshot, snapshot_file)
+
+    deletes = [paper_id for paper_id in snapshot if paper_id not in local_ids]
+    print(f"Inserts: {total_inserts}, updates: {total_updates}, "
+          f"deletes: {len(deletes) if delete_missing else 0}, unchanged: "
+          f"{len(df) - total_inserts - total_updates}")
+
+    total_deleted = 0
+    if delete_missing and deletes:
+        total_deleted = delete_rows(deletes)
+        for paper_id in deletes:
+            snapshot.pop(paper_id, None)
+        save_snapshot(snapshot, snapshot_file)
+    elif not os.path.exists(snapshot_file):
+        save_snapshot(snapshot, snapshot_file)
+
+    print(f"\n{'='*60}")
+    print("Sync complete!")
+    print(f"Total upserted: {total_written}")
+    print(f"Total failed: {total_failed}")
+    print(f"Total deleted: {total_deleted}")
+    print(f"{'='*60}")
+
+    return total_failed
+
+def sync_csv_to_supabase(csv_path: str, snapshot_file: str = SNAPSHOT_FILE, rebuild_snapshot: bool = False,
+                         delete_missing: bool = True, max_workers: int = 4, batch_size: int = 100) -> int:
+    """
+    Incrementally sync research_paper_unique.csv to Supabase; see sync_frame_to_supabase.
+
+    Example:
+        sync_csv_to_supabase('download_pdfs/research_paper_unique.csv')
+    """
+    df = pd.read_csv(csv_path, dtype={'paper_id': str})
+    return sync_frame_to_supabase(df, snapshot_file, rebuild_snapshot, delete_missing, max_workers, batch_size)
+
+def sync_store_to_supabase(store: Optional[PaperStore] = None, snapshot_file: str = SNAPSHOT_FILE,
+                           rebuild_snapshot: bool = False, delete_missing: bool = True,
+                           max_workers: int = 4, batch_size: int = 100) -> int:
+    """
+    Incrementally sync the Parquet paper store to Supabase; see sync_frame_to_supabase.
+
+    Example:
+        sync_store_to_supabase(PaperStore())
+    """
+    store = store or PaperStore()
+    return sync_frame_to_supabase(store.to_wide_frame(), snapshot_file, rebuild_snapshot, delete_missing, max_workers, batch_size)
@@ -0,0 +1,387 @@
+import multiprocessing
+import os
+import queue
+import re
+import signal
+import sqlite3
+import threading
+import time
+import zlib
+from itertools import chain
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TypedDict
+
+from tqdm.auto import tqdm
+
+from metrics import metrics
+
+from .pdf_store import PdfStore
+
+TEXT_STORE_PATH = 'download_pdfs/pdf_text.sqlite3'
+
+# Outcomes that depend only on the PDF's bytes, so a file with the same hash
+# is not extracted again. 'crashed' (the worker process died) is retried.
+SETTLED_OUTCOMES = {'ok', 'empty', 'timeout', 'error'}
+
+ABSTRACT_HEADING = re.compile(r'\babstract\b[\s.:—-]*', re.IGNORECASE)
+ABSTRACT_END = re.compile(
+    r'\n\s*(?:(?:1|I)\.?\s+)?(?:introduction|keywords|key words|index terms|ccs concepts|acm reference format)\b',
+    re.IGNORECASE,
+)
+MAX_ABSTRACT_CHARS = 3000
+
+# A worker stuck this long past the per-file timeout (e.g. inside C code, where
+# SIGALRM is not delivered) is killed and the pool rebuilt
+HANG_GRACE_SECONDS = 30
+POLL_SECONDS = 1.0
+
+
+class ExtractedText(TypedDict):
+    paper_id: str
+    sha256: str
+    outcome: str
+    detail: str
+    page_count: int
+    title: str
+    abstract: str
+    chars: int
+    extracted_at: str
+
+
+class ExtractionTimeout(BaseException):
+    """
+    Raised by SIGALRM. A BaseException, so pypdf's own except Exception
+    handlers cannot swallow it and keep parsing.
+    """
+
+
+def guess_abstract(text: str) -> str:
+    """
+    Returns the text between an "Abstract" heading and the next section
+    heading, or else the first long paragraph, from the opening pages of a paper.
+    """
+    heading = ABSTRACT_HEADING.search(text)
+    if heading:
+        rest = text[heading.end():]
+        end = ABSTRACT_END.search(rest)
+        abstract = rest[:end.start()] if end else rest[:MAX_ABSTRACT_CHARS]
+    else:
+        paragraphs = [paragraph for paragraph in re.split(r'\n\s*\n', text) if len(paragraph) >= 400]
+        abstract = paragraphs[0] if paragraphs else ''
+    return ' '.join(abstract.split())[:MAX_ABSTRACT_CHARS]
+
+def empty_result(outcome: str = 'ok', detail: str = '') -> Dict[str, Any]:
+    return {'outcome': outcome, 'detail': detail, 'page_count': 0, 'title': '', 'abstract': '', 'text': b'', 'chars': 0}
+
+def _raise_timeout(signum, frame):
+    raise ExtractionTimeout()
+
+def extract_pdf(path: str, timeout: float = 60, max_pages: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Extract the text, page count, title and abstract of one PDF. Runs in a
+    worker process; on platforms with SIGALRM a file that takes longer than
+    timeout seconds is abandoned with outcome 'timeout'.
+
+    Returns:
+        Dict with outcome, detail, page_count, title, abstract and the zlib-compressed text
+    """
+    from pypdf import PdfReader
+
+    result = empty_result()
+    use_alarm = timeout and hasattr(signal, 'setitimer')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    try:
+        reader = PdfReader(path)
+        result['page_count'] = len(reader.pages)
+        metadata_title = reader.metadata.title if reader.metadata else None
+        result['title'] = ' '.join(str(metadata_title).split()) if metadata_title else ''
+
+        pages: List[str] = []
+        for page in reader.pages[:max_pages]:
+            try:
+                pages.append(page.extract_text() or '')
+            except Exception:
+                # One unreadable page should not lose the rest of the paper
+                pages.append('')
+
+        text = '\n\n'.join(pages).strip()
+        if not text:
+            result['outcome'] = 'empty'
+            result['detail'] = 'no text layer'
+        result['abstract'] = guess_abstract('\n\n'.join(pages[:2]))
+        result['text'] = zlib.compress(text.encode('utf-8'), 6)
+        result['chars'] = len(text)
+    except ExtractionTimeout:
+        result['outcome'] = 'timeout'
+        result['detail'] = f'over {timeout:g}s'
+    except Exception as e:
+        result['outcome'] = 'error'
+        result['detail'] = f'{type(e).__name__}: {e}'[:500]
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    return result
+
+
+# Set in each worker process by start_worker
+_started_queue: Optional[Any] = None
+
+def start_worker(started_queue):
+    global _started_queue
+    _started_queue = started_queue
+
+def extract_pdf_in_worker(path: str, timeout: float = 60, max_pages: Optional[int] = None) -> Dict[str, Any]:
+    """
+    extract_pdf, after telling the parent when this worker picked the file up.
+    A submitted future counts as running while it still waits in the pool's
+    call queue, so only the worker knows when the file really started.
+    """
+    if _started_queue is not None:
+        _started_queue.put((path, time.time()))
+    return extract_pdf(path, timeout, max_pages)
+
+def terminate_pool(executor: ProcessPoolExecutor):
+    """
+    Shut a process pool down without waiting for its workers, killing any that
+    are still busy. shutdown() alone would leave a hung worker running.
+    """
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+class TextStore:
+    """
+    SQLite store of the text extracted from each paper's PDF, keyed by paper_id.
+    The text is kept zlib-compressed; the SHA-256 of the PDF it came from is
+    kept alongside so unchanged PDFs are not extracted again.
+
+    Args:
+        path: Path of the SQLite database
+    """
+
+    def __init__(self, path: str = TEXT_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS texts (
+                paper_id TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                outcome TEXT NOT NULL,
+                detail TEXT NOT NULL DEFAULT '',
+                page_count INTEGER NOT NULL DEFAULT 0,
+                title TEXT NOT NULL DEFAULT '',
+                abstract TEXT NOT NULL DEFAULT '',
+                text BLOB NOT NULL DEFAULT x'',
+                chars INTEGER NOT NULL DEFAULT 0,
+                extracted_at TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def settled_hashes(self) -> Dict[str, str]:
+        """
+        Returns paper_id -> sha256 of every PDF whose extraction need not be repeated.
+        """
+        placeholders = ','.join('?' * len(SETTLED_OUTCOMES))
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT paper_id, sha256 FROM texts WHERE outcome IN ({placeholders})', tuple(SETTLED_OUTCOMES)
+            ).fetchall()
+        return dict(rows)
+
+    def write(self, paper_ids: List[str], sha256: str, result: Dict[str, Any]):
+        """
+        Store one extraction result under every paper_id that shares the PDF.
+        """
+        extracted_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        rows = [
+            (paper_id, sha256, result['outcome'], result['detail'], result['page_count'], result['title'],
+             result['abstract'], result['text'], result['chars'], extracted_at)
+            for paper_id in paper_ids
+        ]
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO texts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self._conn.commit()
+
+    def hashes(self, outcome: str = 'ok') -> Dict[str, str]:
+        """
+        Returns paper_id -> sha256 of every paper whose extraction ended with outcome.
+        """
+        with self._lock:
+            return dict(self._conn.execute('SELECT paper_id, sha256 FROM texts WHERE outcome = ?', (outcome,)).fetchall())
+
+    def get(self, paper_id: str) -> Optional[ExtractedText]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT paper_id, sha256, outcome, detail, page_count, title, abstract, chars, extracted_at FROM texts WHERE paper_id = ?',
+                (paper_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {'paper_id': row[0], 'sha256': row[1], 'outcome': row[2], 'detail': row[3], 'page_count': row[4],
+                'title': row[5], 'abstract': row[6], 'chars': row[7], 'extracted_at': row[8]}
+
+    def text(self, paper_id: str) -> str:
+        with self._lock:
+            row = self._conn.execute('SELECT text FROM texts WHERE paper_id = ?', (paper_id,)).fetchone()
+        return zlib.decompress(row[0]).decode('utf-8') if row and row[0] else ''
+
+    def iter_texts(self) -> Iterator[Tuple[str, str, str]]:
+        """
+        Yields (paper_id, abstract, text) for every paper with extracted text.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT paper_id, abstract, text FROM texts WHERE outcome = 'ok' ORDER BY paper_id").fetchall()
+        for paper_id, abstract, text in rows:
+            yield paper_id, abstract, zlib.decompress(text).decode('utf-8')
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute('SELECT outcome, COUNT(*) FROM texts GROUP BY outcome').fetchall())
+
+
+def extract_texts(pdf_store: Optional[PdfStore] = None, text_store: Optional[TextStore] = None,
+                  max_workers: Optional[int] = None, timeout: float = 60, max_pages: Optional[int] = None,
+                  force: bool = False) -> Dict[str, int]:
+    """
+    Extract the text of every downloaded PDF into the text store with a pool
+    of worker processes, one per core by default. PDFs whose hash matches
+    their last extraction are skipped, and a PDF shared by several papers is
+    extracted once.
+
+    Args:
+        pdf_store: Store and manifest of the downloaded PDFs
+        text_store: Where to write the results (defaults to download_pdfs/pdf_text.sqlite3)
+        max_workers: Worker processes (defaults to the number of cores)
+        timeout: Seconds a single PDF may take before it is abandoned; a worker still busy
+                 HANG_GRACE_SECONDS after that is killed and the pool restarted
+        max_pages: Only read the first max_pages pages of each PDF
+        force: Extract every PDF again
+
+    Returns:
+        Number of PDFs per outcome in this run, plus 'skipped'
+    """
+    pdf_store = pdf_store or PdfStore()
+    text_store = text_store or TextStore()
+    max_workers = max_workers or os.cpu_count() or 1
+
+    settled = {} if force else text_store.settled_hashes()
+    papers_by_hash: Dict[str, List[str]] = {}
+    skipped = 0
+    for entry in pdf_store.entries(outcome='ok'):
+        if settled.get(entry['paper_id']) == entry['sha256']:
+            skipped += 1
+            continue
+        papers = papers_by_hash.setdefault(entry['sha256'], [])
+        if entry['paper_id'] not in papers:
+            papers.append(entry['paper_id'])
+
+    print(f"Extracting text from {len(papers_by_hash)} PDFs with {max_workers} processes ({skipped} unchanged)")
+    counts: Dict[str, int] = {'skipped': skipped}
+    progress_bar = tqdm(total=len(papers_by_hash), desc="Extracting PDF text", unit="pdf")
+    pending = iter(papers_by_hash.items())
+
+    def finish(sha256: str, paper_ids: List[str], result: Dict[str, Any], elapsed: float):
+        text_store.write(paper_ids, sha256, result)
+        counts[result['outcome']] = counts.get(result['outcome'], 0) + 1
+        metrics.count('pdf_extract_total', outcome=result['outcome'])
+        metrics.observe('pdf_extract_seconds', elapsed)
+        if result['outcome'] not in ('ok', 'empty'):
+            print(f"[{result['outcome']}] {', '.join(paper_ids)}: {result['detail']}")
+        progress_bar.update(1)
+
+    # The parent's own deadline, for workers the alarm cannot interrupt
+    hang_deadline = timeout + HANG_GRACE_SECONDS if timeout else None
+
+    context = multiprocessing.get_context()
+
+    def start_pool() -> Tuple[ProcessPoolExecutor, Any]:
+        # A fresh queue per pool, so a killed worker cannot leave it half written
+        started_queue = context.Queue()
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=start_worker,
+                                   initargs=(started_queue,)), started_queue
+
+    executor, started_queue = start_pool()
+    try:
+        # Keep a bounded number of files queued so results stream into the
+        # store instead of piling up in memory.
+        in_flight: Dict[Future, Tuple[str, List[str], float]] = {}
+        worker_started: Dict[str, float] = {}
+        while True:
+            for sha256, paper_ids in pending:
+                future = executor.submit(extract_pdf_in_worker, pdf_store.path_for(sha256), timeout, max_pages)
+                in_flight[future] = (sha256, paper_ids, time.perf_counter())
+                if len(in_flight) >= max_workers * 2:
+                    break
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, timeout=POLL_SECONDS if hang_deadline else None, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                sha256, paper_ids, started = in_flight.pop(future)
+                worker_started.pop(pdf_store.path_for(sha256), None)
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    # A worker died (e.g. out of memory). Every file in flight
+                    # is recorded as crashed and retried on the next run.
+                    broken = True
+                    result = empty_result('crashed', str(e))
+                finish(sha256, paper_ids, result, time.perf_counter() - started)
+
+            # A file's clock starts when a worker reports picking it up
+            while True:
+                try:
+                    path, started_at = started_queue.get_nowait()
+                except queue.Empty:
+                    break
+                worker_started[path] = started_at
+            now = time.time()
+            hung = {
+                future for future, (sha256, _, _) in in_flight.items()
+                if hang_deadline and now - worker_started.get(pdf_store.path_for(sha256), now) > hang_deadline
+            }
+            if not broken and not hung:
+                continue
+
+            requeue: List[Tuple[str, List[str]]] = []
+            for future, (sha256, paper_ids, started) in in_flight.items():
+                if broken:
+                    finish(sha256, paper_ids, empty_result('crashed', 'worker pool restarted'), 0.0)
+                elif future in hung:
+                    metrics.count('pdf_extract_hung_total')
+                    finish(sha256, paper_ids, empty_result('timeout', f'worker hung for over {hang_deadline:g}s, killed'),
+                           time.perf_counter() - started)
+                else:
+                    # Interrupted by the restart, not at fault
+                    requeue.append((sha256, paper_ids))
+            in_flight, worker_started = {}, {}
+            pending = chain(requeue, pending)
+            terminate_pool(executor)
+            started_queue.close()
+            executor, started_queue = start_pool()
+    finally:
+        executor.shutdown(cancel_futures=True)
+        started_queue.close()
+
+    progress_bar.close()
+    print(f"Text extraction finished: {counts}")
+    return counts
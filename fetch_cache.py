@@ -0,0 +1,227 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, TypedDict
+
+import requests
+
+CACHE_DIR = '.cache/http'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Seconds a cached body is served without asking the server again
+DEFAULT_TTLS: Dict[str, float] = {
+    'scholar': 24 * 3600,
+    'uic': 7 * 24 * 3600,
+    'pdf': 30 * 24 * 3600,
+    'default': 24 * 3600,
+}
+
+
+class CachedResponse(TypedDict):
+    url: str
+    status: int
+    body: bytes
+    content_hash: str
+    from_cache: bool
+    unchanged: bool
+
+
+class CacheEntry(TypedDict):
+    url: str
+    etag: str
+    last_modified: str
+    content_hash: str
+    size: int
+    fetched_at: float
+
+
+class FetchCache:
+    """
+    On-disk HTTP cache shared by the scrapers and the PDF downloaders.
+
+    Bodies are stored on disk under their URL hash, with the ETag,
+    Last-Modified and content hash in a SQLite index. Entries younger than their
+    source's TTL are served without a request; older ones are revalidated with
+    a conditional request. Least recently used bodies are evicted once the cache
+    is over max_bytes. Every response says whether the content is unchanged
+    since the last fetch, so callers can skip re-parsing it.
+
+    Args:
+        cache_dir: Directory for the bodies and the index
+        max_bytes: Byte budget for stored bodies
+        ttls: Per-source TTLs in seconds, merged over DEFAULT_TTLS
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES, ttls: Optional[Dict[str, float]] = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite3'), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                etag TEXT NOT NULL DEFAULT '',
+                last_modified TEXT NOT NULL DEFAULT '',
+                content_hash TEXT NOT NULL DEFAULT '',
+                size INTEGER NOT NULL DEFAULT 0,
+                has_body INTEGER NOT NULL DEFAULT 0,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _body_path(self, url: str) -> str:
+        url_hash = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, url_hash[:2], url_hash)
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT etag, last_modified, content_hash, size, fetched_at FROM entries WHERE url = ?', (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'url': url, 'etag': row[0], 'last_modified': row[1], 'content_hash': row[2], 'size': row[3], 'fetched_at': row[4]}
+
+    def validators(self, url: str) -> Dict[str, str]:
+        """
+        Returns the conditional request headers for url, or {} when it is not cached.
+        """
+        entry = self.lookup(url)
+        headers: Dict[str, str] = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def remember(self, url: str, source: str, etag: str = '', last_modified: str = '', content_hash: str = '',
+                 body: Optional[bytes] = None):
+        """
+        Records the validators of a response. Callers that keep bodies
+        elsewhere, like the PDF store, pass no body.
+        """
+        now = time.time()
+        size = 0
+        if body is not None:
+            path = self._body_path(url)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(body)
+            size = len(body)
+
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO entries (url, source, etag, last_modified, content_hash, size, has_body, fetched_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    source = excluded.source, etag = excluded.etag, last_modified = excluded.last_modified,
+                    content_hash = excluded.content_hash, size = excluded.size, has_body = excluded.has_body,
+                    fetched_at = excluded.fetched_at, last_access = excluded.last_access
+                """,
+                (url, source, etag, last_modified, content_hash, size, int(body is not None), now, now),
+            )
+            self._conn.commit()
+
+        if body is not None:
+            self.evict()
+
+    def forget(self, url: str):
+        """
+        Drops url from the cache, e.g. after a block page was stored under it.
+        """
+        path = self._body_path(url)
+        if os.path.exists(path):
+            os.remove(path)
+        with self._lock:
+            self._conn.execute('DELETE FROM entries WHERE url = ?', (url,))
+            self._conn.commit()
+
+    def _touch(self, url: str, revalidated: bool = False):
+        now = time.time()
+        with self._lock:
+            if revalidated:
+                self._conn.execute('UPDATE entries SET last_access = ?, fetched_at = ? WHERE url = ?', (now, now, url))
+            else:
+                self._conn.execute('UPDATE entries SET last_access = ? WHERE url = ?', (now, url))
+            self._conn.commit()
+
+    def _read_body(self, url: str) -> Optional[bytes]:
+        path = self._body_path(url)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def evict(self):
+        """
+        Deletes least recently used bodies until the cache fits in max_bytes.
+        """
+        with self._lock:
+            total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries WHERE has_body = 1').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            rows = self._conn.execute('SELECT url, size FROM entries WHERE has_body = 1 ORDER BY last_access').fetchall()
+            for url, size in rows:
+                if total <= self.max_bytes:
+                    break
+                path = self._body_path(url)
+                if os.path.exists(path):
+                    os.remove(path)
+                self._conn.execute('DELETE FROM entries WHERE url = ?', (url,))
+                total -= size
+            self._conn.commit()
+
+    def get(self, session: requests.Session, url: str, source: str = 'default', timeout: float = 15) -> CachedResponse:
+        """
+        Fetch url through the cache.
+
+        Returns:
+            CachedResponse whose `unchanged` is True when the body is the same as the cached one
+        """
+        entry = self.lookup(url)
+        cached_body = self._read_body(url) if entry else None
+        ttl = self.ttls.get(source, self.ttls['default'])
+
+        if entry and cached_body is not None and time.time() - entry['fetched_at'] < ttl:
+            self._touch(url)
+            return {'url': url, 'status': 200, 'body': cached_body, 'content_hash': entry['content_hash'],
+                    'from_cache': True, 'unchanged': True}
+
+        headers = self.validators(url) if cached_body is not None else {}
+        response = session.get(url, headers=headers, timeout=timeout)
+
+        if response.status_code == 304 and entry and cached_body is not None:
+            self._touch(url, revalidated=True)
+            return {'url': url, 'status': 200, 'body': cached_body, 'content_hash': entry['content_hash'],
+                    'from_cache': True, 'unchanged': True}
+
+        body = response.content
+        content_hash = hashlib.sha256(body).hexdigest()
+        unchanged = bool(entry) and entry['content_hash'] == content_hash
+
+        if response.status_code == 200:
+            self.remember(
+                url, source,
+                etag=response.headers.get('ETag', ''),
+                last_modified=response.headers.get('Last-Modified', ''),
+                content_hash=content_hash,
+                body=body,
+            )
+
+        return {'url': url, 'status': response.status_code, 'body': body, 'content_hash': content_hash,
+                'from_cache': False, 'unchanged': unchanged}
@@ -0,0 +1,268 @@
+"""
+Lightweight run metrics: counters, timers and histograms with labels.
+
+Modules record through the shared `metrics` instance. Recording is off until
+metrics.enable() is called (or CRAWLER_METRICS=1 is set), and while off every
+call returns right after one attribute check, so the hooks can stay in hot
+paths.
+
+    from metrics import metrics
+
+    metrics.count('pdf_fetch_total', domain='arxiv.org', result='hit')
+    metrics.observe('http_request_seconds', 0.42, domain='scholar.google.com')
+    with metrics.timer('stage_seconds', stage='dedup'):
+        ...
+
+    metrics.write_json('run_report.json')
+    metrics.write_prometheus('metrics.prom')
+"""
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 512 * 1024, 1024 ** 2, 5 * 1024 ** 2, 20 * 1024 ** 2, 50 * 1024 ** 2)
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+def domain_of(url: str) -> str:
+    return urlparse(url).netloc.lower() if isinstance(url, str) else ''
+
+def format_sample(value: float) -> str:
+    """
+    A Prometheus sample value at full precision: whole numbers as integers,
+    others as the shortest float repr that round-trips.
+    """
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Upper bound of the bucket that holds the q-th quantile.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': {str(bound): count for bound, count in zip(self.buckets + ('+Inf',), self.counts)},
+        }
+
+
+class _NullTimer:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+
+    def __init__(self, metrics: 'Metrics', name: str, buckets: Sequence[float], labels: Dict[str, Any]):
+        self.metrics = metrics
+        self.name = name
+        self.buckets = buckets
+        self.labels = labels
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.seconds = time.perf_counter() - self._start
+        self.metrics.observe(self.name, self.seconds, buckets=self.buckets, **self.labels)
+        if exc_type is not None:
+            self.metrics.count(f'{self.name.removesuffix("_seconds")}_errors_total', **self.labels)
+        return False
+
+
+class Metrics:
+    """
+    Thread-safe store of labelled counters and histograms.
+
+    Counters should be named *_total and timings *_seconds, as in Prometheus.
+    A counter with a `result` label of hit/miss also gets a hit rate per label
+    set in the JSON report.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+            self.started_at = time.time()
+
+    @staticmethod
+    def _key(labels: Dict[str, Any]) -> LabelKey:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    def count(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def timer(self, name: str, buckets: Sequence[float] = LATENCY_BUCKETS, **labels):
+        """
+        Context manager that observes its elapsed seconds into the histogram `name`,
+        and counts <name without _seconds>_errors_total when the block raises.
+        """
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self, name, buckets, labels)
+
+    def hit_rates(self) -> Dict[str, List[Dict[str, Any]]]:
+        rates: Dict[str, List[Dict[str, Any]]] = {}
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+
+        for name, series in counters.items():
+            grouped: Dict[LabelKey, Dict[str, float]] = {}
+            for key, value in series.items():
+                labels = dict(key)
+                result = labels.pop('result', None)
+                if result not in ('hit', 'miss'):
+                    continue
+                grouped.setdefault(self._key(labels), {'hit': 0, 'miss': 0})[result] += value
+            if grouped:
+                rates[name] = [
+                    {**dict(key), 'hits': counts['hit'], 'misses': counts['miss'],
+                     'hit_rate': round(counts['hit'] / (counts['hit'] + counts['miss']), 4)}
+                    for key, counts in sorted(grouped.items())
+                ]
+        return rates
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {
+                name: [{**dict(key), 'value': value} for key, value in sorted(series.items())]
+                for name, series in sorted(self._counters.items())
+            }
+            histograms = {
+                name: [{**dict(key), **histogram.summary()} for key, histogram in sorted(series.items())]
+                for name, series in sorted(self._histograms.items())
+            }
+        return {
+            'started_at': datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(timespec='seconds'),
+            'elapsed_seconds': round(time.time() - self.started_at, 3),
+            'counters': counters,
+            'histograms': histograms,
+            'hit_rates': self.hit_rates(),
+        }
+
+    def write_json(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def to_prometheus(self) -> str:
+        """
+        Render every series in the Prometheus text exposition format.
+        """
+        def labels_text(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = key + extra
+            if not pairs:
+                return ''
+            escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+            return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f'# TYPE {name} counter')
+                for key, value in sorted(series.items()):
+                    lines.append(f'{name}{labels_text(key)} {format_sample(value)}')
+
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f'# TYPE {name} histogram')
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{labels_text(key, (("le", format_sample(bound)),))} {cumulative}')
+                    lines.append(f'{name}_bucket{labels_text(key, (("le", "+Inf"),))} {histogram.count}')
+                    lines.append(f'{name}_sum{labels_text(key)} {format_sample(histogram.sum)}')
+                    lines.append(f'{name}_count{labels_text(key)} {histogram.count}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+
+
+metrics = Metrics(enabled=os.getenv('CRAWLER_METRICS', '') not in ('', '0'))
@@ -0,0 +1,393 @@
+import argparse
+import csv
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from types import ModuleType
+from typing import Callable, Dict, List, Optional, Sequence, Set
+
+import csv_join
+import csv_utils
+from csv_utils import compare_csv_files, merge_csv, read_csv, read_user_ids
+from fetch_cache import CACHE_DIR, DEFAULT_MAX_BYTES, FetchCache
+from metrics import metrics
+from scraper import blocking, checkpoint, driver, google_scholar, http_backend, incremental, rate_limit, roster_crawl, uic_profile, uic_staff, worker_pool
+from scraper.checkpoint import ScrapeCheckpoint
+from scraper.custom_types import StaffLink
+from scraper.driver import SharedBrowser, create_driver
+from scraper.google_scholar import scrape_scholar_profiles
+from scraper.http_backend import create_session, get_section_headers_http, scrape_scholar_profiles_http
+from scraper.incremental import scrape_scholar_incremental
+from scraper.roster_crawl import ROSTER_DIFF_CSV, ROSTER_SOURCES_CSV, RosterCrawler, load_sources, read_roster_diff, source_for_url, update_roster
+from scraper.uic_profile import section_headers_to_csv
+from download_pdfs import async_downloader, database, links, near_duplicates, paper_store, pdf_downloader, pdf_store, preprocessing, sync, text_extraction
+from download_pdfs.pdf_downloader import UNIQUE_PAPERS_CSV, deduplicate_research_papers, download_from_semantic_scholar, download_with_api
+from download_pdfs.paper_store import PaperStore
+from download_pdfs.pdf_store import MANIFEST_PATH, PdfStore
+from download_pdfs.text_extraction import TEXT_STORE_PATH, extract_texts
+from search import index as search_index
+from search.index import SEARCH_INDEX_PATH, update_search_index
+from download_pdfs.sync import sync_store_to_supabase
+
+STATE_FILE = '.pipeline_state.json'
+
+
+class Stage:
+    """
+    One step of the pipeline.
+
+    A stage is skipped when its outputs exist and neither its input files,
+    the CLI options it reads nor the source of its code modules changed
+    since it last succeeded. A run that leaves work for a later run (failed
+    downloads worth retrying, profiles given up on, rows that could not be
+    written) does not count as a success.
+
+    Args:
+        name: Name used on the command line
+        run: Function that does the work, called with the parsed CLI arguments;
+             returns a description of the work left for a later run, or None
+        inputs: Files the stage reads
+        optional_inputs: Files the stage reads when they exist; hashed like inputs but not required
+        outputs: Files the stage writes
+        after: Stages that must finish first
+        code: Modules whose source counts as the stage's code version
+        default: Whether the stage runs when no stage is selected explicitly
+        options: CLI options (argparse dests) that change what the stage writes
+    """
+
+    def __init__(self, name: str, run: Callable[[argparse.Namespace], Optional[str]], inputs: Sequence[str] = (),
+                 outputs: Sequence[str] = (), after: Sequence[str] = (), code: Sequence[ModuleType] = (),
+                 default: bool = True, optional_inputs: Sequence[str] = (), options: Sequence[str] = ()):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.optional_inputs = list(optional_inputs)
+        self.outputs = list(outputs)
+        self.after = list(after)
+        self.code = list(code)
+        self.default = default
+        self.options = list(options)
+
+    def fingerprint(self, args: Optional[argparse.Namespace] = None) -> str:
+        digest = hashlib.sha256()
+        digest.update(inspect.getsource(self.run).encode('utf-8'))
+        for module in self.code:
+            digest.update(inspect.getsource(module).encode('utf-8'))
+        for path in self.inputs + self.optional_inputs:
+            digest.update(path.encode('utf-8'))
+            digest.update(hash_file(path).encode('utf-8') if os.path.exists(path) else b'missing')
+        for option in self.options:
+            digest.update(f'{option}={getattr(args, option, None)!r}'.encode('utf-8'))
+        return digest.hexdigest()
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Stage functions
+
+def run_staff(args: argparse.Namespace):
+    sources = [source_for_url(url) for url in args.staff_url] if args.staff_url else load_sources(args.roster_sources)
+    with SharedBrowser() as browser:
+        update_roster(sources, crawler=RosterCrawler(browser=browser, cache=args.fetch_cache))
+
+def run_profiles(args: argparse.Namespace):
+    # Only staff added or changed since the last roster are fetched again
+    staff_links: List[StaffLink] = read_csv('uic_staff.csv')[0]
+    updated, _ = read_roster_diff()
+    previous = {row['name']: row for row in read_csv('section_headers.csv')[0]} if os.path.exists('section_headers.csv') else {}
+    session = create_session()
+    section_headers_to_csv([
+        previous[staff_link['name']] if staff_link['name'] in previous and staff_link['name'] not in updated
+        else get_section_headers_http(session, staff_link, cache=args.fetch_cache)
+        for staff_link in staff_links
+    ])
+
+def run_id_check(args: argparse.Namespace):
+    missing_names = compare_csv_files('uic_staff.csv', 'scholar_ids.csv')
+    with open('missing_scholar_ids.csv', 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name'])
+        writer.writerows([name] for name in missing_names)
+    if missing_names:
+        print(f"{len(missing_names)} staff members have no Google Scholar ID in scholar_ids.csv: {missing_names}")
+
+def run_merge(args: argparse.Namespace):
+    merge_csv('uic_staff.csv', 'scholar_ids.csv', 'uic_staff_user_ids.csv', ['name'])
+
+def run_scholar(args: argparse.Namespace) -> Optional[str]:
+    user_ids = read_user_ids('uic_staff_user_ids.csv')
+    if args.incremental and os.path.exists('research_paper.csv'):
+        scrape_scholar_incremental(user_ids, cache=args.fetch_cache)
+        return None
+
+    if args.backend == 'selenium':
+        scrape_scholar_profiles(staff_user_ids=user_ids, pool_size=args.pool_size, resume=args.resume)
+    else:
+        scrape_scholar_profiles_http(staff_user_ids=user_ids, driver_factory=create_driver, resume=args.resume,
+                                     cache=args.fetch_cache)
+    completed = ScrapeCheckpoint().completed_user_ids()
+    missing = [user_id for user_id in user_ids if user_id['user_id'] and user_id['user_id'] not in completed]
+    return f"{len(missing)} profiles not scraped, rerun with --resume" if missing else None
+
+def run_dedup(args: argparse.Namespace):
+    deduplicate_research_papers(UNIQUE_PAPERS_CSV, near_duplicate_threshold=args.near_duplicate_threshold)
+
+def retryable_downloads(arxiv: bool) -> Optional[str]:
+    store = PdfStore()
+    try:
+        urls = [url for url in store.unsettled_urls() if ('arxiv.org' in url) == arxiv]
+    finally:
+        store.close()
+    return f"{len(urls)} downloads failed with retryable errors" if urls else None
+
+def run_download_arxiv(args: argparse.Namespace) -> Optional[str]:
+    download_with_api(UNIQUE_PAPERS_CSV)
+    return retryable_downloads(arxiv=True)
+
+def run_download_semantic(args: argparse.Namespace) -> Optional[str]:
+    download_from_semantic_scholar(UNIQUE_PAPERS_CSV, cache=args.fetch_cache)
+    return retryable_downloads(arxiv=False)
+
+def run_extract(args: argparse.Namespace):
+    extract_texts(max_workers=args.extract_workers or None)
+
+def run_index(args: argparse.Namespace):
+    update_search_index(UNIQUE_PAPERS_CSV)
+
+def run_upload(args: argparse.Namespace) -> Optional[str]:
+    failed = sync_store_to_supabase()
+    return f"{failed} rows could not be written, see {database.DEAD_LETTER_FILE}" if failed else None
+
+
+# Whether pages come from the cache can change what a stage writes
+CACHE_OPTIONS = ['cache_dir', 'cache_max_mb', 'no_cache']
+
+STAGES: List[Stage] = [
+    Stage('staff', run_staff, inputs=[ROSTER_SOURCES_CSV], outputs=['uic_staff.csv', ROSTER_DIFF_CSV],
+          code=[http_backend, uic_staff, roster_crawl, driver], options=['roster_sources', 'staff_url'] + CACHE_OPTIONS),
+    Stage('profiles', run_profiles, inputs=['uic_staff.csv'], outputs=['section_headers.csv'],
+          after=['staff'], code=[http_backend, uic_profile, driver], default=False, options=CACHE_OPTIONS),
+    Stage('id_check', run_id_check, inputs=['uic_staff.csv', 'scholar_ids.csv'], outputs=['missing_scholar_ids.csv'],
+          after=['staff'], code=[csv_utils, csv_join]),
+    Stage('merge', run_merge, inputs=['uic_staff.csv', 'scholar_ids.csv'], outputs=['uic_staff_user_ids.csv'],
+          after=['id_check'], code=[csv_utils, csv_join]),
+    Stage('scholar', run_scholar, inputs=['uic_staff_user_ids.csv'], outputs=['research_paper.csv'],
+          after=['merge'], code=[http_backend, google_scholar, incremental, worker_pool, rate_limit, blocking, checkpoint, driver],
+          options=['backend', 'incremental'] + CACHE_OPTIONS),
+    Stage('dedup', run_dedup, inputs=['research_paper.csv'], outputs=[UNIQUE_PAPERS_CSV] + PaperStore().paths(),
+          after=['scholar'], code=[preprocessing, near_duplicates, links, paper_store],
+          options=['near_duplicate_threshold']),
+    Stage('download_arxiv', run_download_arxiv, inputs=[UNIQUE_PAPERS_CSV], outputs=[MANIFEST_PATH],
+          after=['dedup'], code=[pdf_downloader, pdf_store, links]),
+    Stage('download_semantic', run_download_semantic, inputs=[UNIQUE_PAPERS_CSV], outputs=[MANIFEST_PATH],
+          after=['dedup'], code=[pdf_downloader, async_downloader, pdf_store], options=CACHE_OPTIONS),
+    Stage('extract', run_extract, inputs=[MANIFEST_PATH], outputs=[TEXT_STORE_PATH],
+          after=['download_arxiv', 'download_semantic'], code=[text_extraction]),
+    Stage('index', run_index, inputs=[UNIQUE_PAPERS_CSV], optional_inputs=[TEXT_STORE_PATH], outputs=[SEARCH_INDEX_PATH],
+          after=['dedup', 'extract'], code=[search_index]),
+    Stage('upload', run_upload, inputs=PaperStore().paths(),
+          after=['download_arxiv', 'download_semantic'], code=[database, sync, paper_store]),
+]
+
+
+def downstream_of(stages: List[Stage], name: str) -> Set[str]:
+    """
+    Returns name and every stage that depends on it, directly or not.
+    """
+    selected = {name}
+    changed = True
+    while changed:
+        changed = False
+        for stage in stages:
+            if stage.name not in selected and any(dependency in selected for dependency in stage.after):
+                selected.add(stage.name)
+                changed = True
+    return selected
+
+def select_stages(stages: List[Stage], only: Optional[List[str]] = None, from_stage: Optional[str] = None) -> Set[str]:
+    names = {stage.name for stage in stages}
+    requested = (only or []) + ([from_stage] if from_stage else [])
+    unknown = [name for name in requested if name not in names]
+    if unknown:
+        raise ValueError(f"Unknown stages {unknown}; choose from {[stage.name for stage in stages]}")
+
+    if only:
+        return set(only)
+    if from_stage:
+        defaults = {stage.name for stage in stages if stage.default} | {from_stage}
+        return downstream_of(stages, from_stage) & defaults
+    return {stage.name for stage in stages if stage.default}
+
+
+class PipelineRunner:
+    """
+    Runs the selected stages in dependency order. Stages whose dependencies have
+    finished run concurrently, so the two downloads overlap. A failed stage
+    stops everything downstream of it; unselected dependencies are assumed to
+    be up to date.
+
+    Args:
+        stages: All stages of the pipeline
+        state_file: JSON file with the fingerprint of each stage's last successful run
+        force: Run the selected stages even when their fingerprints are unchanged
+    """
+
+    def __init__(self, stages: List[Stage], state_file: str = STATE_FILE, force: bool = False):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_file = state_file
+        self.force = force
+        self._lock = threading.Lock()
+        self._state: Dict[str, str] = self._read_state()
+
+    def _read_state(self) -> Dict[str, str]:
+        if not os.path.exists(self.state_file):
+            return {}
+        with open(self.state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_state(self):
+        temp_file = f'{self.state_file}.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, indent=2, sort_keys=True)
+        os.replace(temp_file, self.state_file)
+
+    def _run_stage(self, stage: Stage, args: argparse.Namespace) -> str:
+        fingerprint = stage.fingerprint(args)
+        outputs_exist = all(os.path.exists(path) for path in stage.outputs)
+        with self._lock:
+            up_to_date = self._state.get(stage.name) == fingerprint
+        if up_to_date and outputs_exist and not self.force:
+            print(f"[{stage.name}] skipped, inputs and code unchanged")
+            return 'skipped'
+
+        missing = [path for path in stage.inputs if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(f"[{stage.name}] missing inputs {missing}")
+
+        print(f"[{stage.name}] running")
+        start = time.perf_counter()
+        with metrics.timer('stage_seconds', stage=stage.name):
+            incomplete = stage.run(args)
+        print(f"[{stage.name}] finished in {time.perf_counter() - start:.1f}s")
+
+        with self._lock:
+            if incomplete:
+                self._state.pop(stage.name, None)
+            else:
+                self._state[stage.name] = fingerprint
+            self._write_state()
+        if incomplete:
+            print(f"[{stage.name}] incomplete, runs again next time: {incomplete}")
+            return 'incomplete'
+        return 'ran'
+
+    def run(self, selected: Set[str], args: argparse.Namespace) -> Dict[str, str]:
+        """
+        Returns the outcome of every selected stage: ran, incomplete, skipped, failed or blocked.
+        """
+        outcomes: Dict[str, str] = {}
+        pending = [name for name in self.stages if name in selected]
+        running: Dict[Future, str] = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, len(pending))) as executor:
+            while pending or running:
+                for name in list(pending):
+                    dependencies = [dependency for dependency in self.stages[name].after if dependency in selected]
+                    if any(outcomes.get(dependency) in ('failed', 'blocked') for dependency in dependencies):
+                        pending.remove(name)
+                        outcomes[name] = 'blocked'
+                        print(f"[{name}] not run, an upstream stage failed")
+                    elif all(dependency in outcomes for dependency in dependencies):
+                        pending.remove(name)
+                        running[executor.submit(self._run_stage, self.stages[name], args)] = name
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        outcomes[name] = future.result()
+                    except Exception as e:
+                        outcomes[name] = 'failed'
+                        print(f"[{name}] failed: {type(e).__name__}: {e}")
+
+        for name, outcome in outcomes.items():
+            metrics.count('stage_outcomes_total', stage=name, outcome=outcome)
+        return outcomes
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='UIC Scholar Search crawler')
+    parser.add_argument('--from', dest='from_stage', help='Run this stage and everything downstream of it')
+    parser.add_argument('--only', help='Comma-separated stages to run, and nothing else')
+    parser.add_argument('--force', action='store_true', help='Run the selected stages even if their inputs are unchanged')
+    parser.add_argument('--list', action='store_true', help='List the stages and exit')
+    parser.add_argument('--state-file', default=STATE_FILE)
+    parser.add_argument('--roster-sources', default=ROSTER_SOURCES_CSV, help='CSV of the faculty directories to crawl')
+    parser.add_argument('--staff-url', action='append', help='Crawl this directory instead of --roster-sources (repeatable)')
+    parser.add_argument('--backend', choices=['http', 'selenium'], default='http', help='Google Scholar scraping backend')
+    parser.add_argument('--pool-size', type=int, default=4, help='Browser workers for the selenium backend')
+    parser.add_argument('--resume', action='store_true', help='Continue the Google Scholar scrape from its checkpoint')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Append only the Google Scholar papers added since the last run (use with --only scholar --force)')
+    parser.add_argument('--near-duplicate-threshold', type=float,
+                        help='Also merge papers reached through different links whose titles are at least this similar '
+                             '(0-1, e.g. 0.85); off by default')
+    parser.add_argument('--extract-workers', type=int, default=0, help='Processes for PDF text extraction (default: one per core)')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='HTTP cache shared by the scrapers and the PDF downloads')
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help='Size cap of the HTTP cache in MB; least recently used pages are evicted beyond it')
+    parser.add_argument('--no-cache', action='store_true', help='Fetch every page and PDF without the HTTP cache')
+    parser.add_argument('--metrics', metavar='DIR', help='Record run metrics and write DIR/run_report.json and DIR/metrics.prom')
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.list:
+        for stage in STAGES:
+            after = f" (after {', '.join(stage.after)})" if stage.after else ''
+            optional = '' if stage.default else ' [only when selected]'
+            print(f"{stage.name}{after}{optional}")
+        return 0
+
+    only = [name.strip() for name in args.only.split(',')] if args.only else None
+    selected = select_stages(STAGES, only=only, from_stage=args.from_stage)
+
+    if args.metrics:
+        metrics.enable()
+    # One cache for every stage, so its byte budget and LRU order span the whole run
+    args.fetch_cache = None if args.no_cache else FetchCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+    try:
+        outcomes = PipelineRunner(STAGES, state_file=args.state_file, force=args.force).run(selected, args)
+    finally:
+        if args.fetch_cache is not None:
+            args.fetch_cache.close()
+    if args.metrics:
+        metrics.write_json(os.path.join(args.metrics, 'run_report.json'))
+        metrics.write_prometheus(os.path.join(args.metrics, 'metrics.prom'))
+        print(f"Metrics written to {args.metrics}")
+
+    print(f"\n{'='*60}")
+    for stage in STAGES:
+        if stage.name in outcomes:
+            print(f"{stage.name:<20}{outcomes[stage.name]}")
+    print(f"{'='*60}")
+
+    return 1 if any(outcome in ('failed', 'blocked') for outcome in outcomes.values()) else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,38 @@
+import re
+from typing import Optional
+
+# Markers of the pages Google serves instead of results when it throttles a
+# client: the /sorry/ interstitial, reCAPTCHA and the "unusual traffic" notice.
+BLOCK_MARKERS = [
+    ('captcha', re.compile(r'g-recaptcha|recaptcha/api|id="captcha-form"|gs_captcha', re.IGNORECASE)),
+    ('unusual_traffic', re.compile(r'unusual traffic from your computer network|not a robot', re.IGNORECASE)),
+    ('sorry_page', re.compile(r'/sorry/index|google\.com/sorry', re.IGNORECASE)),
+]
+
+
+class BlockedError(Exception):
+    """
+    Raised when a site answers with a block page or a 429 instead of content.
+
+    Args:
+        reason: captcha, unusual_traffic, sorry_page or http_429
+    """
+
+    def __init__(self, reason: str, url: str = ''):
+        super().__init__(f'blocked ({reason}) {url}'.strip())
+        self.reason = reason
+        self.url = url
+
+
+def detect_block(page: Optional[str], url: str = '') -> Optional[str]:
+    """
+    Returns the reason a page is a block page rather than content, or None.
+    """
+    if '/sorry/' in (url or ''):
+        return 'sorry_page'
+    if not page:
+        return None
+    for reason, pattern in BLOCK_MARKERS:
+        if pattern.search(page):
+            return reason
+    return None
@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+from typing import Dict, List, Set
+
+from .custom_types import UserID, ResearchPaper
+
+CHECKPOINT_FILE = 'research_paper.checkpoint.jsonl'
+STATE_FILE = 'research_paper.state.json'
+
+
+class ScrapeCheckpoint:
+    """
+    Incremental checkpoint for the Google Scholar scrape.
+
+    Each staff member's papers are appended to a JSONL file as one line as soon
+    as they are scraped, and their user_id is added to a small JSON state file.
+    A resumed run skips the completed user_ids and rebuilds its output from the
+    JSONL file.
+
+    Args:
+        checkpoint_file: JSONL file with one {"user_id", "papers"} line per staff member
+        state_file: JSON file listing the completed user_ids
+    """
+
+    def __init__(self, checkpoint_file: str = CHECKPOINT_FILE, state_file: str = STATE_FILE):
+        self.checkpoint_file = checkpoint_file
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self._completed: Set[str] = self._read_state()
+
+    def _read_state(self) -> Set[str]:
+        if not os.path.exists(self.state_file):
+            return set()
+        with open(self.state_file, 'r', encoding='utf-8') as f:
+            return set(json.load(f).get('completed_user_ids', []))
+
+    def _write_state(self):
+        temp_file = f'{self.state_file}.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'completed_user_ids': sorted(self._completed)}, f, indent=2)
+        os.replace(temp_file, self.state_file)
+
+    def reset(self):
+        with self._lock:
+            self._completed = set()
+            for path in (self.checkpoint_file, self.state_file):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def completed_user_ids(self) -> Set[str]:
+        with self._lock:
+            return set(self._completed)
+
+    def record(self, staff_user_id: UserID, research_papers: List[ResearchPaper]):
+        line = json.dumps({'user_id': staff_user_id['user_id'], 'papers': research_papers}, ensure_ascii=False)
+        with self._lock:
+            with open(self.checkpoint_file, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._completed.add(staff_user_id['user_id'])
+            self._write_state()
+
+    def load_papers(self, staff_user_ids: List[UserID]) -> List[ResearchPaper]:
+        """
+        Returns the checkpointed papers of the given staff members in roster order.
+        A truncated last line from a crash is ignored, and a user recorded more
+        than once keeps their latest papers.
+        """
+        papers_by_user: Dict[str, List[ResearchPaper]] = {}
+        if os.path.exists(self.checkpoint_file):
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    papers_by_user[entry['user_id']] = entry['papers']
+
+        research_papers: List[ResearchPaper] = []
+        for staff_user_id in staff_user_ids:
+            research_papers.extend(papers_by_user.get(staff_user_id['user_id'], []))
+        return research_papers
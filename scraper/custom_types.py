@@ -8,6 +8,9 @@ class StaffLink(TypedDict):
     phone: str
     email: str
 
+class RosterEntry(StaffLink):
+    source: str
+
 class UserID(StaffLink):
     user_id: str
 
@@ -15,3 +18,41 @@ class ResearchPaper(UserID):
     paper_title: str
     paper_link: str
     year: str
+
+
+class Record:
+    """
+    Base for compact row records. Fields live in __slots__ rather than a
+    per-row dict, and a record reads like the matching TypedDict, so code
+    written for record['name'] works with either.
+    """
+    __slots__ = ()
+
+    def __init__(self, *values: str):
+        for field, value in zip(self.__slots__, values):
+            setattr(self, field, value)
+
+    def __getitem__(self, field: str) -> str:
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def get(self, field: str, default=None):
+        return getattr(self, field, default)
+
+    def keys(self):
+        return self.__slots__
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.to_dict()!r})'
+
+class ResearchPaperRecord(Record):
+    """
+    One row of research_paper.csv, read as ResearchPaper.
+    """
+    __slots__ = ('name', 'link', 'academic_title', 'department', 'phone', 'email', 'user_id',
+                 'paper_title', 'paper_link', 'year')
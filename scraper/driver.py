@@ -0,0 +1,170 @@
+import re
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Sequence
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.webdriver import WebDriver
+
+from metrics import metrics
+
+# Requests the scrapers never need: every page is read from the DOM, so
+# images, fonts, stylesheets, media and third-party analytics only cost time.
+# Patterns use the wildcard syntax of CDP Network.setBlockedURLs.
+BLOCKED_URL_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico', '*.bmp',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.css',
+    '*.mp4', '*.webm', '*.mp3',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*facebook.net*',
+    '*hotjar.com*', '*siteimproveanalytics.com*', '*fonts.googleapis.com*', '*fonts.gstatic.com*',
+]
+
+PAGE_LOAD_TIMEOUT = 20
+SCRIPT_TIMEOUT = 10
+
+ERROR_TITLE = re.compile(
+    r'^\s*(?:error\s*)?[45]\d\d\b|\bnot found\b|\bservice unavailable\b|\binternal server error\b',
+    re.IGNORECASE,
+)
+PAGE_STATE_SCRIPT = """
+return [
+    document.title || '',
+    document.body ? document.body.className || '' : '',
+    document.body ? (document.body.innerText || '').trim().length : 0,
+    document.body ? document.body.getElementsByTagName('*').length : 0
+];
+"""
+
+
+def create_driver(headless: bool = True, lean: bool = True,
+                  blocked_urls: Sequence[str] = BLOCKED_URL_PATTERNS,
+                  page_load_timeout: float = PAGE_LOAD_TIMEOUT) -> WebDriver:
+    """
+    Start Chrome for scraping. In lean mode driver.get() returns once the DOM
+    is parsed (the "eager" page load strategy) instead of after every image
+    and font, the blocked_urls are never fetched, and a page that does not
+    load within page_load_timeout seconds raises TimeoutException.
+
+    Args:
+        headless: Run without a window
+        lean: Eager page loads, resource blocking and fail-fast timeouts; False gives a stock browser
+        blocked_urls: CDP URL patterns that are not fetched in lean mode
+        page_load_timeout: Seconds driver.get() may take in lean mode
+    """
+    options = Options()
+    if headless:
+        options.add_argument('--headless')
+    if lean:
+        options.page_load_strategy = 'eager'
+        options.add_argument('--disable-extensions')
+        options.add_argument('--no-first-run')
+
+    with metrics.timer('selenium_driver_start_seconds', lean=str(lean).lower()):
+        driver = webdriver.Chrome(options=options)
+    if lean:
+        driver.set_page_load_timeout(page_load_timeout)
+        driver.set_script_timeout(SCRIPT_TIMEOUT)
+        block_urls(driver, blocked_urls)
+    return driver
+
+def block_urls(driver: WebDriver, patterns: Sequence[str]):
+    """
+    Stop the current tab from fetching URLs that match patterns. CDP commands
+    go to the current tab only, so a new tab needs the block set again.
+    """
+    if not patterns:
+        return
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(patterns)})
+
+def page_problem(driver: WebDriver) -> Optional[str]:
+    """
+    Returns why the loaded page is not worth waiting on, or None:
+    'network_error' for Chrome's own error page, 'http_error' for a 4xx/5xx
+    error page and 'empty' for a page with no content at all.
+    """
+    if (driver.current_url or '').startswith('chrome-error://'):
+        return 'network_error'
+    try:
+        title, body_class, text_length, element_count = driver.execute_script(PAGE_STATE_SCRIPT)
+    except WebDriverException:
+        return None
+
+    if 'neterror' in body_class:
+        return 'network_error'
+    if ERROR_TITLE.search(title):
+        return 'http_error'
+    if not text_length and not element_count:
+        return 'empty'
+    return None
+
+
+class SharedBrowser:
+    """
+    One browser shared by callers that need Selenium now and then, such as
+    the HTTP scrapers' fallbacks. Chrome starts on first use and each caller
+    gets a fresh tab, so pages do not leak state into each other without
+    paying for a new browser every time. Callers are served one at a time.
+
+    Args:
+        driver_factory: Starts the browser (defaults to a lean create_driver)
+        blocked_urls: URL patterns blocked again in every new tab
+    """
+
+    def __init__(self, driver_factory: Callable[[], WebDriver] = create_driver,
+                 blocked_urls: Sequence[str] = BLOCKED_URL_PATTERNS):
+        self.driver_factory = driver_factory
+        self.blocked_urls = list(blocked_urls)
+        self._driver: Optional[WebDriver] = None
+        self._home: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def tab(self) -> Iterator[WebDriver]:
+        """
+        Yields the shared driver switched to a new tab, and closes the tab afterwards.
+        """
+        with self._lock:
+            if self._driver is None:
+                self._driver = self.driver_factory()
+                self._home = self._driver.current_window_handle
+            driver = self._driver
+            try:
+                driver.switch_to.new_window('tab')
+                block_urls(driver, self.blocked_urls)
+            except WebDriverException:
+                # The browser is gone or wedged; the next caller starts a new one
+                self._quit()
+                raise
+
+            metrics.count('selenium_tabs_total')
+            try:
+                yield driver
+            finally:
+                try:
+                    driver.close()
+                    driver.switch_to.window(self._home)
+                except WebDriverException:
+                    self._quit()
+
+    def _quit(self):
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except Exception:
+                pass
+        self._driver = None
+        self._home = None
+
+    def quit(self):
+        with self._lock:
+            self._quit()
+
+    def __enter__(self) -> 'SharedBrowser':
+        return self
+
+    def __exit__(self, *exc):
+        self.quit()
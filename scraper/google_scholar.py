@@ -3,21 +3,26 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from selenium.webdriver.chrome.webdriver import WebDriver
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
 from urllib.parse import urlparse, parse_qs
 
 from .custom_types import UserID, ResearchPaper
+from .blocking import BlockedError, detect_block
+from .checkpoint import ScrapeCheckpoint
+from .driver import create_driver, page_problem
+from .rate_limit import AdaptiveRateLimiter, CircuitOpenError
+from .worker_pool import ScholarWorkerPool
+from metrics import COUNT_BUCKETS, metrics
 import csv
-from tqdm import tqdm
 from selenium.webdriver.remote.webelement import WebElement
-import time
 
 
-def research_papers_to_csv(data: List[ResearchPaper], filename: str='research_paper.csv'):
-    headers = ['year', 'paper_title', 'paper_link','name', 'link', 'academic_title', 'department', 'phone', 'email', 'user_id']
+RESEARCH_PAPER_FIELDS = ['year', 'paper_title', 'paper_link','name', 'link', 'academic_title', 'department', 'phone', 'email', 'user_id']
+
 
+def research_papers_to_csv(data: List[ResearchPaper], filename: str='research_paper.csv'):
     with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=headers)
+        writer = csv.DictWriter(csvfile, fieldnames=RESEARCH_PAPER_FIELDS)
         writer.writeheader()
         writer.writerows(data)
     
@@ -30,6 +35,13 @@ def get_safe_element(root_element: WebElement, by, match: str, attribute: str) -
         return ''
 
 def get_profile_data(driver: WebDriver, staff_user_id: UserID) -> List[ResearchPaper]:
+    """
+    Scrape a staff member's papers from their Google Scholar mandates page.
+
+    Raises:
+        BlockedError: When Scholar serves a CAPTCHA, "unusual traffic" or /sorry/ page
+        TimeoutException: When the page itself does not load or Chrome shows a network error
+    """
 
     user_id = staff_user_id['user_id']
 
@@ -37,16 +49,33 @@ def get_profile_data(driver: WebDriver, staff_user_id: UserID) -> List[ResearchP
         return []
 
     research_papers: List[ResearchPaper] = []
-    
-    try:
-        url = f'https://scholar.google.com/citations?view_op=list_mandates_page_export&user={user_id}'
 
+    url = f'https://scholar.google.com/citations?view_op=list_mandates_page_export&user={user_id}'
+    with metrics.timer('selenium_page_load_seconds', site='scholar'):
         driver.get(url)
+
+    reason = detect_block(driver.page_source, driver.current_url)
+    if reason:
+        metrics.count('scholar_blocks_total', reason=reason, backend='selenium')
+        raise BlockedError(reason, url)
+
+    problem = page_problem(driver)
+    if problem == 'network_error':
+        # Chrome's own error page: the request failed, so retry it like a timeout
+        raise TimeoutException(f'network error loading {url}')
+    if problem:
+        metrics.count('selenium_fast_fails_total', site='scholar', reason=problem)
+        print(f"No papers found on page {staff_user_id['name']} ({problem} page)")
+        return research_papers
+
+    try:
         wait = WebDriverWait(driver, 10)
         
-        wait.until(
-            EC.presence_of_element_located((By.CLASS_NAME, 'gs_mnde_one_art'))
-        )
+        metrics.count('selenium_waits_total', site='scholar')
+        with metrics.timer('selenium_wait_seconds', site='scholar'):
+            wait.until(
+                EC.presence_of_element_located((By.CLASS_NAME, 'gs_mnde_one_art'))
+            )
 
         articles = driver.find_elements(By.CLASS_NAME, 'gs_mnde_one_art')
         for article in articles:
@@ -68,22 +97,71 @@ def get_profile_data(driver: WebDriver, staff_user_id: UserID) -> List[ResearchP
             research_papers.append(research_paper)
 
     except TimeoutException:
-        print("Page took too long to load", staff_user_id['name'])
+        # The page loaded and is not a block page, so it has no mandate entries
+        metrics.count('selenium_timeouts_total', site='scholar')
+        print("No papers found on page", staff_user_id['name'])
     except NoSuchElementException:
+        metrics.count('selenium_missing_elements_total', site='scholar')
         print("Element not found on page", staff_user_id['name'])
+
+    metrics.count('papers_scraped_total', len(research_papers), source='scholar')
+    metrics.observe('papers_per_profile', len(research_papers), buckets=COUNT_BUCKETS, source='scholar')
     
     return research_papers
 
-def scrape_scholar_profiles(driver: WebDriver, staff_user_ids: List[UserID], limit = None):
-
-    profile_data: List[ResearchPaper] = []
-
-    progress_bar = tqdm(staff_user_ids[:limit], desc="Processing staff profiles from Google Scholar")
-
-    for staff_user_id in progress_bar:
-        progress_bar.set_description(f"Processing: {staff_user_id['name']}")
-        profile_data.extend(get_profile_data(driver=driver, staff_user_id=staff_user_id))
-        time.sleep(10)
+def scrape_scholar_profiles(staff_user_ids: List[UserID], pool_size: int = 1, limit = None,
+                            requests_per_minute: float = 6, max_requests_per_minute: float = 30,
+                            driver_factory: Callable[[], WebDriver] = create_driver,
+                            resume: bool = False, checkpoint: Optional[ScrapeCheckpoint] = None):
+    """
+    Scrape the Google Scholar papers of every staff member with a pool of browser workers.
+    Each staff member's papers are checkpointed as soon as they are scraped.
+
+    The request rate adapts: it climbs while Scholar answers normally and
+    backs off on block pages and timeouts (see AdaptiveRateLimiter). Blocked
+    profiles are retried rather than recorded as empty, and if Scholar keeps
+    blocking, the scrape stops with CircuitOpenError; rerun with resume=True.
+
+    Args:
+        staff_user_ids: Staff members with their Google Scholar user IDs
+        pool_size: Number of headless Chrome workers
+        limit: Only scrape the first `limit` staff members
+        requests_per_minute: Starting combined Google Scholar request rate across all workers
+        max_requests_per_minute: Highest rate the limiter may climb to
+        driver_factory: Function that starts a new WebDriver session for a worker
+        resume: Skip staff members completed by an earlier run instead of starting over
+        checkpoint: Checkpoint to write to (defaults to research_paper.checkpoint.jsonl)
+
+    Example:
+        scrape_scholar_profiles(staff_user_ids=user_ids, pool_size=4, resume=True)
+    """
+
+    staff_user_ids = staff_user_ids[:limit]
+    checkpoint = checkpoint or ScrapeCheckpoint()
+
+    if resume:
+        completed = checkpoint.completed_user_ids()
+        pending = [staff_user_id for staff_user_id in staff_user_ids if staff_user_id['user_id'] not in completed]
+        print(f"Resuming: {len(staff_user_ids) - len(pending)} staff members already scraped, {len(pending)} to go")
+    else:
+        checkpoint.reset()
+        pending = staff_user_ids
+
+    rate_limiter = AdaptiveRateLimiter(requests_per_minute, max_rpm=max_requests_per_minute)
+    pool = ScholarWorkerPool(
+        scrape=lambda driver, staff_user_id: get_profile_data(driver=driver, staff_user_id=staff_user_id),
+        driver_factory=driver_factory,
+        pool_size=pool_size,
+        rate_limiter=rate_limiter,
+        on_result=checkpoint.record,
+    )
+    pool.run(pending)
+    print(f"Google Scholar rate control: {rate_limiter.summary()}")
+
+    if pool.stopped_by is not None:
+        raise CircuitOpenError(f"{pool.stopped_by}; scraped profiles are checkpointed, rerun with resume=True")
+
+    profile_data: List[ResearchPaper] = checkpoint.load_papers(staff_user_ids)
     
     research_papers_to_csv(profile_data)
-    return profile_data
\ No newline at end of file
+    return profile_data
@@ -0,0 +1,439 @@
+import argparse
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import requests
+from lxml import html as lxml_html
+from requests.adapters import HTTPAdapter
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.chrome.webdriver import WebDriver
+from tqdm import tqdm
+
+from fetch_cache import FetchCache
+from metrics import COUNT_BUCKETS, domain_of, metrics
+
+from .blocking import BlockedError, detect_block
+from .checkpoint import ScrapeCheckpoint
+from .custom_types import StaffLink, UserID, ResearchPaper
+from .google_scholar import get_profile_data, research_papers_to_csv
+from .rate_limit import AdaptiveRateLimiter, CircuitOpenError
+from .uic_profile import get_section_headers
+from .uic_staff import profile_to_csv, scrape_uic_staff
+
+USER_AGENT = (
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36'
+)
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+MANDATES_URL = 'https://scholar.google.com/citations?view_op=list_mandates_page_export&user={user_id}'
+
+
+def create_session(pool_size: int = 8) -> requests.Session:
+    """
+    Returns a keep-alive session with a connection pool of pool_size per host.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'User-Agent': USER_AGENT, 'Accept-Language': 'en-US,en;q=0.9'})
+    return session
+
+def fetch_page(session: requests.Session, url: str, timeout: float = 15,
+               cache: Optional[FetchCache] = None, source: str = 'default') -> Tuple[str, bool]:
+    """
+    Fetch a page, through the cache when one is given.
+
+    Returns:
+        Tuple of (html, unchanged) where unchanged is True when the cache saw the same content last time
+
+    Raises:
+        BlockedError: On a 429 response
+        requests.RequestException: On other failed requests and error statuses
+    """
+    domain = domain_of(url)
+    if cache is None:
+        with metrics.timer('http_request_seconds', domain=domain):
+            response = session.get(url, timeout=timeout)
+        metrics.count('http_requests_total', domain=domain, status=response.status_code)
+        metrics.count('http_response_bytes_total', len(response.content), domain=domain)
+        if response.status_code == 429:
+            raise BlockedError('http_429', url)
+        response.raise_for_status()
+        return response.text, False
+
+    with metrics.timer('http_request_seconds', domain=domain):
+        cached = cache.get(session, url, source=source, timeout=timeout)
+    metrics.count('http_requests_total', domain=domain, status=cached['status'])
+    metrics.count('http_cache_total', source=source, result='hit' if cached['from_cache'] else 'miss')
+    if not cached['from_cache']:
+        metrics.count('http_response_bytes_total', len(cached['body']), domain=domain)
+    if cached['status'] == 429:
+        raise BlockedError('http_429', url)
+    if cached['status'] >= 400:
+        raise requests.HTTPError(f"{cached['status']} Error for url: {url}")
+    return cached['body'].decode('utf-8', errors='replace'), cached['unchanged']
+
+def fetch_html(session: requests.Session, url: str, timeout: float = 15,
+               cache: Optional[FetchCache] = None, source: str = 'default') -> str:
+    return fetch_page(session, url, timeout=timeout, cache=cache, source=source)[0]
+
+def by_class(class_name: str) -> str:
+    """
+    XPath that matches descendants carrying class_name, like By.CLASS_NAME does.
+    """
+    return f".//*[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+
+def element_text(element) -> str:
+    return ' '.join(element.text_content().split())
+
+def find_text(root, class_name: str) -> str:
+    elements = root.xpath(by_class(class_name))
+    return element_text(elements[0]) if elements else ''
+
+
+def parse_staff_directory(page: str, base_url: str) -> List[StaffLink]:
+    """
+    Parses a UIC faculty directory page into StaffLinks.
+
+    Returns:
+        The staff on the page, or an empty list when the page has no directory-list
+    """
+    tree = lxml_html.fromstring(page)
+    directory_lists = tree.xpath(by_class('directory-list'))
+    if not directory_lists:
+        return []
+
+    profile_links: List[StaffLink] = []
+    for article in directory_lists[0].xpath(by_class('profile-teaser')):
+        name_elements = article.xpath(by_class('_name'))
+        if not name_elements:
+            continue
+        hrefs = name_elements[0].xpath('.//a/@href')
+
+        profile: StaffLink = {
+            'name': element_text(name_elements[0]),
+            'link': urljoin(base_url, hrefs[0]) if hrefs else '',
+            'academic_title': find_text(article, '_academic-title'),
+            'department': find_text(article, '_department'),
+            'phone': find_text(article, '_phone').replace('.', ''),
+            'email': find_text(article, '_email'),
+        }
+        profile_links.append(profile)
+
+    return profile_links
+
+def parse_section_headers(page: str) -> Optional[List[str]]:
+    """
+    Parses the section titles of a UIC profile page.
+
+    Returns:
+        The section titles, or None when the page is not a profile page
+    """
+    tree = lxml_html.fromstring(page)
+    if not tree.xpath(by_class('_academic-title')):
+        return None
+    return [element_text(element) for element in tree.xpath(by_class('_section-title'))]
+
+def parse_mandates(page: str, staff_user_id: UserID) -> Optional[List[ResearchPaper]]:
+    """
+    Parses a Google Scholar mandates export page into ResearchPapers.
+
+    Returns:
+        The papers on the page, or None when the page has no mandate entries
+    """
+    tree = lxml_html.fromstring(page)
+    articles = tree.xpath(by_class('gs_mnde_one_art'))
+    if not articles:
+        return None
+
+    research_papers: List[ResearchPaper] = []
+    for article in articles:
+        paragraphs = article.xpath(by_class('gs_mnde_p'))
+        if len(paragraphs) < 2:
+            continue
+        link_element, conference_element = paragraphs[-1], paragraphs[-2]
+
+        research_paper: ResearchPaper = {
+            'name': staff_user_id['name'],
+            'link': staff_user_id['link'],
+            'academic_title': staff_user_id['academic_title'],
+            'department': staff_user_id['department'],
+            'phone': staff_user_id['phone'],
+            'email': staff_user_id['email'],
+            'user_id': staff_user_id['user_id'],
+            'paper_title': find_text(article, 'gs_mnde_ttl'),
+            'paper_link': find_text(link_element, 'gs_gray'),
+            'year': element_text(conference_element).split(',')[-1].strip(),
+        }
+        research_papers.append(research_paper)
+
+    return research_papers
+
+
+def scrape_uic_staff_http(url: str, session: Optional[requests.Session] = None,
+                          driver_factory: Optional[Callable[[], WebDriver]] = None,
+                          cache: Optional[FetchCache] = None) -> List[StaffLink]:
+    """
+    Scrapes a UIC faculty directory over plain HTTP, falling back to Selenium
+    when the page cannot be fetched or parsed.
+
+    Example:
+        staff_links = scrape_uic_staff_http('https://cs.uic.edu/faculty-staff/faculty/', driver_factory=create_driver)
+    """
+    session = session or create_session()
+    try:
+        profile_links = parse_staff_directory(fetch_html(session, url, cache=cache, source='uic'), base_url=url)
+    except (requests.RequestException, BlockedError) as e:
+        print(f"HTTP fetch failed for {url}: {e}")
+        profile_links = []
+
+    if profile_links:
+        profile_to_csv(profile_links=profile_links)
+        return profile_links
+
+    metrics.count('selenium_fallbacks_total', page='uic_directory')
+
+    if driver_factory is None:
+        print("Could not parse staff directory over HTTP", url)
+        return []
+
+    print("Falling back to Selenium for", url)
+    driver = driver_factory()
+    try:
+        return scrape_uic_staff(driver=driver, url=url)
+    finally:
+        driver.quit()
+
+def get_section_headers_http(session: requests.Session, staff_link: StaffLink,
+                             driver: Optional[WebDriver] = None, cache: Optional[FetchCache] = None) -> Dict:
+    url = staff_link['link']
+    name = staff_link['name']
+    if url == '' or name == '':
+        return {}
+
+    try:
+        sections = parse_section_headers(fetch_html(session, url, cache=cache, source='uic'))
+    except (requests.RequestException, BlockedError) as e:
+        print(f"HTTP fetch failed for {url}: {e}")
+        sections = None
+
+    if sections is not None:
+        return {'name': name, 'sections': '\t'.join(sections)}
+    if driver is not None:
+        metrics.count('selenium_fallbacks_total', page='uic_profile')
+        return get_section_headers(driver=driver, staff_link=staff_link)
+    return {'name': name}
+
+def fetch_mandates(session: requests.Session, staff_user_id: UserID,
+                   cache: Optional[FetchCache] = None) -> Tuple[Optional[List[ResearchPaper]], bool]:
+    """
+    Fetches and parses one Google Scholar mandates page. Block pages are
+    dropped from the cache so they are not served again.
+
+    Returns:
+        Tuple of (papers or None when the page has no mandate entries, unchanged)
+
+    Raises:
+        BlockedError: When Scholar answers with a 429, CAPTCHA, "unusual traffic" or /sorry/ page
+    """
+    url = MANDATES_URL.format(user_id=staff_user_id['user_id'])
+    try:
+        page, unchanged = fetch_page(session, url, cache=cache, source='scholar')
+    except BlockedError as e:
+        metrics.count('scholar_blocks_total', reason=e.reason, backend='http')
+        raise
+
+    reason = detect_block(page)
+    if reason:
+        metrics.count('scholar_blocks_total', reason=reason, backend='http')
+        if cache is not None:
+            cache.forget(url)
+        raise BlockedError(reason, url)
+    return parse_mandates(page, staff_user_id), unchanged
+
+def get_profile_data_http(session: requests.Session, staff_user_id: UserID,
+                          driver: Optional[WebDriver] = None, cache: Optional[FetchCache] = None) -> List[ResearchPaper]:
+    """
+    Scrapes one Google Scholar mandates page over plain HTTP, falling back to
+    Selenium when the page has no mandate entries (e.g. it needs JavaScript).
+
+    Raises:
+        BlockedError: When Scholar serves a block page instead of the profile
+    """
+    user_id = staff_user_id['user_id']
+    if user_id == '' or user_id is None:
+        return []
+
+    try:
+        research_papers = fetch_mandates(session, staff_user_id, cache=cache)[0]
+    except requests.RequestException as e:
+        print(f"HTTP fetch failed for {staff_user_id['name']}: {e}")
+        research_papers = None
+
+    if research_papers is not None:
+        return research_papers
+    if driver is not None:
+        metrics.count('selenium_fallbacks_total', page='scholar_mandates')
+        return get_profile_data(driver=driver, staff_user_id=staff_user_id)
+    return []
+
+
+def scrape_scholar_profiles_http(staff_user_ids: List[UserID], limit = None, requests_per_minute: float = 6,
+                                 max_requests_per_minute: float = 30, max_blocks: int = 10, max_attempts: int = 3,
+                                 driver_factory: Optional[Callable[[], WebDriver]] = None,
+                                 resume: bool = False, checkpoint: Optional[ScrapeCheckpoint] = None,
+                                 cache: Optional[FetchCache] = None) -> List[ResearchPaper]:
+    """
+    Scrapes Google Scholar mandates pages over plain HTTP. A browser is only
+    started, once, the first time a page cannot be parsed without one.
+    Checkpointing, resume and adaptive rate control work as in
+    scrape_scholar_profiles; a profile that is blocked max_blocks times, or
+    whose page cannot be fetched in max_attempts tries, is not checkpointed
+    and is left for a resumed run. With a cache, fresh pages are served from disk
+    and stale ones are revalidated.
+
+    Example:
+        scrape_scholar_profiles_http(staff_user_ids=user_ids, driver_factory=create_driver)
+    """
+    staff_user_ids = staff_user_ids[:limit]
+    checkpoint = checkpoint or ScrapeCheckpoint()
+
+    if resume:
+        completed = checkpoint.completed_user_ids()
+        pending = [staff_user_id for staff_user_id in staff_user_ids if staff_user_id['user_id'] not in completed]
+    else:
+        checkpoint.reset()
+        pending = staff_user_ids
+
+    session = create_session()
+    rate_limiter = AdaptiveRateLimiter(requests_per_minute, max_rpm=max_requests_per_minute)
+    driver: Optional[WebDriver] = None
+    unchanged_pages = 0
+
+    def scrape(staff_user_id: UserID) -> Optional[List[ResearchPaper]]:
+        """
+        Returns the profile's papers, or None when no page could be fetched.
+        """
+        nonlocal driver, unchanged_pages
+        research_papers = None
+        failed = False
+        try:
+            research_papers, unchanged = fetch_mandates(session, staff_user_id, cache=cache)
+            unchanged_pages += unchanged
+        except requests.RequestException as e:
+            failed = True
+            if isinstance(e, (requests.Timeout, requests.ConnectionError)):
+                rate_limiter.slow_down()
+            print(f"HTTP fetch failed for {staff_user_id['name']}: {e}")
+
+        if research_papers is None and driver_factory is not None and staff_user_id['user_id']:
+            metrics.count('selenium_fallbacks_total', page='scholar_mandates')
+            if driver is None:
+                driver = driver_factory()
+            try:
+                research_papers = get_profile_data(driver=driver, staff_user_id=staff_user_id)
+                failed = False
+            except TimeoutException:
+                failed = True
+                rate_limiter.slow_down()
+                print(f"Timed out loading {staff_user_id['name']} in the browser")
+
+        if failed:
+            return None
+        # The page loaded but lists no mandates
+        return research_papers or []
+
+    progress_bar = tqdm(pending, desc="Processing staff profiles from Google Scholar")
+
+    try:
+        for staff_user_id in progress_bar:
+            progress_bar.set_description(f"Processing: {staff_user_id['name']}")
+
+            research_papers: Optional[List[ResearchPaper]] = None
+            blocks, attempts = 0, 0
+            while blocks < max_blocks and attempts < max_attempts:
+                rate_limiter.wait()
+                try:
+                    research_papers = scrape(staff_user_id)
+                except BlockedError as e:
+                    rate_limiter.blocked(e.reason)
+                    blocks += 1
+                    continue
+                if research_papers is not None:
+                    # Only a page that was fetched and parsed speeds the limiter up
+                    rate_limiter.success()
+                    break
+                attempts += 1
+
+            if research_papers is None:
+                # Not checkpointed, so a resumed run will try this profile again
+                metrics.count('scholar_profiles_abandoned_total')
+                reason = f"{blocks} block pages" if blocks >= max_blocks else f"{attempts} failed attempts"
+                print(f"Giving up on {staff_user_id['name']} after {reason}")
+                continue
+
+            if not research_papers:
+                metrics.count('scholar_empty_profiles_total', backend='http')
+            metrics.count('papers_scraped_total', len(research_papers), source='scholar')
+            metrics.observe('papers_per_profile', len(research_papers), buckets=COUNT_BUCKETS, source='scholar')
+            checkpoint.record(staff_user_id, research_papers)
+    except CircuitOpenError as e:
+        raise CircuitOpenError(f"{e}; scraped profiles are checkpointed, rerun with resume=True") from e
+    finally:
+        if driver is not None:
+            driver.quit()
+        print(f"Google Scholar rate control: {rate_limiter.summary()}")
+
+    if cache is not None:
+        print(f"{unchanged_pages} of {len(pending)} Scholar pages unchanged since the last fetch")
+
+    profile_data = checkpoint.load_papers(staff_user_ids)
+    research_papers_to_csv(profile_data)
+    return profile_data
+
+def benchmark_parsers(fixtures_dir: str = FIXTURES_DIR, repeat: int = 50) -> Dict[str, float]:
+    """
+    Times each parser against the saved HTML fixtures.
+
+    Returns:
+        Mean milliseconds per parse for each fixture
+    """
+    from .incremental import parse_profile_entries
+
+    staff_user_id: UserID = {
+        'name': 'Fixture', 'link': '', 'academic_title': '', 'department': '', 'phone': '', 'email': '', 'user_id': 'fixture'
+    }
+    parsers = {
+        'uic_directory.html': lambda page: parse_staff_directory(page, base_url='https://cs.uic.edu/faculty-staff/faculty/'),
+        'uic_profile.html': parse_section_headers,
+        'scholar_mandates.html': lambda page: parse_mandates(page, staff_user_id),
+        'scholar_profile.html': parse_profile_entries,
+    }
+
+    timings: Dict[str, float] = {}
+    for filename, parse in parsers.items():
+        with open(os.path.join(fixtures_dir, filename), 'r', encoding='utf-8') as f:
+            page = f.read()
+
+        result = parse(page)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            parse(page)
+        timings[filename] = (time.perf_counter() - start) * 1000 / repeat
+
+        print(f"{filename}: {timings[filename]:.2f} ms/parse, {len(result or [])} items")
+
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the HTTP backend parsers against saved HTML fixtures.')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    benchmark_parsers(fixtures_dir=args.fixtures, repeat=args.repeat)
@@ -0,0 +1,310 @@
+import argparse
+import csv
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, TypedDict
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from lxml import html as lxml_html
+from tqdm import tqdm
+
+from csv_join import read_fieldnames
+from csv_utils import iter_research_papers, read_user_ids
+from fetch_cache import FetchCache
+from metrics import COUNT_BUCKETS, metrics
+
+from .blocking import BlockedError, detect_block
+from .custom_types import ResearchPaper, UserID
+from .google_scholar import RESEARCH_PAPER_FIELDS, research_papers_to_csv
+from .http_backend import MANDATES_URL, by_class, create_session, element_text, fetch_html, find_text, parse_mandates
+from .rate_limit import AdaptiveRateLimiter, CircuitOpenError
+
+PROFILE_URL = ('https://scholar.google.com/citations?user={user_id}&hl=en&view_op=list_works'
+               '&sortby=pubdate&cstart={cstart}&pagesize={pagesize}')
+SEEN_FILE = 'research_paper.seen.json'
+DELTA_CSV = 'research_paper_delta.csv'
+
+
+class ProfileEntry(TypedDict):
+    key: str
+    title: str
+    year: str
+
+
+class PendingEntry(TypedDict):
+    title: str
+    since: str
+
+
+def title_key(title: str) -> str:
+    return ' '.join(title.lower().split())
+
+def parse_profile_entries(page: str) -> Optional[List[ProfileEntry]]:
+    """
+    Parses one page of a Google Scholar profile's publication list. Each
+    entry is keyed by its citation id, or by its title when it has none.
+
+    Returns:
+        The entries in page order, or None when the page is not a profile page
+    """
+    tree = lxml_html.fromstring(page)
+    if not tree.xpath('//*[@id="gsc_a_b"]'):
+        return None
+
+    entries: List[ProfileEntry] = []
+    for row in tree.xpath(by_class('gsc_a_tr')):
+        links = row.xpath(by_class('gsc_a_at'))
+        if not links:
+            continue
+        title = element_text(links[0])
+        href = links[0].get('href') or links[0].get('data-href') or ''
+        citation = parse_qs(urlparse(href).query).get('citation_for_view', [''])[0]
+        entries.append({'key': citation or 'title:' + title_key(title), 'title': title, 'year': find_text(row, 'gsc_a_y')})
+    return entries
+
+def find_new_entries(fetch: Callable[[str], str], user_id: str, seen: Set[str], first_page_size: int = 20,
+                     page_size: int = 100, max_pages: int = 10) -> Tuple[Optional[List[ProfileEntry]], int]:
+    """
+    Walk a profile's publications newest first and stop at the first entry
+    already in seen. The first page is small, since usually only a handful
+    of papers are new; later pages are page_size entries.
+
+    Returns:
+        Tuple of (the new entries, or None when a page could not be parsed, pages fetched)
+    """
+    new_entries: List[ProfileEntry] = []
+    cstart, pagesize = 0, first_page_size
+    for page_number in range(1, max_pages + 1):
+        entries = parse_profile_entries(fetch(PROFILE_URL.format(user_id=user_id, cstart=cstart, pagesize=pagesize)))
+        if entries is None:
+            return None, page_number
+        for entry in entries:
+            if entry['key'] in seen:
+                return new_entries, page_number
+            new_entries.append(entry)
+        if len(entries) < pagesize:
+            return new_entries, page_number
+        cstart += pagesize
+        pagesize = page_size
+    return new_entries, max_pages
+
+def read_paper_keys(csv_path: str) -> Dict[str, Set[str]]:
+    """
+    Returns user_id -> title keys of the papers already in csv_path.
+    """
+    keys: Dict[str, Set[str]] = {}
+    if not os.path.exists(csv_path):
+        return keys
+    for paper in iter_research_papers(csv_path):
+        keys.setdefault(paper.user_id, set()).add(title_key(paper.paper_title))
+    return keys
+
+def append_research_papers(research_papers: List[ResearchPaper], csv_path: str):
+    if not research_papers:
+        return
+    exists = os.path.exists(csv_path) and os.path.getsize(csv_path) > 0
+    fieldnames = read_fieldnames(csv_path) if exists else RESEARCH_PAPER_FIELDS
+    with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+        if not exists:
+            writer.writeheader()
+        writer.writerows(research_papers)
+
+
+class SeenStore:
+    """
+    The profile entries an incremental crawl has already seen, per user_id,
+    kept in one JSON file that is rewritten atomically after every user.
+    Every entry walked is seen, since seen entries are where a walk stops;
+    the new ones whose paper is not on the mandates page yet are also kept
+    as pending, so the mandates page is checked for them again.
+
+    Args:
+        path: JSON file of user_id -> {"keys": [...], "pending": {key: {"title", "since"}}, "checked_at": ...}
+    """
+
+    def __init__(self, path: str = SEEN_FILE):
+        self.path = path
+        self._users: Dict[str, Dict] = self._read()
+
+    def _read(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write(self):
+        temp_file = f'{self.path}.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self._users, f, indent=1, sort_keys=True)
+        os.replace(temp_file, self.path)
+
+    def keys(self, user_id: str) -> Optional[Set[str]]:
+        """
+        Returns the keys seen for user_id, or None when the user was never crawled incrementally.
+        """
+        user = self._users.get(user_id)
+        return set(user['keys']) if user is not None else None
+
+    def pending(self, user_id: str) -> Dict[str, PendingEntry]:
+        """
+        Returns the new entries of user_id still waiting to show up on the mandates page.
+        """
+        user = self._users.get(user_id)
+        return dict(user.get('pending', {})) if user is not None else {}
+
+    def add(self, user_id: str, keys: Iterable[str], pending: Optional[Dict[str, PendingEntry]] = None):
+        """
+        Marks keys as seen and, when given, replaces the user's pending entries.
+        """
+        user = self._users.setdefault(user_id, {'keys': []})
+        user['keys'] = sorted(set(user['keys']) | set(keys))
+        if pending is not None:
+            user['pending'] = pending
+        user['checked_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self._write()
+
+
+def scrape_scholar_incremental(staff_user_ids: List[UserID], csv_path: str = 'research_paper.csv',
+                               delta_csv: str = DELTA_CSV, seen: Optional[SeenStore] = None, limit = None,
+                               requests_per_minute: float = 6, max_requests_per_minute: float = 30,
+                               max_blocks: int = 10, first_page_size: int = 20, page_size: int = 100,
+                               max_pages: int = 10, pending_days: float = 30,
+                               cache: Optional[FetchCache] = None) -> List[ResearchPaper]:
+    """
+    Appends only the papers added since the last run to csv_path, and writes
+    them to delta_csv as well.
+
+    Each staff member's profile is read newest first, a small page at a
+    time, until the first entry seen on an earlier run, so a profile with
+    nothing new costs one request. The mandates page, the only place Scholar
+    lists paper links, is fetched only for staff with new entries, and only
+    its papers missing from csv_path are appended. A staff member crawled
+    for the first time gets one full profile page marked as seen and their
+    mandates checked against csv_path.
+
+    The mandates page lists only some of a profile's papers, often late. A
+    new entry whose title is not on it stays pending, and the mandates page
+    is checked again on later runs until the paper shows up or the entry has
+    been pending for pending_days.
+
+    The seen entries are saved after each staff member, so an interrupted run
+    is simply run again. This mode misses papers until the next full scrape:
+    profiles are sorted by year, so an old paper added late lands below the
+    newest entries and is never reached, and staff who left the roster keep
+    their rows until then as well.
+
+    Example:
+        scrape_scholar_incremental(read_user_ids('uic_staff_user_ids.csv'))
+    """
+    staff_user_ids = staff_user_ids[:limit]
+    seen = seen or SeenStore()
+    paper_keys = read_paper_keys(csv_path)
+    session = create_session()
+    rate_limiter = AdaptiveRateLimiter(requests_per_minute, max_rpm=max_requests_per_minute)
+    delta: List[ResearchPaper] = []
+    outcomes: Dict[str, int] = {}
+    requests_made = 0
+
+    def fetch(url: str) -> str:
+        nonlocal requests_made
+        for _ in range(max_blocks):
+            rate_limiter.wait()
+            requests_made += 1
+            try:
+                page = fetch_html(session, url, cache=cache, source='scholar')
+                reason = detect_block(page)
+                if reason:
+                    if cache is not None:
+                        cache.forget(url)
+                    raise BlockedError(reason, url)
+            except BlockedError as e:
+                metrics.count('scholar_blocks_total', reason=e.reason, backend='incremental')
+                rate_limiter.blocked(e.reason)
+                continue
+            rate_limiter.success()
+            return page
+        raise BlockedError(f'{max_blocks} block pages', url)
+
+    progress_bar = tqdm(staff_user_ids, desc="Checking Google Scholar profiles for new papers")
+    try:
+        for staff_user_id in progress_bar:
+            user_id = staff_user_id['user_id']
+            if not user_id:
+                continue
+            progress_bar.set_description(f"Checking: {staff_user_id['name']}")
+
+            known = seen.keys(user_id)
+            cutoff = (datetime.now(timezone.utc) - timedelta(days=pending_days)).isoformat(timespec='seconds')
+            pending = {key: entry for key, entry in seen.pending(user_id).items() if entry['since'] >= cutoff}
+            try:
+                if known is None:
+                    outcome = 'first_crawl'
+                    new_entries = parse_profile_entries(fetch(PROFILE_URL.format(user_id=user_id, cstart=0, pagesize=page_size)))
+                    pages = 1
+                else:
+                    new_entries, pages = find_new_entries(fetch, user_id, known, first_page_size, page_size, max_pages)
+                    outcome = 'unparsed' if new_entries is None else 'new' if new_entries else 'pending' if pending else 'unchanged'
+                metrics.observe('scholar_profile_pages', pages, buckets=COUNT_BUCKETS)
+
+                research_papers: List[ResearchPaper] = []
+                if outcome != 'unchanged':
+                    research_papers = parse_mandates(fetch(MANDATES_URL.format(user_id=user_id)), staff_user_id) or []
+            except BlockedError as e:
+                # Not marked as seen, so the next run checks this profile again
+                print(f"Giving up on {staff_user_id['name']} for now: {e}")
+                outcomes['blocked'] = outcomes.get('blocked', 0) + 1
+                continue
+            except requests.RequestException as e:
+                if isinstance(e, (requests.Timeout, requests.ConnectionError)):
+                    rate_limiter.slow_down()
+                print(f"HTTP fetch failed for {staff_user_id['name']}: {e}")
+                outcomes['failed'] = outcomes.get('failed', 0) + 1
+                continue
+
+            existing = paper_keys.setdefault(user_id, set())
+            added: List[ResearchPaper] = []
+            for research_paper in research_papers:
+                key = title_key(research_paper['paper_title'])
+                if key not in existing:
+                    existing.add(key)
+                    added.append(research_paper)
+
+            # Papers are on disk before their entries count as seen
+            append_research_papers(added, csv_path)
+            delta.extend(added)
+            if outcome != 'unchanged':
+                found = {title_key(research_paper['paper_title']) for research_paper in research_papers}
+                if outcome == 'new':
+                    # A first crawl's entries are old papers the full scrape already read
+                    since = datetime.now(timezone.utc).isoformat(timespec='seconds')
+                    pending.update({entry['key']: {'title': entry['title'], 'since': since} for entry in new_entries or []})
+                pending = {key: entry for key, entry in pending.items() if title_key(entry['title']) not in found}
+                seen.add(user_id, [entry['key'] for entry in new_entries or []], pending=pending)
+
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            metrics.count('scholar_incremental_profiles_total', outcome=outcome)
+            metrics.count('papers_scraped_total', len(added), source='scholar_incremental')
+    except CircuitOpenError as e:
+        raise CircuitOpenError(f"{e}; new papers so far are in {csv_path}, rerun to continue") from e
+    finally:
+        research_papers_to_csv(delta, delta_csv)
+        print(f"Google Scholar rate control: {rate_limiter.summary()}")
+
+    print(f"{len(delta)} new papers from {len(staff_user_ids)} profiles in {requests_made} requests: {outcomes}")
+    return delta
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Append the Google Scholar papers added since the last run to research_paper.csv.')
+    parser.add_argument('--staff', default='uic_staff_user_ids.csv')
+    parser.add_argument('--output', default='research_paper.csv')
+    parser.add_argument('--delta', default=DELTA_CSV)
+    parser.add_argument('--seen', default=SEEN_FILE)
+    parser.add_argument('--limit', type=int)
+    args = parser.parse_args()
+
+    scrape_scholar_incremental(read_user_ids(args.staff), csv_path=args.output, delta_csv=args.delta,
+                               seen=SeenStore(args.seen), limit=args.limit)
@@ -0,0 +1,148 @@
+import threading
+import time
+from typing import Any, Dict
+
+from metrics import metrics
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised by AdaptiveRateLimiter.wait() once the site has kept blocking us
+    through every circuit breaker pause; the scrape should stop and be resumed later.
+    """
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces request starts evenly, shared by every
+    worker that talks to the same site.
+
+    Args:
+        requests_per_minute: Maximum combined request starts per minute (0 disables the limit)
+    """
+
+    def __init__(self, requests_per_minute: float):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval
+        if delay > 0:
+            metrics.observe('rate_limit_wait_seconds', delay)
+            time.sleep(delay)
+
+    # Feedback hooks, so callers can report outcomes to any limiter; a fixed
+    # rate ignores them.
+    def success(self):
+        pass
+
+    def blocked(self, reason: str):
+        pass
+
+    def slow_down(self):
+        pass
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """
+    RateLimiter that finds the fastest rate a site tolerates (AIMD).
+
+    Every successful request adds increase_rpm to the rate. A timeout or
+    connection error multiplies it by timeout_factor. A block page or 429 multiplies it by block_factor
+    and pauses every worker for cooldown_seconds. After breaker_threshold
+    blocks in a row the circuit breaker opens and pauses for breaker_seconds
+    instead; the next request is a probe, and once the breaker has opened
+    max_trips times without a success in between, wait() raises CircuitOpenError.
+
+    Args:
+        requests_per_minute: Starting rate
+        min_rpm: Lowest rate the limiter backs off to
+        max_rpm: Highest rate the limiter climbs to
+    """
+
+    def __init__(self, requests_per_minute: float, min_rpm: float = 0.5, max_rpm: float = 30,
+                 increase_rpm: float = 0.5, block_factor: float = 0.5, timeout_factor: float = 0.75,
+                 cooldown_seconds: float = 60, breaker_threshold: int = 3, breaker_seconds: float = 900,
+                 max_trips: int = 2):
+        super().__init__(requests_per_minute)
+        self.min_rpm = min_rpm
+        self.max_rpm = max_rpm
+        self.increase_rpm = increase_rpm
+        self.block_factor = block_factor
+        self.timeout_factor = timeout_factor
+        self.cooldown_seconds = cooldown_seconds
+        self.breaker_threshold = breaker_threshold
+        self.breaker_seconds = breaker_seconds
+        self.max_trips = max_trips
+
+        self.rpm = 0.0
+        self._set_rate(requests_per_minute)
+        self._resume_at = 0.0
+        self._consecutive_blocks = 0
+        self._trips = 0
+        self.successes = 0
+        self.blocks: Dict[str, int] = {}
+        self.timeouts = 0
+
+    def _set_rate(self, rpm: float):
+        self.rpm = min(self.max_rpm, max(self.min_rpm, rpm))
+        self.interval = 60.0 / self.rpm
+
+    def wait(self):
+        with self._lock:
+            if self._trips >= self.max_trips:
+                raise CircuitOpenError(f'still blocked, circuit breaker opened {self._trips} times')
+            now = time.monotonic()
+            start = max(now, self._next_start, self._resume_at)
+            self._next_start = start + self.interval
+        delay = start - now
+        if delay > 0:
+            metrics.observe('rate_limit_wait_seconds', delay)
+            time.sleep(delay)
+
+    def success(self):
+        with self._lock:
+            self.successes += 1
+            self._consecutive_blocks = 0
+            self._trips = 0
+            self._set_rate(self.rpm + self.increase_rpm)
+
+    def blocked(self, reason: str):
+        metrics.count('rate_limit_blocks_total', reason=reason)
+        with self._lock:
+            self.blocks[reason] = self.blocks.get(reason, 0) + 1
+            self._consecutive_blocks += 1
+            self._set_rate(self.rpm * self.block_factor)
+
+            pause = self.cooldown_seconds
+            if self._consecutive_blocks >= self.breaker_threshold:
+                self._consecutive_blocks = 0
+                self._trips += 1
+                pause = self.breaker_seconds
+                metrics.count('rate_limit_breaker_trips_total')
+                if self._trips >= self.max_trips:
+                    print(f"Blocked {self.breaker_threshold} times in a row ({reason}), "
+                          f"circuit breaker trip {self._trips} of {self.max_trips}, giving up")
+                else:
+                    print(f"Blocked {self.breaker_threshold} times in a row ({reason}), pausing {pause:.0f}s "
+                          f"(circuit breaker trip {self._trips} of {self.max_trips})")
+            else:
+                print(f"Blocked ({reason}), cooling down {pause:.0f}s at {self.rpm:.1f} requests/minute")
+            self._resume_at = max(self._resume_at, time.monotonic() + pause)
+
+    def slow_down(self):
+        metrics.count('rate_limit_timeouts_total')
+        with self._lock:
+            self.timeouts += 1
+            self._set_rate(self.rpm * self.timeout_factor)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'requests_per_minute': round(self.rpm, 2), 'successes': self.successes,
+                    'blocks': dict(self.blocks), 'timeouts': self.timeouts}
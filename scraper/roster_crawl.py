@@ -0,0 +1,301 @@
+import argparse
+import csv
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple, TypedDict
+from urllib.parse import urljoin, urlparse
+
+import requests
+from lxml import html as lxml_html
+from selenium.common.exceptions import WebDriverException
+
+from fetch_cache import FetchCache
+from metrics import metrics
+
+from .blocking import BlockedError
+from .custom_types import RosterEntry, StaffLink
+from .driver import SharedBrowser
+from .http_backend import create_session, fetch_html, parse_staff_directory
+from .rate_limit import RateLimiter
+from .uic_staff import scrape_uic_staff
+
+ROSTER_SOURCES_CSV = 'roster_sources.csv'
+ROSTER_CSV = 'uic_staff.csv'
+ROSTER_DIFF_CSV = 'uic_staff_diff.csv'
+
+ROSTER_FIELDS = ['name', 'link', 'academic_title', 'department', 'phone', 'email', 'source']
+DIFF_FIELDS = ['change', 'name', 'link', 'source', 'changed_fields']
+NEXT_PAGE_XPATH = (
+    '//link[@rel="next"]/@href'
+    ' | //a[@rel="next"]/@href'
+    ' | //a[contains(concat(" ", normalize-space(@class), " "), " next ")]/@href'
+    ' | //a[contains(@aria-label, "Next page")]/@href'
+)
+# Fields whose change makes a staff member worth re-processing downstream
+COMPARED_FIELDS = ['name', 'academic_title', 'department', 'phone', 'email', 'source']
+
+
+class RosterSource(TypedDict):
+    source: str
+    url: str
+
+
+class RosterChange(TypedDict):
+    change: str
+    name: str
+    link: str
+    source: str
+    changed_fields: str
+
+
+def load_sources(path: str = ROSTER_SOURCES_CSV) -> List[RosterSource]:
+    """
+    Reads directory URLs from a CSV with `source` and `url` columns. Rows
+    whose source starts with # are skipped.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return [
+            {'source': row['source'].strip(), 'url': row['url'].strip()}
+            for row in csv.DictReader(f)
+            if row.get('url') and not row['source'].startswith('#')
+        ]
+
+def source_for_url(url: str) -> RosterSource:
+    return {'source': urlparse(url).netloc, 'url': url}
+
+def find_next_page(page: str, url: str) -> Optional[str]:
+    """
+    Returns the URL of the next directory page, from rel="next" links or
+    WordPress-style "next" pagination links, or None on the last page.
+    """
+    for href in lxml_html.fromstring(page).xpath(NEXT_PAGE_XPATH):
+        next_url = urljoin(url, href.strip())
+        if next_url != url:
+            return next_url
+    return None
+
+def roster_key(entry: Dict[str, str]) -> str:
+    """
+    Identifies a staff member across rosters by profile link, or by name when there is no link.
+    """
+    link = (entry.get('link') or '').strip().lower().rstrip('/')
+    if link:
+        return link.split('://', 1)[-1]
+    return 'name:' + ' '.join((entry.get('name') or '').lower().split())
+
+
+class RosterCrawler:
+    """
+    Crawls several faculty directories concurrently, following each
+    directory's pagination. Requests to the same host share a rate limit.
+
+    Args:
+        max_workers: Directories crawled at the same time
+        max_pages: Pages followed per directory
+        requests_per_minute: Request rate per host
+        session: HTTP session (defaults to a new keep-alive session)
+        cache: Fetch cache for the directory pages
+        browser: Browser whose tabs load directories that cannot be parsed over HTTP
+    """
+
+    def __init__(self, max_workers: int = 4, max_pages: int = 20, requests_per_minute: float = 30,
+                 session: Optional[requests.Session] = None, cache: Optional[FetchCache] = None,
+                 browser: Optional[SharedBrowser] = None):
+        self.max_workers = max_workers
+        self.max_pages = max_pages
+        self.requests_per_minute = requests_per_minute
+        self.session = session or create_session(pool_size=max_workers * 2)
+        self.cache = cache
+        self.browser = browser
+        self.failed_sources: Set[str] = set()
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._limiters_lock = threading.Lock()
+
+    def _limiter(self, url: str) -> RateLimiter:
+        host = urlparse(url).netloc
+        with self._limiters_lock:
+            if host not in self._limiters:
+                self._limiters[host] = RateLimiter(self.requests_per_minute)
+            return self._limiters[host]
+
+    def _fallback(self, url: str) -> List[StaffLink]:
+        if self.browser is None:
+            return []
+        metrics.count('selenium_fallbacks_total', page='uic_directory')
+        print("Falling back to Selenium for", url)
+        try:
+            with self.browser.tab() as driver:
+                return scrape_uic_staff(driver=driver, url=url, filename=None)
+        except WebDriverException as e:
+            print(f"Selenium fallback failed for {url}: {type(e).__name__}")
+            return []
+
+    def crawl_source(self, source: RosterSource) -> List[RosterEntry]:
+        """
+        Returns the staff listed on every page of one directory.
+        """
+        entries: List[RosterEntry] = []
+        url: Optional[str] = source['url']
+        visited: Set[str] = set()
+
+        while url and url not in visited and len(visited) < self.max_pages:
+            visited.add(url)
+            self._limiter(url).wait()
+            try:
+                page = fetch_html(self.session, url, cache=self.cache, source='uic')
+            except (requests.RequestException, BlockedError) as e:
+                print(f"[{source['source']}] HTTP fetch failed for {url}: {e}")
+                with self._limiters_lock:
+                    self.failed_sources.add(source['source'])
+                break
+
+            profile_links = parse_staff_directory(page, base_url=url)
+            if not profile_links and len(visited) == 1:
+                profile_links = self._fallback(url)
+                if not profile_links:
+                    # Most likely a layout change or an error page, not an empty department
+                    print(f"[{source['source']}] no staff found on {url}, keeping the previous roster")
+                    with self._limiters_lock:
+                        self.failed_sources.add(source['source'])
+                    break
+            entries.extend({**profile_link, 'source': source['source']} for profile_link in profile_links)
+            metrics.count('roster_pages_total', source=source['source'])
+            url = find_next_page(page, url)
+
+        print(f"[{source['source']}] {len(entries)} staff on {len(visited)} page(s)")
+        return entries
+
+    def crawl(self, sources: List[RosterSource]) -> List[RosterEntry]:
+        """
+        Crawl every source and merge the results into one roster. A staff
+        member listed by several sources appears once, with the sources
+        joined by "; ".
+        """
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(sources)))) as executor:
+            per_source = list(executor.map(self.crawl_source, sources))
+        return merge_rosters(per_source)
+
+
+def merge_rosters(per_source: List[List[RosterEntry]]) -> List[RosterEntry]:
+    merged: Dict[str, RosterEntry] = {}
+    for entries in per_source:
+        for entry in entries:
+            key = roster_key(entry)
+            if key not in merged:
+                merged[key] = dict(entry)  # type: ignore[assignment]
+            elif entry['source'] not in merged[key]['source'].split('; '):
+                merged[key]['source'] += '; ' + entry['source']
+    return list(merged.values())
+
+def read_roster(path: str) -> List[Dict[str, str]]:
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+def diff_rosters(old: List[Dict[str, str]], new: List[RosterEntry]) -> List[RosterChange]:
+    """
+    Compare two rosters by roster_key.
+
+    Returns:
+        One change per staff member who was added, removed or whose compared fields changed
+    """
+    old_by_key = {roster_key(entry): entry for entry in old}
+    new_by_key = {roster_key(entry): entry for entry in new}
+    changes: List[RosterChange] = []
+
+    for key, entry in new_by_key.items():
+        previous = old_by_key.get(key)
+        if previous is None:
+            changes.append({'change': 'added', 'name': entry['name'], 'link': entry['link'],
+                            'source': entry['source'], 'changed_fields': ''})
+            continue
+        # A roster written before sources existed has no source column
+        changed_fields = [field for field in COMPARED_FIELDS
+                          if field in previous and (previous.get(field) or '') != (entry.get(field) or '')]
+        if changed_fields:
+            changes.append({'change': 'changed', 'name': entry['name'], 'link': entry['link'],
+                            'source': entry['source'], 'changed_fields': ';'.join(changed_fields)})
+
+    for key, entry in old_by_key.items():
+        if key not in new_by_key:
+            changes.append({'change': 'removed', 'name': entry.get('name', ''), 'link': entry.get('link', ''),
+                            'source': entry.get('source', ''), 'changed_fields': ''})
+    return changes
+
+def write_csv(rows: List, path: str, fieldnames: List[str]):
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(temp_path, path)
+
+def update_roster(sources: List[RosterSource], roster_csv: str = ROSTER_CSV, diff_csv: str = ROSTER_DIFF_CSV,
+                  crawler: Optional[RosterCrawler] = None) -> List[RosterChange]:
+    """
+    Crawl the sources, write the merged roster to roster_csv and its diff
+    against the previous roster_csv to diff_csv. Staff of a source whose
+    crawl failed are carried over from the previous roster rather than
+    reported as removed, and if no staff were found at all the previous
+    roster is kept.
+
+    Example:
+        with SharedBrowser() as browser:
+            update_roster(load_sources('roster_sources.csv'), crawler=RosterCrawler(browser=browser))
+    """
+    crawler = crawler or RosterCrawler()
+    roster = crawler.crawl(sources)
+    if not roster:
+        raise RuntimeError(f"No staff found in {len(sources)} directories; keeping the previous {roster_csv}")
+
+    previous = read_roster(roster_csv)
+    if crawler.failed_sources:
+        previous_sources = {roster_key(entry): entry.get('source') or '' for entry in previous}
+        for entry in roster:
+            # Still listed by the source that failed, as far as we know
+            old_source = previous_sources.get(roster_key(entry), '')
+            if set(old_source.split('; ')) & crawler.failed_sources:
+                entry['source'] = old_source
+
+        crawled = {roster_key(entry) for entry in roster}
+        carried = [
+            {field: entry.get(field, '') for field in ROSTER_FIELDS} for entry in previous
+            if roster_key(entry) not in crawled and set((entry.get('source') or '').split('; ')) & crawler.failed_sources
+        ]
+        print(f"Could not crawl {sorted(crawler.failed_sources)}; keeping their {len(carried)} staff from {roster_csv}")
+        roster += carried  # type: ignore[arg-type]
+
+    changes = diff_rosters(previous, roster)
+    write_csv(roster, roster_csv, ROSTER_FIELDS)
+    write_csv(changes, diff_csv, DIFF_FIELDS)
+
+    counts = {change: sum(1 for row in changes if row['change'] == change) for change in ('added', 'removed', 'changed')}
+    print(f"Saved {len(roster)} staff from {len(sources)} directories to {roster_csv}; "
+          f"{counts['added']} added, {counts['removed']} removed, {counts['changed']} changed (see {diff_csv})")
+    return changes
+
+def read_roster_diff(diff_csv: str = ROSTER_DIFF_CSV) -> Tuple[Set[str], Set[str]]:
+    """
+    Returns (names of added or changed staff, names of removed staff) from a roster diff.
+    """
+    updated: Set[str] = set()
+    removed: Set[str] = set()
+    for row in read_roster(diff_csv):
+        (removed if row['change'] == 'removed' else updated).add(row['name'])
+    return updated, removed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Crawl faculty directories into a merged roster with a diff.')
+    parser.add_argument('--sources', default=ROSTER_SOURCES_CSV, help='CSV of source,url rows')
+    parser.add_argument('--url', action='append', default=[], help='Directory URL to crawl (instead of --sources)')
+    parser.add_argument('--output', default=ROSTER_CSV)
+    parser.add_argument('--diff', default=ROSTER_DIFF_CSV)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-pages', type=int, default=20)
+    args = parser.parse_args()
+
+    roster_sources = [source_for_url(url) for url in args.url] or load_sources(args.sources)
+    update_roster(roster_sources, args.output, args.diff, crawler=RosterCrawler(max_workers=args.workers, max_pages=args.max_pages))
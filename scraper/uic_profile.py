@@ -6,6 +6,8 @@ from selenium.webdriver.chrome.webdriver import WebDriver
 from typing import Dict, List
 
 from .custom_types import StaffLink
+from .driver import page_problem
+from metrics import metrics
 import csv
 from tqdm import tqdm
 
@@ -30,19 +32,31 @@ def get_section_headers(driver: WebDriver, staff_link: StaffLink) -> Dict:
     data['name'] = name
 
     try:
-        driver.get(url)
+        with metrics.timer('selenium_page_load_seconds', site='uic'):
+            driver.get(url)
+
+        problem = page_problem(driver)
+        if problem:
+            metrics.count('selenium_fast_fails_total', site='uic', reason=problem)
+            print(f"Skipping {name}: {problem} page")
+            return data
+
         wait = WebDriverWait(driver, 10)
         
-        wait.until(
-            EC.presence_of_element_located((By.CLASS_NAME, "_academic-title"))
-        )
+        metrics.count('selenium_waits_total', site='uic')
+        with metrics.timer('selenium_wait_seconds', site='uic'):
+            wait.until(
+                EC.presence_of_element_located((By.CLASS_NAME, "_academic-title"))
+            )
 
         all_headers = map(lambda x: x.get_attribute('innerText') or '', driver.find_elements(By.CLASS_NAME, '_section-title'))
         data['sections'] = '\t'.join(all_headers)
 
     except TimeoutException:
+        metrics.count('selenium_timeouts_total', site='uic')
         print("Page took too long to load")
     except NoSuchElementException:
+        metrics.count('selenium_missing_elements_total', site='uic')
         print("Element not found on page")
     
     return data
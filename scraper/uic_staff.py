@@ -5,11 +5,12 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from selenium.webdriver.chrome.webdriver import WebDriver
 from selenium.webdriver.remote.webelement import WebElement
 
-from typing import List, Dict, Union, Literal
+from typing import List, Dict, Optional, Union, Literal
 import csv
 
-import time
 from .custom_types import StaffLink
+from .driver import page_problem
+from metrics import metrics
 
 def profile_to_csv(profile_links: List[StaffLink], filename: str='uic_staff.csv'):
     headers = ['name', 'link', 'academic_title', 'department', 'phone', 'email']
@@ -28,20 +29,31 @@ def find_safe_element_text(element: Union[WebDriver, WebElement], by, match: str
     except NoSuchElementException as e:
         return ''
 
-def scrape_uic_staff(driver: WebDriver, url: str):
+def scrape_uic_staff(driver: WebDriver, url: str, filename: Optional[str] = 'uic_staff.csv'):
+    """
+    Scrape a UIC faculty directory page in the browser and save it to filename (None to only return it).
+    """
 
     profile_links: List[StaffLink] = []
 
     try:
     
-        driver.get(url)
+        with metrics.timer('selenium_page_load_seconds', site='uic'):
+            driver.get(url)
+
+        problem = page_problem(driver)
+        if problem:
+            metrics.count('selenium_fast_fails_total', site='uic', reason=problem)
+            print(f"Could not load the staff directory {url}: {problem} page")
+            return profile_links
+
         wait = WebDriverWait(driver, 10)
         
-        wait.until(
-            EC.presence_of_element_located((By.CLASS_NAME, "directory-list"))
-        )
-
-        time.sleep(5)
+        metrics.count('selenium_waits_total', site='uic')
+        with metrics.timer('selenium_wait_seconds', site='uic'):
+            wait.until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, ".directory-list .profile-teaser"))
+            )
 
         directory_list = driver.find_element(By.CLASS_NAME, 'directory-list')
 
@@ -68,11 +80,14 @@ def scrape_uic_staff(driver: WebDriver, url: str):
             }
             profile_links.append(profile)
         
-        profile_to_csv(profile_links=profile_links)
+        if filename:
+            profile_to_csv(profile_links=profile_links, filename=filename)
 
     except TimeoutException:
+        metrics.count('selenium_timeouts_total', site='uic')
         print("Page took too long to load")
     except NoSuchElementException:
+        metrics.count('selenium_missing_elements_total', site='uic')
         print("Element not found on page")
     
     return profile_links
\ No newline at end of file
@@ -0,0 +1,184 @@
+import queue
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.chrome.webdriver import WebDriver
+from tqdm import tqdm
+
+from .blocking import BlockedError
+from .custom_types import UserID, ResearchPaper
+from .rate_limit import CircuitOpenError, RateLimiter
+from metrics import metrics
+
+WorkItem = Tuple[int, UserID, int]
+
+
+class ScholarWorkerPool:
+    """
+    Pool of browser workers that scrape Google Scholar profiles from a shared work queue.
+
+    Each worker owns its own WebDriver session. A shared RateLimiter caps the
+    combined request rate across all workers. When a worker's browser crashes,
+    the worker starts a new session and puts its item back on the queue.
+
+    Outcomes are reported to the rate limiter. A blocked profile goes to the
+    back of the queue without using up an attempt, up to max_blocks times;
+    when the limiter's circuit breaker gives up, the remaining profiles are
+    left unscraped and stopped_by says why.
+
+    Args:
+        scrape: Function that scrapes one profile with a given driver
+        driver_factory: Function that starts a new WebDriver session
+        pool_size: Number of workers (and browser sessions)
+        rate_limiter: Limiter shared by every worker
+        max_attempts: Attempts per profile before it is given up as empty
+        max_blocks: Block pages per profile before it is left for a resumed run
+        on_result: Called from the worker thread with each successfully scraped profile
+    """
+
+    def __init__(self, scrape: Callable[[WebDriver, UserID], List[ResearchPaper]],
+                 driver_factory: Callable[[], WebDriver], pool_size: int,
+                 rate_limiter: RateLimiter, max_attempts: int = 3, max_blocks: int = 10,
+                 on_result: Optional[Callable[[UserID, List[ResearchPaper]], None]] = None):
+        self.scrape = scrape
+        self.driver_factory = driver_factory
+        self.pool_size = max(1, pool_size)
+        self.rate_limiter = rate_limiter
+        self.max_attempts = max_attempts
+        self.max_blocks = max_blocks
+        self.on_result = on_result
+        self.stopped_by: Optional[str] = None
+
+        self._queue: "queue.Queue[Optional[WorkItem]]" = queue.Queue()
+        self._results: Dict[int, List[ResearchPaper]] = {}
+        self._results_lock = threading.Lock()
+        self._blocks: Dict[int, int] = {}
+        self._stop = threading.Event()
+        self._progress_bar: Optional[tqdm] = None
+
+    def _start_driver(self) -> Optional[WebDriver]:
+        try:
+            return self.driver_factory()
+        except WebDriverException as e:
+            print(f"Could not start browser: {e}")
+            return None
+
+    def _finish(self, index: int, papers: List[ResearchPaper]):
+        with self._results_lock:
+            self._results[index] = papers
+        if self._progress_bar is not None:
+            self._progress_bar.update(1)
+
+    def _worker(self):
+        driver = self._start_driver()
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+
+            index, staff_user_id, attempt = item
+            if self._stop.is_set():
+                self._queue.task_done()
+                continue
+
+            try:
+                if driver is None:
+                    raise WebDriverException('browser is not running')
+
+                self.rate_limiter.wait()
+                with metrics.timer('scholar_profile_seconds', backend='selenium'):
+                    research_papers = self.scrape(driver, staff_user_id)
+                self.rate_limiter.success()
+                if not research_papers:
+                    metrics.count('scholar_empty_profiles_total', backend='selenium')
+                if self.on_result:
+                    self.on_result(staff_user_id, research_papers)
+                self._finish(index, research_papers)
+
+            except CircuitOpenError as e:
+                self.stopped_by = str(e)
+                self._stop.set()
+                print(f"Stopping the Google Scholar scrape: {e}")
+
+            except BlockedError as e:
+                self.rate_limiter.blocked(e.reason)
+                with self._results_lock:
+                    self._blocks[index] = blocks = self._blocks.get(index, 0) + 1
+                if blocks < self.max_blocks:
+                    self._queue.put((index, staff_user_id, attempt))
+                else:
+                    # Not checkpointed, so a resumed run will try this profile again
+                    print(f"Giving up on {staff_user_id['name']} after {blocks} block pages")
+                    self._finish(index, [])
+
+            except TimeoutException as e:
+                self.rate_limiter.slow_down()
+                print(f"Timed out loading {staff_user_id['name']} (attempt {attempt}): {getattr(e, 'msg', e)}")
+                if attempt < self.max_attempts:
+                    self._queue.put((index, staff_user_id, attempt + 1))
+                else:
+                    metrics.count('scholar_profiles_abandoned_total')
+                    self._finish(index, [])
+
+            except WebDriverException as e:
+                metrics.count('selenium_driver_restarts_total')
+                print(f"Worker browser failed on {staff_user_id['name']} (attempt {attempt}): {getattr(e, 'msg', e)}")
+                if driver is not None:
+                    try:
+                        driver.quit()
+                    except Exception:
+                        pass
+                driver = self._start_driver()
+
+                if attempt < self.max_attempts:
+                    self._queue.put((index, staff_user_id, attempt + 1))
+                else:
+                    metrics.count('scholar_profiles_abandoned_total')
+                    print(f"Giving up on {staff_user_id['name']} after {attempt} attempts")
+                    self._finish(index, [])
+
+            except Exception as e:
+                # Not checkpointed, so a resumed run will try this profile again
+                print(f"Error scraping {staff_user_id['name']}: {e}")
+                self._finish(index, [])
+
+            finally:
+                self._queue.task_done()
+
+        if driver is not None:
+            driver.quit()
+
+    def run(self, staff_user_ids: List[UserID]) -> List[ResearchPaper]:
+        """
+        Scrape every profile and return the papers in roster order.
+        """
+        self._results = {}
+        self._blocks = {}
+        self._stop.clear()
+        self.stopped_by = None
+        self._progress_bar = tqdm(total=len(staff_user_ids), desc="Processing staff profiles from Google Scholar")
+
+        for index, staff_user_id in enumerate(staff_user_ids):
+            self._queue.put((index, staff_user_id, 1))
+
+        workers = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.pool_size)]
+        for worker in workers:
+            worker.start()
+
+        # Requeued items are put back before task_done, so join() only
+        # returns once every profile has a result.
+        self._queue.join()
+        for _ in workers:
+            self._queue.put(None)
+        for worker in workers:
+            worker.join()
+
+        self._progress_bar.close()
+
+        research_papers: List[ResearchPaper] = []
+        for index in range(len(staff_user_ids)):
+            research_papers.extend(self._results.get(index, []))
+        return research_papers
@@ -0,0 +1,428 @@
+"""
+Local full-text search over the unique papers and the faculty who wrote them.
+
+The index is a SQLite database with an FTS5 table ranked by BM25. A paper's
+title, staff names, departments, abstract and PDF text (when it has been
+extracted) are indexed, with title matches weighted highest. Updates are
+incremental: a hash of each paper's fields and PDF text decides which papers
+are re-indexed.
+
+    python -m search.index update
+    python -m search.index query "graph neural networks" --department "Computer Science" --from 2020
+    python -m search.index faculty "differential privacy"
+"""
+import argparse
+import csv
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TypedDict
+
+from download_pdfs.text_extraction import TEXT_STORE_PATH, TextStore
+
+SEARCH_INDEX_PATH = 'download_pdfs/search_index.sqlite3'
+UNIQUE_PAPERS_CSV = 'download_pdfs/research_paper_unique.csv'
+
+# bm25() column weights, in papers_fts column order
+COLUMN_WEIGHTS = (10.0, 5.0, 2.0, 3.0, 1.0)
+TOKEN = re.compile(r'\w+\*?', re.UNICODE)
+
+
+class SearchResult(TypedDict):
+    paper_id: str
+    paper_title: str
+    paper_link: str
+    year: Optional[int]
+    staff: List[str]
+    departments: List[str]
+    score: float
+    snippet: str
+
+
+class FacultyResult(TypedDict):
+    name: str
+    department: str
+    papers: int
+    score: float
+
+
+class IndexedPaper(TypedDict):
+    paper_id: str
+    paper_title: str
+    paper_link: str
+    year: Optional[int]
+    staff: List[Tuple[str, str]]
+
+
+def iter_unique_papers(csv_path: str) -> Iterator[IndexedPaper]:
+    """
+    Yields the papers of a research_paper_unique CSV with their (name, department) staff pairs.
+    """
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            staff = []
+            position = 1
+            while f'staff_name{position}' in row:
+                name = row[f'staff_name{position}']
+                if name:
+                    staff.append((name, row.get(f'staff_dept{position}') or ''))
+                position += 1
+            year = row.get('year') or ''
+            yield {
+                'paper_id': row['paper_id'],
+                'paper_title': row.get('paper_title') or '',
+                'paper_link': row.get('paper_link') or '',
+                'year': int(float(year)) if year.strip() else None,
+                'staff': staff,
+            }
+
+def to_match_query(query: str) -> str:
+    """
+    Turns free text into an FTS5 query that matches documents containing
+    every word. Words are quoted so punctuation cannot break the query
+    syntax; a trailing * keeps prefix matching.
+    """
+    terms = []
+    for token in TOKEN.findall(query):
+        word = token.rstrip('*')
+        if word:
+            terms.append(f'"{word}"*' if token.endswith('*') else f'"{word}"')
+    return ' '.join(terms)
+
+
+class SearchIndex:
+    """
+    BM25-ranked search index over papers, their staff and their PDF text.
+
+    Args:
+        path: Path of the SQLite index
+    """
+
+    def __init__(self, path: str = SEARCH_INDEX_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS papers (
+                id INTEGER PRIMARY KEY,
+                paper_id TEXT NOT NULL UNIQUE,
+                paper_title TEXT NOT NULL,
+                paper_link TEXT NOT NULL,
+                year INTEGER,
+                row_hash TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS paper_staff (
+                id INTEGER NOT NULL REFERENCES papers (id),
+                position INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                department TEXT NOT NULL,
+                PRIMARY KEY (id, position)
+            );
+            CREATE INDEX IF NOT EXISTS paper_staff_name ON paper_staff (name COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS paper_staff_department ON paper_staff (department COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS papers_year ON papers (year);
+            CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+                title, staff, departments, abstract, body,
+                tokenize = 'porter unicode61 remove_diacritics 2'
+            );
+        """)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _row_hash(paper: IndexedPaper, text_sha256: str) -> str:
+        fields = [paper['paper_title'], paper['paper_link'], str(paper['year'])]
+        fields += [f'{name}\x1f{department}' for name, department in paper['staff']]
+        fields.append(text_sha256)
+        return hashlib.sha1('\x1e'.join(fields).encode('utf-8')).hexdigest()
+
+    def update(self, csv_path: str = UNIQUE_PAPERS_CSV, text_store: Optional[TextStore] = None,
+               prune: bool = True) -> Dict[str, int]:
+        """
+        Bring the index up to date with csv_path, and with the extracted PDF
+        text when a text store is given. Only papers whose fields or PDF
+        text changed are re-indexed.
+
+        Args:
+            csv_path: research_paper_unique.csv
+            text_store: Extracted PDF text to index alongside the metadata
+            prune: Remove papers that are no longer in csv_path
+
+        Returns:
+            Number of papers added, updated, removed and unchanged
+        """
+        text_hashes = text_store.hashes() if text_store is not None else {}
+        with self._lock:
+            indexed = {paper_id: (row_id, row_hash) for paper_id, row_id, row_hash
+                       in self._conn.execute('SELECT paper_id, id, row_hash FROM papers')}
+
+        counts = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        seen = set()
+        with self._lock, self._conn:
+            for paper in iter_unique_papers(csv_path):
+                paper_id = paper['paper_id']
+                if paper_id in seen:
+                    continue
+                seen.add(paper_id)
+
+                text_sha256 = text_hashes.get(paper_id, '')
+                row_hash = self._row_hash(paper, text_sha256)
+                existing = indexed.get(paper_id)
+                if existing and existing[1] == row_hash:
+                    counts['unchanged'] += 1
+                    continue
+
+                abstract, body = '', ''
+                if text_sha256:
+                    extracted = text_store.get(paper_id)
+                    abstract = extracted['abstract'] if extracted else ''
+                    body = text_store.text(paper_id)
+
+                if existing:
+                    self._delete(existing[0])
+                    counts['updated'] += 1
+                else:
+                    counts['added'] += 1
+                self._insert(paper, row_hash, abstract, body)
+
+            if prune:
+                for paper_id, (row_id, _) in indexed.items():
+                    if paper_id not in seen:
+                        self._delete(row_id)
+                        counts['removed'] += 1
+
+        return counts
+
+    def _insert(self, paper: IndexedPaper, row_hash: str, abstract: str, body: str):
+        cursor = self._conn.execute(
+            'INSERT INTO papers (paper_id, paper_title, paper_link, year, row_hash) VALUES (?, ?, ?, ?, ?)',
+            (paper['paper_id'], paper['paper_title'], paper['paper_link'], paper['year'], row_hash),
+        )
+        row_id = cursor.lastrowid
+        self._conn.executemany(
+            'INSERT INTO paper_staff (id, position, name, department) VALUES (?, ?, ?, ?)',
+            [(row_id, position, name, department) for position, (name, department) in enumerate(paper['staff'], start=1)],
+        )
+        departments = ' ; '.join(dict.fromkeys(department for _, department in paper['staff'] if department))
+        self._conn.execute(
+            'INSERT INTO papers_fts (rowid, title, staff, departments, abstract, body) VALUES (?, ?, ?, ?, ?, ?)',
+            (row_id, paper['paper_title'], ' ; '.join(name for name, _ in paper['staff']), departments, abstract, body),
+        )
+
+    def _delete(self, row_id: int):
+        self._conn.execute('DELETE FROM papers_fts WHERE rowid = ?', (row_id,))
+        self._conn.execute('DELETE FROM paper_staff WHERE id = ?', (row_id,))
+        self._conn.execute('DELETE FROM papers WHERE id = ?', (row_id,))
+
+    @staticmethod
+    def _filters(department: Optional[str], staff: Optional[str], year_from: Optional[int],
+                 year_to: Optional[int]) -> Tuple[str, List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        if department:
+            clauses.append('EXISTS (SELECT 1 FROM paper_staff s WHERE s.id = p.id AND s.department LIKE ?)')
+            params.append(f'%{department}%')
+        if staff:
+            clauses.append('EXISTS (SELECT 1 FROM paper_staff s WHERE s.id = p.id AND s.name LIKE ?)')
+            params.append(f'%{staff}%')
+        if year_from is not None:
+            clauses.append('p.year >= ?')
+            params.append(year_from)
+        if year_to is not None:
+            clauses.append('p.year <= ?')
+            params.append(year_to)
+        return ''.join(f' AND {clause}' for clause in clauses), params
+
+    def search(self, query: str, department: Optional[str] = None, staff: Optional[str] = None,
+               year_from: Optional[int] = None, year_to: Optional[int] = None, limit: int = 20) -> List[SearchResult]:
+        """
+        Papers matching every word of query, best BM25 score first.
+
+        Args:
+            query: Free text; end a word with * for prefix matching
+            department: Only papers with a staff member whose department contains this
+            staff: Only papers with a staff member whose name contains this
+            year_from: Only papers from this year on
+            year_to: Only papers up to this year
+            limit: Maximum number of results
+
+        Example:
+            index.search('federated learning', department='Computer Science', year_from=2020)
+        """
+        match = to_match_query(query)
+        if not match:
+            return []
+        filters, params = self._filters(department, staff, year_from, year_to)
+        weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT p.id, p.paper_id, p.paper_title, p.paper_link, p.year, bm25(papers_fts, {weights}) AS score,
+                       snippet(papers_fts, -1, '[', ']', '…', 12)
+                FROM papers_fts JOIN papers p ON p.id = papers_fts.rowid
+                WHERE papers_fts MATCH ?{filters}
+                ORDER BY score
+                LIMIT ?
+                """,
+                [match, *params, limit],
+            ).fetchall()
+            staff_rows = self._conn.execute(
+                f"SELECT id, name, department FROM paper_staff WHERE id IN ({','.join('?' * len(rows))}) ORDER BY id, position",
+                [row[0] for row in rows],
+            ).fetchall() if rows else []
+
+        staff_by_paper: Dict[int, List[Tuple[str, str]]] = {}
+        for row_id, name, department in staff_rows:
+            staff_by_paper.setdefault(row_id, []).append((name, department))
+
+        return [
+            {
+                'paper_id': paper_id,
+                'paper_title': title,
+                'paper_link': link,
+                'year': year,
+                'staff': [name for name, _ in staff_by_paper.get(row_id, [])],
+                'departments': list(dict.fromkeys(department for _, department in staff_by_paper.get(row_id, []) if department)),
+                # bm25() is lower for better matches; flip it so higher is better
+                'score': round(-score, 4),
+                'snippet': snippet,
+            }
+            for row_id, paper_id, title, link, year, score, snippet in rows
+        ]
+
+    def search_faculty(self, query: str, department: Optional[str] = None, year_from: Optional[int] = None,
+                       year_to: Optional[int] = None, limit: int = 20) -> List[FacultyResult]:
+        """
+        Staff members ranked by the summed BM25 score of their papers that match query.
+        """
+        match = to_match_query(query)
+        if not match:
+            return []
+        filters, params = self._filters(None, None, year_from, year_to)
+        department_filter = ' AND s.department LIKE ?' if department else ''
+        weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                WITH hits AS MATERIALIZED (
+                    SELECT p.id, bm25(papers_fts, {weights}) AS score
+                    FROM papers_fts JOIN papers p ON p.id = papers_fts.rowid
+                    WHERE papers_fts MATCH ?{filters}
+                )
+                SELECT s.name, MIN(s.department), COUNT(*), -SUM(hits.score) AS total
+                FROM hits JOIN paper_staff s ON s.id = hits.id
+                WHERE 1 = 1{department_filter}
+                GROUP BY s.name
+                ORDER BY total DESC
+                LIMIT ?
+                """,
+                [match, *params, *([f'%{department}%'] if department else []), limit],
+            ).fetchall()
+
+        return [{'name': name, 'department': department, 'papers': papers, 'score': round(score, 4)}
+                for name, department, papers, score in rows]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            papers = self._conn.execute('SELECT COUNT(*) FROM papers').fetchone()[0]
+            staff = self._conn.execute('SELECT COUNT(DISTINCT name) FROM paper_staff').fetchone()[0]
+            with_text = self._conn.execute("SELECT COUNT(*) FROM papers_fts WHERE body != ''").fetchone()[0]
+        return {'papers': papers, 'staff': staff, 'papers_with_text': with_text}
+
+    def optimize(self):
+        """
+        Merge the FTS index segments; worth running after a large update.
+        """
+        with self._lock:
+            self._conn.execute("INSERT INTO papers_fts (papers_fts) VALUES ('optimize')")
+            self._conn.commit()
+
+
+def update_search_index(csv_path: str = UNIQUE_PAPERS_CSV, index_path: str = SEARCH_INDEX_PATH,
+                        text_store_path: Optional[str] = TEXT_STORE_PATH) -> Dict[str, int]:
+    """
+    Update the search index from csv_path, adding the extracted PDF text when
+    the text store exists.
+    """
+    index = SearchIndex(index_path)
+    text_store = TextStore(text_store_path) if text_store_path and os.path.exists(text_store_path) else None
+    try:
+        counts = index.update(csv_path, text_store=text_store)
+        if counts['added'] + counts['updated'] + counts['removed'] > 1000:
+            index.optimize()
+        print(f"Search index updated: {counts}")
+        return counts
+    finally:
+        index.close()
+        if text_store is not None:
+            text_store.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Search the indexed papers and faculty.')
+    parser.add_argument('--index', default=SEARCH_INDEX_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    update = commands.add_parser('update', help='Add new and changed papers to the index')
+    update.add_argument('--csv', default=UNIQUE_PAPERS_CSV)
+    update.add_argument('--text-store', default=TEXT_STORE_PATH)
+    update.add_argument('--no-text', action='store_true', help='Index the metadata only')
+
+    for name, help_text in [('query', 'Search papers'), ('faculty', 'Rank faculty by their matching papers')]:
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('text')
+        command.add_argument('--department')
+        if name == 'query':
+            command.add_argument('--staff')
+        command.add_argument('--from', dest='year_from', type=int)
+        command.add_argument('--to', dest='year_to', type=int)
+        command.add_argument('--limit', type=int, default=10)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'update':
+        update_search_index(args.csv, args.index, None if args.no_text else args.text_store)
+        return 0
+
+    if not os.path.exists(args.index):
+        print(f"No search index at {args.index}; run `python -m search.index update` first", file=sys.stderr)
+        return 1
+
+    index = SearchIndex(args.index)
+    start = time.perf_counter()
+    if args.command == 'query':
+        results = index.search(args.text, department=args.department, staff=args.staff,
+                               year_from=args.year_from, year_to=args.year_to, limit=args.limit)
+        elapsed = time.perf_counter() - start
+        for result in results:
+            print(f"{result['score']:8.2f}  {result['year'] or '----'}  {result['paper_title']}")
+            print(f"          {', '.join(result['staff'])}")
+            print(f"          {result['paper_link']}")
+            if result['snippet']:
+                print(f"          {result['snippet']}")
+    else:
+        results = index.search_faculty(args.text, department=args.department,
+                                       year_from=args.year_from, year_to=args.year_to, limit=args.limit)
+        elapsed = time.perf_counter() - start
+        for result in results:
+            print(f"{result['score']:8.2f}  {result['papers']:4d} papers  {result['name']}  ({result['department']})")
+
+    print(f"{len(results)} results in {elapsed * 1000:.1f} ms")
+    index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())